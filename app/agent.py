@@ -1,19 +1,180 @@
 # agent.py (run this on each worker node)
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, Query, HTTPException
+import asyncio
+import hashlib
+import json
+import os
+from typing import Optional
+from fastapi import FastAPI, Query, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-import psutil
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel
+import httpx
 import socket
+from orchestrator.container_record import (
+    JOB_LABEL, ContainerRecord, as_record, dumps, newest_job_container, record_matches,
+)
+from orchestrator.revision_index import RevisionIndex, etag_matches
 from orchestrator.container_manager import ContainerManager, DockerUnavailable
+from orchestrator.container_reaper import ContainerReaper
+from orchestrator.container_telemetry import ContainerTelemetry
+from orchestrator.docker_subprocess import validate_image, validate_command, SecurityError
+from orchestrator.event_watcher import ContainerEventWatcher
+from orchestrator.health_sampler import HealthSampler
+from orchestrator.image_warmer import ImageWarmer
+from orchestrator.log_archive import LogArchiver
+from orchestrator.warm_pool import WarmPool
 from docker.errors import APIError, NotFound
 
+# Where to push container lifecycle events (e.g. http://10.0.0.1:8000).
+# When unset the orchestrator falls back to its periodic reconciliation sweep.
+ORCHESTRATOR_URL = os.getenv("ORCHESTRATOR_URL")
+NODE_ID = os.getenv("NODE_ID", socket.gethostname())
+
+# Max containers launched at once by POST /containers/batch
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", str(os.cpu_count() or 4)))
+
+# Full re-list of the container index when no docker event has marked it dirty
+INDEX_REFRESH_INTERVAL = float(os.getenv("INDEX_REFRESH_INTERVAL", "30"))
+# Coalesce bursts of events (e.g. a batch deploy) into one re-list
+INDEX_DEBOUNCE = float(os.getenv("INDEX_DEBOUNCE", "0.2"))
+
+_event_queue: asyncio.Queue | None = None
+_push_task = None
+_index_task = None
+_index_dirty: asyncio.Event | None = None
+
+
+async def _enqueue_event(event: dict):
+    _mark_index_dirty()
+    # Keep a finished job's output around after the reaper removes its container
+    if event.get("action") == "die" and (event.get("name") or "").startswith("job-"):
+        archiver.schedule(event["container_id"], event["name"])
+    if _event_queue is None:
+        return
+    try:
+        _event_queue.put_nowait(event)
+    except asyncio.QueueFull:
+        # Orchestrator is not keeping up; reconciliation will catch up later
+        pass
+
+
+def _mark_index_dirty():
+    if _index_dirty is not None:
+        _index_dirty.set()
+
+
+def _container_record(c) -> dict:
+    return as_record(c).to_dict()
+
+
+async def _refresh_index():
+    """
+    Re-list containers into the index. Exit code, OOM and start/finish times
+    only come from inspect, so only containers that are new or changed state
+    are inspected; the rest keep the details already in the index.
+    """
+    records = [_container_record(c) for c in await cm.list_containers_async(all=True)]
+    # Containers claimed from the warm pool carry their job labels only here
+    pool.forget(record["id"] for record in records)
+    for record in records:
+        claimed = pool.labels_for(record["id"])
+        if claimed:
+            record["labels"] = {**record["labels"], **claimed}
+    stale = []
+    for record in records:
+        known = index.get(record["id"])
+        if known is None or known.get("state") != record.get("state"):
+            stale.append(record)
+        else:
+            for field in ContainerRecord.DETAIL_FIELDS:
+                record[field] = known.get(field)
+    if stale:
+        details = {r.id: r for r in await cm.inspect_containers_async([r["id"] for r in stale])}
+        for record in stale:
+            detail = details.get(record["id"])
+            if detail is not None:
+                for field in ContainerRecord.DETAIL_FIELDS:
+                    record[field] = getattr(detail, field)
+    index.replace(records)
+
+
+async def _index_loop():
+    """Keep the container index current: re-list on docker events, or every INDEX_REFRESH_INTERVAL."""
+    while True:
+        try:
+            await asyncio.wait_for(_index_dirty.wait(), timeout=INDEX_REFRESH_INTERVAL)
+            await asyncio.sleep(INDEX_DEBOUNCE)
+        except asyncio.TimeoutError:
+            pass
+        _index_dirty.clear()
+        try:
+            await _refresh_index()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Failed to refresh container index: {e}")
+
+
+async def _push_events_loop():
+    """Forward queued container events to the orchestrator in small batches."""
+    async with httpx.AsyncClient(timeout=5.0) as client:
+        while True:
+            batch = [await _event_queue.get()]
+            while not _event_queue.empty() and len(batch) < 100:
+                batch.append(_event_queue.get_nowait())
+            try:
+                await client.post(
+                    f"{ORCHESTRATOR_URL}/events/containers",
+                    json={"node_id": NODE_ID, "events": batch},
+                )
+            except Exception as e:
+                print(f"Failed to push {len(batch)} container events: {e}")
+
+
+watcher = ContainerEventWatcher(_enqueue_event)
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Manage startup and shutdown events"""
+    global _event_queue, _push_task, _index_task, _index_dirty
+
+    sampler.start()
+    # One stats stream per running container feeds /telemetry and /health
+    telemetry.start()
+
+    _index_dirty = asyncio.Event()
+    _index_dirty.set()
+    _index_task = asyncio.create_task(_index_loop())
+
+    if ORCHESTRATOR_URL:
+        _event_queue = asyncio.Queue(maxsize=10000)
+        _push_task = asyncio.create_task(_push_events_loop())
+        print(f"Pushing container events to {ORCHESTRATOR_URL}")
+    # Docker events keep the container index fresh even without an orchestrator to push to
+    watcher.start()
+    # Retention of exited containers is handled here, not by the orchestrator
+    reaper.start()
+    # Pull the warm image set up front so job starts don't pull inline
+    warmer.start()
+    pool.start()
+
     yield
+
     # Cleanup on shutdown
-    cm.shutdown()
+    await sampler.stop()
+    await telemetry.stop()
+    await watcher.stop()
+    await reaper.stop()
+    await warmer.stop()
+    await pool.stop()
+    await archiver.stop()
+    if _push_task:
+        _push_task.cancel()
+    if _index_task:
+        _index_task.cancel()
+    await cm.aclose()
 
 
 app = FastAPI(title="Node Agent", lifespan=lifespan)
@@ -27,32 +188,54 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-cm = ContainerManager()
+cm = ContainerManager(max_workers=max(4, BATCH_CONCURRENCY))
+telemetry = ContainerTelemetry(cm, lambda: _current_records())
+sampler = HealthSampler(container_manager=cm, telemetry=telemetry)
+warmer = ImageWarmer(cm)
+pool = WarmPool(cm)
+archiver = LogArchiver(cm)
+index = RevisionIndex()
+reaper = ContainerReaper(
+    cm, lambda: _current_records(),
+    disk_percent=lambda: sampler.latest().get("disk_percent"),
+    on_removed=_mark_index_dirty,
+)
+
+
+class ContainerSpec(BaseModel):
+    image: str
+    name: Optional[str] = None
+    command: Optional[str] = None
+    cpus: float = 0.5
+    memory_mb: int = 256
+    labels: dict[str, str] = {}
 
 
 @app.get("/health")
-def health():
-    """Health check endpoint - reports node status"""
-    mem = psutil.virtual_memory()
-    return {
-        "hostname": socket.gethostname(),
-        "status": "ok",
-        "cpu_percent": psutil.cpu_percent(interval=0.2),
-        "memory_percent": mem.percent,
-        "cpu_count": psutil.cpu_count(),
-        "memory_total_mb": round(mem.total / (1024 * 1024))
-    }
+async def health():
+    """Health check endpoint - returns the latest background sample of node status"""
+    return {**sampler.latest(), "images": sorted(warmer.inventory)}
 
 
 @app.post("/containers")
 async def create_container(
     image: str = Query(..., description="Docker image"),
     name: str = Query(None, description="Container name"),
-    command: str = Query(None, description="Command to run in container")
+    command: str = Query(None, description="Command to run in container"),
+    cpus: float = Query(0.5, gt=0, description="CPU limit in cores"),
+    memory_mb: int = Query(256, gt=0, description="Memory limit in MB"),
+    label: Optional[list[str]] = Query(None, description="Container label as key=value"),
 ):
     """Create and start a container on this node"""
+    labels = dict(pair.partition("=")[::2] for pair in label or ())
     try:
-        result = await cm.start_container_async(image=image, name=name, command=command)
+        result = await pool.claim(image, name, command, cpus, memory_mb, labels)
+        if result is None:
+            # Wait for (or join) the image pull here rather than inside docker run's timeout
+            await warmer.ensure(image)
+            result = await cm.start_container_async(image=image, name=name, command=command, cpus=cpus,
+                                                    memory_mb=memory_mb, labels=labels)
+        _mark_index_dirty()
         return result
     except DockerUnavailable as e:
         raise HTTPException(status_code=503, detail=str(e))
@@ -60,20 +243,244 @@ async def create_container(
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@app.post("/containers/batch")
+async def create_containers_batch(specs: list[ContainerSpec]):
+    """
+    Create and start many containers in one request. Launches at most
+    BATCH_CONCURRENCY at a time and streams one NDJSON outcome per container
+    as each one finishes.
+    """
+    # Validate each distinct image/command once instead of once per container
+    image_errors = {}
+    for image in {spec.image for spec in specs}:
+        try:
+            validate_image(image)
+        except SecurityError as e:
+            image_errors[image] = str(e)
+    command_errors = {}
+    for command in {spec.command for spec in specs if spec.command}:
+        try:
+            validate_command(command)
+        except SecurityError as e:
+            command_errors[command] = str(e)
+
+    # Pull every missing image once, up front, instead of inline per container
+    await asyncio.gather(*(warmer.ensure(image) for image in {spec.image for spec in specs} - set(image_errors)))
+
+    limit = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def launch(spec: ContainerSpec) -> dict:
+        error = image_errors.get(spec.image) or command_errors.get(spec.command)
+        if error:
+            return {"name": spec.name, "id": None, "status": "rejected", "error": error}
+        async with limit:
+            try:
+                result = await pool.claim(spec.image, spec.name, spec.command, spec.cpus, spec.memory_mb,
+                                          spec.labels)
+                if result is None:
+                    result = await cm.start_container_async(
+                        image=spec.image, name=spec.name, command=spec.command,
+                        cpus=spec.cpus, memory_mb=spec.memory_mb, labels=spec.labels,
+                    )
+                return {"name": spec.name, "id": result["id"], "status": result.get("status"), "error": None}
+            except Exception as e:
+                return {"name": spec.name, "id": None, "status": "failed", "error": str(e)}
+
+    tasks = [asyncio.create_task(launch(spec)) for spec in specs]
+
+    async def outcomes():
+        for finished in asyncio.as_completed(tasks):
+            yield json.dumps(await finished) + "\n"
+        _mark_index_dirty()
+
+    return StreamingResponse(outcomes(), media_type="application/x-ndjson")
+
+
+async def _current_records() -> list[dict]:
+    """Index records, re-listed first if a deploy or docker event has outdated them."""
+    dirty = _index_dirty is not None and _index_dirty.is_set()
+    if index.synced_at is None or dirty:
+        if dirty:
+            _index_dirty.clear()
+        await _refresh_index()
+    return index.records()
+
+
+async def _fresh_index():
+    try:
+        await _current_records()
+    except DockerUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+def _filter_tag(all, state, label, finished_before) -> str:
+    key = "|".join((str(all), ",".join(sorted(state or ())), ",".join(sorted(label or ())), str(finished_before)))
+    return hashlib.blake2b(key.encode(), digest_size=6).hexdigest()
+
+
 @app.get("/containers")
-async def list_containers(all: bool = Query(True, description="Include stopped/exited containers")):
-    """List containers on this node"""
+async def list_containers(
+    request: Request,
+    all: bool = Query(True, description="Include stopped/exited containers"),
+    since: Optional[int] = Query(None, description="Return only changes after this index revision"),
+    epoch: Optional[str] = Query(None, description="Index epoch the since revision belongs to"),
+    state: Optional[list[str]] = Query(None, description="Only containers in these states (running, exited, ...)"),
+    label: Optional[list[str]] = Query(None, description="Only containers with this label, as key or key=value"),
+    finished_before: Optional[float] = Query(None, description="Only containers that finished before this unix time"),
+):
+    """
+    List containers on this node from the container index. With `since`,
+    answers {epoch, revision, full, containers, removed}: only entries changed
+    after that revision, or everything (full=true) if it can't tell.
+    state/label/finished_before filter plain listings, not deltas.
+    Honours If-None-Match against the index revision.
+    """
+    await _fresh_index()
+
+    # Filters (and all=false) change the body but not the revision, so they are part of the validator
+    filtered = since is None and (state or label or finished_before is not None)
+    varied = filtered or (since is None and not all)
+    etag = index.etag(_filter_tag(all, state, label, finished_before)) if varied else index.etag()
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    if since is not None:
+        body = index.delta(since, epoch)
+    else:
+        # Start from the label index rather than every container when we can
+        body = index.with_label(label[0]) if label else index.records()
+        if not all:
+            body = [c for c in body if (c.get("status") or "").lower().startswith(("up", "running"))]
+    if filtered:
+        body = [c for c in body if record_matches(c, state, label, finished_before)]
+    return Response(dumps(body), media_type="application/json", headers={"ETag": etag})
+
+
+@app.get("/jobs/{job_id}/container")
+async def get_job_container(job_id: str):
+    """The container running (or that ran) a job, looked up by its job label"""
+    await _fresh_index()
+    record = newest_job_container(index.with_label(f"{JOB_LABEL}={job_id}"))
+    if record is None:
+        raise HTTPException(status_code=404, detail="No container for this job")
+    return Response(dumps(record), media_type="application/json")
+
+
+@app.get("/containers/{container_id}/logs")
+async def container_logs(
+    request: Request,
+    container_id: str,
+    follow: bool = Query(False, description="Keep streaming new output until the container stops"),
+    tail: Optional[int] = Query(None, ge=0, description="Only the last N lines of existing output"),
+    since: Optional[float] = Query(None, description="Only output written after this unix time"),
+):
+    """
+    Stream a container's stdout and stderr as plain text with chunked
+    transfer. Once the container is gone, its archived log is served instead
+    (gzip-encoded as stored if the client accepts it; since is ignored).
+    """
+    try:
+        await cm.get_container_async(container_id)
+    except DockerUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except NotFound:
+        path = archiver.find(container_id)
+        if path is None:
+            raise HTTPException(status_code=404, detail="Container not found")
+        compressed = tail is None and "gzip" in request.headers.get("accept-encoding", "")
+        headers = {"X-Log-Source": "archive"}
+        if compressed:
+            headers["Content-Encoding"] = "gzip"
+        return StreamingResponse(archiver.read(path, tail, compressed), media_type="text/plain; charset=utf-8",
+                                 headers=headers)
+
+    return StreamingResponse(cm.container_logs_async(container_id, follow, tail, since),
+                             media_type="text/plain; charset=utf-8", headers={"X-Log-Source": "container"})
+
+
+@app.get("/logs/archive")
+async def log_archive_status():
+    """Archived job logs: whether archiving is on and how many were written, failed and pruned"""
+    return archiver.stats()
+
+
+@app.get("/telemetry/containers")
+async def telemetry_series(
+    since: Optional[float] = Query(None, description="Only points at or after this unix time"),
+    step: int = Query(1, ge=1, description="Merge this many stored points into one"),
+    container: Optional[list[str]] = Query(None, description="Only these containers (id or name)"),
+):
+    """
+    Per-container usage history as columns: {"resolution", "containers": [{id,
+    name, image, job, t: [...], cpu_percent: [...], memory_bytes: [...], ...}]}
+    """
+    return Response(dumps(telemetry.query(since, step, container)), media_type="application/json")
+
+
+@app.get("/telemetry/containers/{container}")
+async def telemetry_container(
+    container: str,
+    since: Optional[float] = Query(None, description="Only points at or after this unix time"),
+    step: int = Query(1, ge=1, description="Merge this many stored points into one"),
+):
+    """One container's usage history (by id or name), in the same columnar shape"""
+    series = telemetry.series(container, since, step)
+    if series is None:
+        raise HTTPException(status_code=404, detail="No telemetry for this container")
+    return Response(dumps({"resolution": telemetry.resolution * step, **series}), media_type="application/json")
+
+
+@app.get("/telemetry/summary")
+async def telemetry_summary():
+    """Lifetime usage per container (mean/p95/max CPU, peak memory, IO totals) and collector status"""
+    return Response(dumps({"node_id": NODE_ID, "collector": telemetry.stats(), "containers": telemetry.summaries()}),
+                    media_type="application/json")
+
+
+@app.get("/images")
+async def list_images():
+    """Local image inventory and which warm-set images are still missing"""
+    return warmer.stats()
+
+
+@app.get("/images/pulls")
+async def image_pulls(image: Optional[str] = Query(None, description="Progress of this image's pull only")):
+    """Progress of image pulls started by this agent (warm-up or on demand)"""
+    if image is None:
+        return warmer.progress()
+    progress = warmer.progress(image)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="No pull for this image")
+    return progress
+
+
+@app.post("/images/pull")
+async def pull_image(image: str = Query(..., description="Docker image")):
+    """Start pulling an image in the background; poll /images/pulls for progress"""
+    try:
+        warmer.pull(image)
+    except SecurityError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return warmer.progress(image)
+
+
+@app.get("/pool")
+async def pool_status():
+    """Warm container pool: idle containers per image, hit/miss counts and claim latency"""
+    return pool.stats()
+
+
+@app.get("/reaper")
+async def reaper_status():
+    """Retention runs so far and what the last one removed"""
+    return reaper.stats()
+
+
+@app.post("/reaper/run")
+async def run_reaper():
+    """Apply the retention policy now instead of waiting for the next interval"""
     try:
-        containers = await cm.list_containers_async(all=all)
-        return [
-            {
-                "id": c.id,
-                "name": getattr(c, "name", None),
-                "status": getattr(c, "status", None),
-                "image": (getattr(c.image, "tags", None) or ["<none>"])[0] if hasattr(c, "image") else "<none>"
-            }
-            for c in containers
-        ]
+        return await reaper.reap()
     except DockerUnavailable as e:
         raise HTTPException(status_code=503, detail=str(e))
 
@@ -83,6 +490,7 @@ async def delete_container(container_id: str):
     """Stop and remove a container on this node"""
     try:
         result = await cm.stop_container_async(container_id, remove=True)
+        _mark_index_dirty()
         return result
     except DockerUnavailable as e:
         raise HTTPException(status_code=503, detail=str(e))
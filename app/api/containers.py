@@ -1,78 +1,143 @@
 # app/api/containers.py
 from __future__ import annotations
 
-import httpx
-from fastapi import APIRouter, HTTPException, Query
+import asyncio
+import os
+import time
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
 from docker.errors import APIError, NotFound
 
 from orchestrator.container_manager import DockerUnavailable
-from orchestrator import container_manager
-from database import get_collection
+from orchestrator import container_manager, node_manager, cluster_state
+from orchestrator.container_record import as_record, dumps
+from orchestrator.revision_index import etag_matches
 
 router = APIRouter()
 
+# Overall time budget for a cluster-wide listing, and max agents queried at once
+LIST_DEADLINE = float(os.getenv("CONTAINER_LIST_DEADLINE", "3.0"))
+LIST_CONCURRENCY = int(os.getenv("CONTAINER_LIST_CONCURRENCY", "32"))
 
-def _serialize(c, node_id: str = None) -> dict:
-    """Convert a Docker SDK Container to a small, FE-friendly dict."""
-    name = None
-    try:
-        name = getattr(c, "name", None)
-        if not name:
-            c.reload()
-            name = (c.attrs.get("Name", "") or "").lstrip("/")
-    except Exception:
-        name = None
-
-    image = "<none>"
-    try:
-        tags = getattr(c.image, "tags", None)
-        if tags:
-            image = tags[0]
-    except Exception:
-        pass
 
-    status = None
-    try:
-        status = getattr(c, "status", None)
-    except Exception:
-        pass
-
-    result = {"id": c.id, "name": name, "image": image, "status": status}
+def _serialize(c, node_id: str = None) -> dict:
+    """Convert a container from any Docker backend to a small, FE-friendly dict."""
+    result = as_record(c).to_dict()
     if node_id:
         result["node_id"] = node_id
     return result
 
 
-@router.get("/", summary="List Containers")
-@router.get("", summary="List Containers")
-async def list_containers(all: bool = Query(True, description="Include stopped/exited containers")):
-    all_containers = []
+def _visible(containers: list[dict], all: bool) -> list[dict]:
+    if all:
+        return containers
+    return [c for c in containers if (c.get("status") or "").lower().startswith(("up", "running"))]
 
-    # Get local orchestrator containers
+
+async def _list_node(node_id: str, node: dict, all: bool, limit: asyncio.Semaphore) -> dict:
+    """Bring one node's cached containers up to date; returns a per-node result record."""
+    if node.get("status") == "offline":
+        return {"node_id": node_id, "status": "offline", "containers": []}
+    async with limit:
+        try:
+            await cluster_state.sync_node(node_id, node)
+        except Exception as e:
+            return {"node_id": node_id, "status": "error", "error": str(e), "containers": []}
+    return {"node_id": node_id, "status": "ok", "containers": _visible(cluster_state.containers(node_id), all)}
+
+
+async def _list_local(all: bool) -> dict:
     try:
-        local_items = await container_manager.list_containers_async(all=all)
-        for c in local_items:
-            container = _serialize(c, node_id="orchestrator")
-            all_containers.append(container)
+        local_items = await container_manager.list_containers_async(all=True)
     except DockerUnavailable:
-        pass
-
-    # Get containers from all registered nodes
-    nodes = list(get_collection("nodes").find())
-    async with httpx.AsyncClient(timeout=5.0) as client:
-        for node in nodes:
-            try:
-                url = f"http://{node['ip']}:{node['port']}/containers?all={str(all).lower()}"
-                resp = await client.get(url)
-                if resp.status_code == 200:
-                    containers = resp.json()
-                    for c in containers:
-                        c["node_id"] = node["id"]
-                        all_containers.append(c)
-            except Exception:
-                pass
-
-    return all_containers
+        # The orchestrator host running without Docker is normal, not a failure
+        local_items = []
+    cluster_state.apply("orchestrator", [_serialize(c, node_id="orchestrator") for c in local_items])
+    return {"node_id": "orchestrator", "status": "ok", "containers": _visible(cluster_state.containers("orchestrator"), all)}
+
+
+async def _fan_out(all: bool, deadline: float):
+    """
+    Query the local daemon and every registered agent concurrently, yielding
+    each node's result as it arrives. Nodes that miss the deadline are
+    yielded last with status "timeout" and their last cached containers.
+    """
+    limit = asyncio.Semaphore(LIST_CONCURRENCY)
+    tasks = {asyncio.create_task(_list_local(all)): "orchestrator"}
+    for node_id, node in list(node_manager.list_nodes().items()):
+        tasks[asyncio.create_task(_list_node(node_id, node, all, limit))] = node_id
+
+    pending = set(tasks)
+    stop_at = time.monotonic() + deadline
+    try:
+        while pending:
+            remaining = stop_at - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+    for task in pending:
+        node_id = tasks[task]
+        yield {"node_id": node_id, "status": "timeout", "containers": _visible(cluster_state.containers(node_id), all)}
+
+
+@router.get("/", summary="List Containers")
+@router.get("", summary="List Containers")
+async def list_containers(
+    request: Request,
+    all: bool = Query(True, description="Include stopped/exited containers"),
+    stream: bool = Query(False, description="Stream one NDJSON record per node as it answers"),
+    deadline: float = Query(LIST_DEADLINE, gt=0, le=30, description="Overall time budget in seconds"),
+    since: int | None = Query(None, description="Return only changes after this revision (ignores all/stream)"),
+    epoch: str | None = Query(None, description="Epoch the since revision belongs to"),
+):
+    """
+    List containers across the cluster. Agents are queried concurrently under
+    a global deadline; the result is partial when some nodes don't answer in
+    time (listed in the X-Timed-Out-Nodes / X-Failed-Nodes headers).
+    Supports If-None-Match, and `since` for {epoch, revision, full, containers, removed} deltas.
+    """
+    if stream and since is None:
+        async def records():
+            async for result in _fan_out(all, deadline):
+                yield dumps(result) + b"\n"
+
+        return StreamingResponse(records(), media_type="application/x-ndjson")
+
+    results = []
+    timed_out = []
+    failed = []
+    async for result in _fan_out(all, deadline):
+        results.append(result)
+        if result["status"] == "timeout":
+            timed_out.append(result["node_id"])
+        elif result["status"] != "ok":
+            failed.append(result["node_id"])
+
+    headers = {}
+    if timed_out:
+        headers["X-Timed-Out-Nodes"] = ",".join(timed_out)
+    if failed:
+        headers["X-Failed-Nodes"] = ",".join(failed)
+
+    if since is not None:
+        headers["ETag"] = cluster_state.changes.etag()
+    else:
+        listed = sorted(r["node_id"] for r in results if r["status"] in ("ok", "timeout"))
+        headers["ETag"] = cluster_state.etag(listed, "all" if all else "running")
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    if since is not None:
+        body = cluster_state.changes.delta(since, epoch)
+    else:
+        body = [c for r in results for c in r["containers"]]
+    return Response(dumps(body), media_type="application/json", headers=headers)
 
 
 @router.get("/{container_id}", summary="Get Container")
@@ -0,0 +1,108 @@
+# app/api/events.py
+import asyncio
+import json
+import os
+from typing import Optional
+from fastapi import APIRouter, Header, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+import repository
+from orchestrator import scheduler, event_bus
+
+router = APIRouter()
+
+# Comment line sent on idle streams so proxies don't close them
+SSE_KEEPALIVE = float(os.getenv("SSE_KEEPALIVE", "15"))
+
+
+class ContainerEvent(BaseModel):
+    container_id: Optional[str] = None
+    name: Optional[str] = None
+    image: Optional[str] = None
+    action: str
+    exit_code: Optional[int] = None
+    time: Optional[int] = None
+
+
+class ContainerEventBatch(BaseModel):
+    node_id: Optional[str] = None
+    events: list[ContainerEvent]
+
+
+def job_status_from_event(event: ContainerEvent) -> tuple[str, list[str]] | None:
+    """
+    Map a container lifecycle event to (new job status, statuses it may replace).
+    Returns None for events that don't change job state.
+    """
+    if event.action == "start":
+        return "running", ["pending"]
+    if event.action == "oom":
+        return "failed", ["pending", "running"]
+    if event.action == "die":
+        new_status = "completed" if event.exit_code == 0 else "failed"
+        return new_status, ["pending", "running"]
+    return None
+
+
+@router.post("/containers")
+async def receive_container_events(batch: ContainerEventBatch):
+    """Apply container lifecycle events pushed by a node agent to the jobs collection"""
+    transitions = []
+    for event in batch.events:
+        if not event.name or not event.name.startswith("job-"):
+            continue
+        transition = job_status_from_event(event)
+        if transition is None:
+            continue
+        new_status, from_statuses = transition
+        job_id = event.name[len("job-"):]
+        transitions.append((job_id, new_status, from_statuses))
+
+    # Only transitions that changed a job count: a repeated or late event
+    # must not release capacity twice or announce a status the job doesn't have
+    applied = await repository.apply_status_transitions(transitions)
+
+    # Finished jobs give their requested CPU/memory back to the scheduler
+    finished = [(job_id, status) for job_id, status in applied if status in ("completed", "failed")]
+    for job_id, _ in finished:
+        scheduler.release(job_id)
+
+    # "running" is already published by whoever deployed the job
+    if finished:
+        event_bus.publish("jobs", {"jobs": [{"id": job_id, "status": status} for job_id, status in finished],
+                                   "removed": []})
+
+    return {"received": len(batch.events), "applied": len(applied)}
+
+
+def format_sse(event_id: int, topic: str, data) -> str:
+    return f"id: {event_id}\nevent: {topic}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@router.get("/stream")
+async def stream_events(request: Request, last_event_id: Optional[int] = Header(None)):
+    """
+    Server-sent events with live "nodes", "containers" and "jobs" deltas.
+    A "resync" event means the client missed updates and should reload.
+    Reconnects resume from Last-Event-ID while it is still buffered.
+    """
+    queue = event_bus.subscribe(last_event_id)
+
+    async def events():
+        try:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event_id, topic, data = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_sse(event_id, topic, data)
+        finally:
+            event_bus.unsubscribe(queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
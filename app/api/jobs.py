@@ -1,42 +1,97 @@
 # app/api/jobs.py
-from fastapi import APIRouter, HTTPException
-import httpx
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from contextlib import AsyncExitStack
 import asyncio
+import base64
+import json
+import httpx
+from datetime import datetime
+from typing import Optional
 from orchestrator.models import Job, Node
-from database import get_collection
-from orchestrator import scheduler, node_manager
+import repository
+from orchestrator import scheduler, node_manager, agent_client, dispatcher, event_bus
+from orchestrator.dispatcher import deploy_query, deploy_to_node
+from orchestrator.node_manager import online_nodes
 
 router = APIRouter()
 
+# GET /jobs pages newest first; (submitted_at, id) is the keyset
+LIST_SORT = [("submitted_at", -1), ("id", -1)]
+MAX_PAGE_SIZE = 1000
+
+
+def _publish(jobs: list[Job]):
+    """Push new job states to live subscribers."""
+    event_bus.publish("jobs", {"jobs": [job.model_dump(mode="json") for job in jobs], "removed": []})
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def encode_cursor(doc: dict) -> str:
+    submitted_at = doc.get("submitted_at")
+    payload = [submitted_at.isoformat() if submitted_at else None, doc["id"]]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime | None, str]:
+    try:
+        submitted_at, job_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return (datetime.fromisoformat(submitted_at) if submitted_at else None), job_id
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def build_job_filter(status=None, node_id=None, image=None, submitted_after=None, submitted_before=None) -> dict:
+    query = {}
+    if status:
+        query["status"] = status
+    if node_id:
+        query["node_id"] = node_id
+    if image:
+        query["image"] = image
+    if submitted_after or submitted_before:
+        query["submitted_at"] = {}
+        if submitted_after:
+            query["submitted_at"]["$gte"] = submitted_after
+        if submitted_before:
+            query["submitted_at"]["$lt"] = submitted_before
+    return query
+
+
+def after_cursor(query: dict, cursor: str) -> dict:
+    """Restrict a filter to jobs that sort after the cursor position."""
+    submitted_at, job_id = decode_cursor(cursor)
+    if submitted_at is None:
+        # Legacy jobs without submitted_at sort last, ordered by id only
+        keyset = {"submitted_at": None, "id": {"$lt": job_id}}
+    else:
+        keyset = {"$or": [
+            {"submitted_at": {"$lt": submitted_at}},
+            {"submitted_at": submitted_at, "id": {"$lt": job_id}},
+            {"submitted_at": None},
+        ]}
+    return {"$and": [query, keyset]} if query else keyset
+
 
 @router.post("/", response_model=Job)
 @router.post("", response_model=Job)
 async def submit_job(job: Job):
     """Submit a job and deploy to available node"""
-    jobs_collection = get_collection("jobs")
+    job.submitted_at = job.submitted_at or datetime.utcnow()
 
     # Get available nodes asynchronously
     nodes_dict = await node_manager.list_nodes_async()
-    available_nodes = [
-        Node(
-            id=nid,
-            ip=spec["ip"],
-            port=spec["port"],
-            cpu=spec["cpu"],
-            memory=spec["memory"],
-            status=spec.get("status", "unknown"),
-            cpu_percent=spec.get("cpu_percent"),
-            memory_percent=spec.get("memory_percent")
-        )
-        for nid, spec in nodes_dict.items()
-        if spec.get("status") == "online"
-    ]
+    available_nodes = online_nodes(nodes_dict)
 
     if not available_nodes:
         job.status = "pending"
-        # Store in DB using thread executor to avoid blocking
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(None, lambda: jobs_collection.insert_one(job.dict()))
+        await repository.insert_job(job.dict())
+        _publish([job])
         return job
 
     # Schedule job to a node
@@ -44,69 +99,239 @@ async def submit_job(job: Job):
 
     if target_node:
         job.node_id = target_node.id
+        job.assigned_at = datetime.utcnow()
+        # Stored before the deploy so the agent's start/die events find the job;
+        # its node_id keeps the dispatcher from deploying it a second time
+        job.status = "pending"
+        await repository.insert_job(job.dict())
         # Deploy container to remote node
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                url = f"http://{target_node.ip}:{target_node.port}/containers"
-                params = {"image": job.image, "name": f"job-{job.id}"}
-                if job.command:
-                    params["command"] = job.command
-                resp = await client.post(url, params=params)
-
-                if resp.status_code == 200:
-                    job.status = "running"
-                    container_info = resp.json()
-                    # You could store container_info in job if needed
-                else:
-                    job.status = "failed"
+            resp = await agent_client.post(target_node, "/containers", op="deploy", params=deploy_query(job))
+
+            if resp.status_code == 200:
+                job.status = "running"
+                container_info = resp.json()
+                # You could store container_info in job if needed
+            else:
+                job.status = "failed"
         except Exception as e:
             print(f"Failed to deploy job {job.id}: {e}")
             job.status = "failed"
+        # Same outcome handling as queued deploys: a failure is retried by the dispatcher
+        await dispatcher.settle([job])
     else:
         job.status = "pending"
-
-    # Store job in database
-    loop = asyncio.get_event_loop()
-    await loop.run_in_executor(None, lambda: jobs_collection.insert_one(job.dict()))
+        await repository.insert_job(job.dict())
+        _publish([job])
 
     return job
 
 
-@router.get("/", response_model=list[Job])
-@router.get("", response_model=list[Job])
-async def list_jobs():
-    """List all jobs"""
-    jobs_collection = get_collection("jobs")
-    
-    # Run MongoDB query in thread pool to avoid blocking
-    loop = asyncio.get_event_loop()
-    jobs = await loop.run_in_executor(None, lambda: list(jobs_collection.find({})))
-    
-    return [Job(**j) for j in jobs]
+async def _deploy_group(node: Node, jobs: list[Job]) -> list[Job]:
+    """
+    Store every job assigned to one node with a single insert_many, deploy
+    them, then let the dispatcher record the outcomes and retry failures.
+    Inserting first means the agent's events for these containers always
+    find their jobs.
+    """
+    assigned_at = datetime.utcnow()
+    for job in jobs:
+        job.status = "pending"
+        job.node_id = node.id
+        job.assigned_at = assigned_at
+    await repository.insert_jobs([job.dict() for job in jobs])
+
+    await deploy_to_node(agent_client, node, jobs)
+    await dispatcher.settle(jobs)
+    return jobs
+
+
+async def _store_pending(jobs: list[Job]) -> list[Job]:
+    for job in jobs:
+        job.status = "pending"
+        job.node_id = None
+    await repository.insert_jobs([job.dict() for job in jobs])
+    _publish(jobs)
+    return jobs
+
+
+@router.post("/batch")
+async def submit_jobs_batch(jobs: list[Job]):
+    """
+    Submit many jobs at once. Uses one node snapshot and one scheduling pass,
+    sends one bulk deploy request per node and streams back one NDJSON line per job.
+    """
+    submitted_at = datetime.utcnow()
+    for job in jobs:
+        job.submitted_at = job.submitted_at or submitted_at
+
+    nodes_dict = await node_manager.list_nodes_async()
+    available_nodes = online_nodes(nodes_dict)
+
+    assignments, unscheduled = scheduler.schedule_batch(jobs, available_nodes)
+
+    tasks = [
+        asyncio.create_task(_deploy_group(node, group))
+        for node, group in assignments.values()
+    ]
+    if unscheduled:
+        tasks.append(asyncio.create_task(_store_pending(unscheduled)))
+
+    async def results():
+        for finished in asyncio.as_completed(tasks):
+            try:
+                group = await finished
+            except Exception as e:
+                yield json.dumps({"status": "error", "detail": str(e)}) + "\n"
+                continue
+            for job in group:
+                yield json.dumps({"id": job.id, "status": job.status, "node_id": job.node_id}) + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+
+@router.get("/")
+@router.get("")
+async def list_jobs(
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE, description="Page size"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    status: Optional[str] = Query(None),
+    node_id: Optional[str] = Query(None),
+    image: Optional[str] = Query(None),
+    submitted_after: Optional[datetime] = Query(None),
+    submitted_before: Optional[datetime] = Query(None),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. id,status"),
+):
+    """
+    List jobs newest first, one page at a time. The page is streamed as
+    {"items": [...], "next_cursor": ...}; pass next_cursor back to get the next page.
+    """
+    query = build_job_filter(status, node_id, image, submitted_after, submitted_before)
+    if cursor:
+        query = after_cursor(query, cursor)
+
+    projection = {"_id": 0}
+    if fields:
+        for field in fields.split(","):
+            if field.strip():
+                projection[field.strip()] = 1
+        # The keyset is always needed to build next_cursor
+        projection["id"] = 1
+        projection["submitted_at"] = 1
+
+    async def body():
+        yield '{"items":['
+        count = 0
+        last = None
+        more = False
+        # Fetch one extra row to know whether another page exists
+        async for doc in repository.iter_jobs(query, LIST_SORT, limit + 1, projection):
+            if count == limit:
+                more = True
+                break
+            yield ("," if count else "") + json.dumps(doc, default=_json_default)
+            count += 1
+            last = doc
+        next_cursor = encode_cursor(last) if more else None
+        yield '],"next_cursor":' + json.dumps(next_cursor) + "}"
+
+    return StreamingResponse(body(), media_type="application/json")
+
+
+@router.get("/summary")
+async def jobs_summary(
+    node_id: Optional[str] = Query(None),
+    image: Optional[str] = Query(None),
+    submitted_after: Optional[datetime] = Query(None),
+    submitted_before: Optional[datetime] = Query(None),
+):
+    """Job counts per status, computed server-side"""
+    query = build_job_filter(None, node_id, image, submitted_after, submitted_before)
+    by_status = await repository.count_jobs_by_status(query)
+    return {"total": sum(by_status.values()), "by_status": by_status}
+
+
+@router.get("/queue")
+async def get_queue():
+    """Pending job count and dispatcher statistics"""
+    pending = await repository.count_jobs({"status": "pending"})
+    return {"pending": pending, "dispatcher": dispatcher.stats()}
 
 
 @router.get("/{job_id}", response_model=Job)
 async def get_job(job_id: str):
     """Get single job"""
-    jobs_collection = get_collection("jobs")
-    
-    loop = asyncio.get_event_loop()
-    job = await loop.run_in_executor(None, lambda: jobs_collection.find_one({"id": job_id}))
-    
+    job = await repository.get_job(job_id)
+
     if job is None:
         raise HTTPException(status_code=404, detail="Job not found")
     
     return Job(**job)
 
 
+@router.get("/{job_id}/logs")
+async def get_job_logs(
+    request: Request,
+    job_id: str,
+    follow: bool = Query(False, description="Keep streaming new output until the job's container stops"),
+    tail: Optional[int] = Query(None, ge=0, description="Only the last N lines of existing output"),
+    since: Optional[float] = Query(None, description="Only output written after this unix time"),
+):
+    """
+    Stream a job's stdout/stderr from the agent on its node. Chunks are
+    relayed as they arrive and never buffered here, so a follow stream or a
+    large log costs the orchestrator no more memory than a small one.
+    """
+    job = await repository.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not job.get("node_id"):
+        raise HTTPException(status_code=404, detail="Job has not been deployed to a node")
+
+    nodes_dict = await node_manager.list_nodes_async()
+    node_spec = nodes_dict.get(job["node_id"])
+    if node_spec is None:
+        raise HTTPException(status_code=503, detail=f"Node {job['node_id']} is not registered")
+
+    params = {"follow": follow}
+    if tail is not None:
+        params["tail"] = tail
+    if since is not None:
+        params["since"] = since
+    # Pass the client's encodings through so an archived log can stay gzipped end to end
+    headers = {"Accept-Encoding": request.headers.get("accept-encoding", "identity")}
+
+    upstream = AsyncExitStack()
+    try:
+        resp = await upstream.enter_async_context(
+            agent_client.stream(node_spec, "GET", f"/containers/job-{job_id}/logs", params=params, headers=headers)
+        )
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail=f"Node {job['node_id']} unreachable: {e}")
+
+    if resp.status_code != 200:
+        await resp.aread()
+        await upstream.aclose()
+        if resp.status_code == 404:
+            raise HTTPException(status_code=404, detail="No logs for this job on its node")
+        raise HTTPException(status_code=502, detail=f"Agent answered {resp.status_code}: {resp.text}")
+
+    async def relay():
+        try:
+            async for chunk in resp.aiter_raw():
+                yield chunk
+        finally:
+            await upstream.aclose()
+
+    relayed = {name: resp.headers[name] for name in ("content-encoding", "x-log-source") if name in resp.headers}
+    return StreamingResponse(relay(), media_type=resp.headers.get("content-type", "text/plain"), headers=relayed)
+
+
 @router.delete("/{job_id}")
 async def delete_job(job_id: str):
     """Delete a job and its container"""
-    jobs_collection = get_collection("jobs")
-
     # First, get the job to find which node it's on
-    loop = asyncio.get_event_loop()
-    job = await loop.run_in_executor(None, lambda: jobs_collection.find_one({"id": job_id}))
+    job = await repository.get_job(job_id)
 
     if job is None:
         raise HTTPException(status_code=404, detail="Job not found")
@@ -119,14 +344,15 @@ async def delete_job(job_id: str):
         if node_spec and node_spec.get("status") == "online":
             try:
                 container_name = f"job-{job_id}"
-                async with httpx.AsyncClient(timeout=10.0) as client:
-                    url = f"http://{node_spec['ip']}:{node_spec['port']}/containers/{container_name}"
-                    await client.delete(url)
+                await agent_client.delete(node_spec, f"/containers/{container_name}")
             except Exception as e:
                 print(f"Warning: Failed to delete container for job {job_id}: {e}")
                 # Continue with job deletion even if container deletion fails
 
+    scheduler.release(job_id)
+
     # Delete job from database
-    res = await loop.run_in_executor(None, lambda: jobs_collection.delete_one({"id": job_id}))
+    await repository.delete_job(job_id)
+    event_bus.publish("jobs", {"jobs": [], "removed": [job_id]})
 
     return {"status": "deleted", "id": job_id}
\ No newline at end of file
@@ -1,16 +1,18 @@
 # app/api/nodes.py
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, Response
 from orchestrator.models import Node
-from orchestrator import node_manager
+from orchestrator import node_manager, agent_client, cluster_state
+from orchestrator.revision_index import etag_matches
 
 router = APIRouter()
 
 
 @router.post("/", response_model=Node)
 @router.post("", response_model=Node)
-def register_node(node: Node):
+async def register_node(node: Node):
     """Register a new node"""
-    node_manager.register_node(node.id, {
+    await node_manager.register_node_async(node.id, {
         "ip": node.ip,
         "port": node.port,
         "cpu": node.cpu,
@@ -19,31 +21,32 @@ def register_node(node: Node):
     return node
 
 
-@router.get("/", response_model=list[Node])
-@router.get("", response_model=list[Node])
-async def list_nodes():
-    """List all nodes with current health status"""
-    nodes_dict = await node_manager.list_nodes_async()
-    nodes = []
-    for nid, spec in nodes_dict.items():
-        nodes.append(Node(
-            id=nid, 
-            ip=spec["ip"], 
-            port=spec["port"], 
-            cpu=spec["cpu"], 
-            memory=spec["memory"],
-            status=spec.get("status", "unknown"), 
-            last_seen=spec.get("last_seen"),
-            cpu_percent=spec.get("cpu_percent", 0), 
-            memory_percent=spec.get("memory_percent", 0)
-        ))
-    return nodes
+@router.get("/")
+@router.get("")
+async def list_nodes(
+    request: Request,
+    refresh: bool = Query(False, description="Probe every node now instead of using the health snapshot"),
+    since: int | None = Query(None, description="Return only changes after this revision"),
+    epoch: str | None = Query(None, description="Epoch the since revision belongs to"),
+):
+    """
+    List all nodes with their latest health snapshot. Supports If-None-Match,
+    and `since` for {epoch, revision, full, nodes, removed} deltas.
+    """
+    await node_manager.list_nodes_async(refresh=refresh)
+    node_index = node_manager.track_changes()
+
+    etag = node_index.etag()
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    body = node_index.delta(since, epoch) if since is not None else node_index.records()
+    return JSONResponse(body, headers={"ETag": etag})
 
 
 @router.get("/{node_id}", response_model=Node)
-async def get_node(node_id: str):
-    """Get single node with refreshed health"""
-    node_data = await node_manager.get_node_async(node_id)
+async def get_node(node_id: str, refresh: bool = Query(False, description="Probe the node now instead of using the health snapshot")):
+    """Get single node with its latest health snapshot"""
+    node_data = await node_manager.get_node_async(node_id, refresh=refresh)
     if node_data is None:
         raise HTTPException(status_code=404, detail="Node not found")
     
@@ -61,9 +64,11 @@ async def get_node(node_id: str):
 
 
 @router.delete("/{node_id}")
-def deregister_node(node_id: str):
+async def deregister_node(node_id: str):
     """Deregister a node"""
-    deleted = node_manager.remove_node(node_id)
+    deleted = await node_manager.remove_node_async(node_id)
     if deleted is None:
         raise HTTPException(status_code=404, detail="Node not found")
+    await agent_client.close_node(deleted)
+    cluster_state.forget_node(node_id)
     return {"status": "deleted", "id": node_id}
\ No newline at end of file
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from orchestrator import scheduler
+from orchestrator.scheduler import STRATEGIES
 
 router = APIRouter()
 
@@ -13,10 +14,16 @@ class SchedulerSettings(BaseModel):
 def get_scheduler_settings():
     return {
         "strategy": scheduler.get_strategy(),
-        "available_strategies": ["first_fit", "round_robin", "resource_aware"]
+        "available_strategies": STRATEGIES
     }
 
 
+@router.get("/scheduler/allocations")
+def get_scheduler_allocations():
+    """Requested CPU/memory currently allocated on each node"""
+    return scheduler.allocations()
+
+
 @router.put("/scheduler")
 def update_scheduler_settings(settings: SchedulerSettings):
     try:
@@ -0,0 +1,52 @@
+# app/api/telemetry.py
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import Response
+from typing import Optional
+import repository
+from orchestrator import node_manager, agent_client, telemetry
+
+router = APIRouter()
+
+
+@router.get("/nodes")
+async def telemetry_nodes():
+    """Current CPU and memory use per node, summed over its running containers, with per-container detail"""
+    return telemetry.nodes()
+
+
+@router.get("/images")
+async def telemetry_images():
+    """Per-image usage of finished jobs against their limits, with recommended cpus/memory_mb"""
+    return telemetry.profiles()
+
+
+@router.get("/jobs/{job_id}")
+async def telemetry_job(
+    job_id: str,
+    since: Optional[float] = Query(None, description="Only points at or after this unix time"),
+    step: int = Query(1, ge=1, description="Merge this many stored points into one"),
+):
+    """A job's usage history from the agent on its node, as columns (t, cpu_percent, memory_bytes, ...)"""
+    job = await repository.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not job.get("node_id"):
+        raise HTTPException(status_code=404, detail="Job has not been deployed to a node")
+
+    nodes_dict = await node_manager.list_nodes_async()
+    node_spec = nodes_dict.get(job["node_id"])
+    if node_spec is None:
+        raise HTTPException(status_code=503, detail=f"Node {job['node_id']} is not registered")
+
+    params = {"step": step}
+    if since is not None:
+        params["since"] = since
+    try:
+        resp = await agent_client.get(node_spec, f"/telemetry/containers/job-{job_id}", op="list", params=params)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Node {job['node_id']} unreachable: {e}")
+    if resp.status_code == 404:
+        raise HTTPException(status_code=404, detail="No telemetry for this job on its node")
+    if resp.status_code != 200:
+        raise HTTPException(status_code=502, detail=f"Agent answered {resp.status_code}: {resp.text}")
+    return Response(resp.content, media_type="application/json")
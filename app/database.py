@@ -1,14 +1,56 @@
-from pymongo import MongoClient
+import os
+from pymongo import AsyncMongoClient, ASCENDING, DESCENDING
+
+MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
+MONGO_DB = os.getenv("MONGO_DB", "orchestrator")
+
+# Connection pool sizing
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "5"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "60000"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "5000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
 
 client = None
 db = None
 
-def init_db():
+
+async def init_db():
     global client, db
-    client = MongoClient("mongodb://localhost:27017")
-    db = client["orchestrator"]
+    client = AsyncMongoClient(
+        MONGO_URL,
+        maxPoolSize=MONGO_MAX_POOL_SIZE,
+        minPoolSize=MONGO_MIN_POOL_SIZE,
+        maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+        waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    )
+    db = client[MONGO_DB]
     print("Connected to MongoDB")
-    
+    await create_indexes()
+
+
+async def create_indexes():
+    jobs = db["jobs"]
+    await jobs.create_index([("id", ASCENDING)])
+    await jobs.create_index([("status", ASCENDING)])
+    await jobs.create_index([("node_id", ASCENDING)])
+    # Pending-job queue is read in (priority desc, submitted_at asc) order
+    await jobs.create_index([("status", ASCENDING), ("priority", DESCENDING), ("submitted_at", ASCENDING)])
+    # Keyset pagination for GET /jobs (newest first), optionally filtered by status
+    await jobs.create_index([("submitted_at", DESCENDING), ("id", DESCENDING)])
+    await jobs.create_index([("status", ASCENDING), ("submitted_at", DESCENDING), ("id", DESCENDING)])
+    await db["nodes"].create_index([("id", ASCENDING)], unique=True)
+
+
+async def close_db():
+    global client, db
+    if client is not None:
+        await client.close()
+    client = None
+    db = None
+
+
 def get_collection(name: str):
     if db is None:
         raise RuntimeError("Database not initialized. Call init_db() first.")
@@ -1,77 +1,105 @@
 # app/main.py
 from contextlib import asynccontextmanager
 import asyncio
+import os
+from datetime import datetime, timedelta
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-import httpx
-from api import nodes, containers, jobs, settings
-from orchestrator import node_manager, container_manager
+from api import nodes, containers, jobs, settings, events, telemetry as telemetry_api
+from database import init_db, close_db
+import repository
+from orchestrator import (
+    node_manager, container_manager, agent_client, scheduler, dispatcher, cluster_state, event_bus, live_updates,
+    telemetry,
+)
+from orchestrator.container_record import finished_job_status
+from orchestrator.models import Job
+
+# Agents push container lifecycle events to /events/containers, so this sweep is
+# only a reconciliation fallback for missed events and agents without a push URL.
+RECONCILE_INTERVAL = float(os.getenv("RECONCILE_INTERVAL", "300"))
+# Seconds a pending job may sit assigned to a node before reconciliation checks that node for it
+DEPLOY_STALE_AFTER = float(os.getenv("DEPLOY_STALE_AFTER", "600"))
 
 # Background task control
 _background_task = None
 _shutdown_event = None
 
 
-async def sync_job_statuses():
-    """Background task: sync job statuses and cleanup old containers"""
-    from database import get_collection
+async def reconcile_jobs():
+    """
+    One reconciliation pass against the agents' containers: finish running
+    jobs whose container stopped or disappeared, and settle jobs left pending on a node
+    (orchestrator restarted mid-deploy, start event lost): a container found
+    for them moves them on, none puts them back in the queue.
+    """
+    # Read before the container sync, so these jobs' containers existed when it ran
+    running_jobs = await repository.find_jobs({"status": "running"})
+    stale = datetime.utcnow() - timedelta(seconds=DEPLOY_STALE_AFTER)
+    deploying = await repository.find_jobs({"status": "pending", "node_id": {"$ne": None},
+                                            "assigned_at": {"$lt": stale}})
+
+    nodes_dict = await node_manager.list_nodes_async()
+    # One delta pull per node refreshes the container index
+    failed = await cluster_state.sync_all(nodes_dict)
+    for nid, error in failed.items():
+        print(f"Failed to sync containers from {nid}: {error}")
+
+    def synced(node_id) -> bool:
+        node_spec = nodes_dict.get(node_id)
+        return bool(node_id) and node_id not in failed and bool(node_spec) and node_spec.get("status") == "online"
+
+    transitions = []
+    for job in running_jobs:
+        if not synced(job.get("node_id")):
+            continue
+        c = cluster_state.find_by_job(job["id"], job["node_id"])
+        # Its container existed when the job was read; gone now means the
+        # node reaped it before its exit was seen, so the outcome is lost
+        new_status = finished_job_status(c) if c is not None else "failed"
+        if new_status:
+            transitions.append((job["id"], new_status, ["running"]))
+
+    requeue = []
+    for job in deploying:
+        if not synced(job["node_id"]):
+            continue
+        c = cluster_state.find_by_job(job["id"], job["node_id"])
+        if c is None:
+            requeue.append((job["id"], job["node_id"]))
+        else:
+            transitions.append((job["id"], finished_job_status(c) or "running", ["pending"]))
+
+    applied = await repository.apply_status_transitions(transitions)
+    placed = {job["id"]: job for job in deploying}
+    for job_id, status in applied:
+        if status in ("completed", "failed"):
+            scheduler.release(job_id)
+        elif job_id in placed:
+            scheduler.restore([Job(**placed[job_id])])
+    requeued = await repository.requeue_jobs(requeue)
+    for job_id in requeued:
+        scheduler.release(job_id)
+    if requeued:
+        dispatcher.notify()
+
+    changed = [{"id": job_id, "status": status} for job_id, status in applied]
+    changed += [{"id": job_id, "status": "pending", "node_id": None} for job_id in requeued]
+    if changed:
+        event_bus.publish("jobs", {"jobs": changed, "removed": []})
+
 
+async def sync_job_statuses():
+    """Background task: reconcile job statuses (agents reap their own exited containers)"""
     while not _shutdown_event.is_set():
         try:
-            jobs_col = get_collection("jobs")
-            nodes_dict = await node_manager.list_nodes_async()
-
-            # Update running jobs based on container status
-            running_jobs = list(jobs_col.find({"status": "running"}))
-
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                for job in running_jobs:
-                    node_id = job.get("node_id")
-                    if not node_id:
-                        continue
-
-                    node_spec = nodes_dict.get(node_id)
-                    if not node_spec or node_spec.get("status") != "online":
-                        continue
-
-                    try:
-                        url = f"http://{node_spec['ip']}:{node_spec['port']}/containers?all=true"
-                        resp = await client.get(url)
-                        if resp.status_code == 200:
-                            for c in resp.json():
-                                if c.get("name") == f"job-{job['id']}":
-                                    status = c.get("status", "").lower()
-                                    if "exited" in status:
-                                        new_status = "completed" if "(0)" in c.get("status", "") else "failed"
-                                        jobs_col.update_one({"id": job["id"]}, {"$set": {"status": new_status}})
-                                    break
-                    except Exception:
-                        pass
-
-                # Auto-cleanup containers exited >1 hour
-                for nid, spec in nodes_dict.items():
-                    if spec.get("status") != "online":
-                        continue
-                    try:
-                        url = f"http://{spec['ip']}:{spec['port']}/containers?all=true"
-                        resp = await client.get(url)
-                        if resp.status_code == 200:
-                            for c in resp.json():
-                                status = c.get("status", "").lower()
-                                if "exited" in status and ("hour" in status or "day" in status):
-                                    try:
-                                        await client.delete(f"http://{spec['ip']}:{spec['port']}/containers/{c['id']}")
-                                    except Exception:
-                                        pass
-                    except Exception:
-                        pass
-
+            await reconcile_jobs()
         except Exception:
             pass
 
-        # Run every 30 seconds
+        # Run every RECONCILE_INTERVAL seconds
         try:
-            await asyncio.wait_for(_shutdown_event.wait(), timeout=30.0)
+            await asyncio.wait_for(_shutdown_event.wait(), timeout=RECONCILE_INTERVAL)
             break
         except asyncio.TimeoutError:
             pass
@@ -85,13 +113,26 @@ async def lifespan(app: FastAPI):
     # Startup
     print("Starting orchestrator...")
 
-    from database import init_db
-    init_db()
+    await init_db()
     print("Database initialized")
 
+    await node_manager.load_from_db()
+
+    try:
+        placed = await repository.find_jobs({"status": "running", "node_id": {"$ne": None}})
+        scheduler.restore([Job(**j) for j in placed])
+    except Exception as e:
+        print(f"Error restoring scheduler allocations: {e}")
+
     node_manager.start_monitoring()
     print("Node monitoring started")
 
+    dispatcher.start()
+    print("Job dispatcher started")
+
+    live_updates.start()
+    telemetry.start()
+
     _shutdown_event = asyncio.Event()
     _background_task = asyncio.create_task(sync_job_statuses())
     print("Job status sync started")
@@ -108,8 +149,13 @@ async def lifespan(app: FastAPI):
         except asyncio.TimeoutError:
             _background_task.cancel()
 
+    await live_updates.stop()
+    await telemetry.stop()
+    await dispatcher.stop()
     await node_manager.shutdown()
-    container_manager.shutdown()
+    await agent_client.aclose()
+    await container_manager.aclose()
+    await close_db()
     print("Cleanup complete")
 
 
@@ -135,6 +181,8 @@ app.include_router(nodes.router, prefix="/nodes", tags=["nodes"])
 app.include_router(containers.router, prefix="/containers", tags=["containers"])
 app.include_router(jobs.router, prefix="/jobs", tags=["jobs"])
 app.include_router(settings.router, prefix="/settings", tags=["settings"])
+app.include_router(events.router, prefix="/events", tags=["events"])
+app.include_router(telemetry_api.router, prefix="/telemetry", tags=["telemetry"])
 
 
 @app.get("/")
@@ -152,3 +200,21 @@ def health():
         "status": "ok",
         "nodes": len(node_manager.list_nodes()),
     }
+
+
+@app.get("/metrics/agent-client")
+def agent_client_metrics():
+    """Connection pool statistics for orchestrator-to-agent traffic"""
+    return agent_client.metrics()
+
+
+@app.get("/metrics/cluster-state")
+def cluster_state_metrics():
+    """Size of the orchestrator's container index and how it has been kept current"""
+    return cluster_state.stats()
+
+
+@app.get("/metrics/events")
+def event_bus_metrics():
+    """Live update subscribers and published event counts"""
+    return event_bus.stats()
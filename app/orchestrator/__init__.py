@@ -2,8 +2,24 @@
 from .node_manager import NodeManager
 from .container_manager import ContainerManager
 from .scheduler import Scheduler
+from .agent_client import AgentClient
+from .dispatcher import Dispatcher
+from .cluster_state import ClusterState
+from .event_bus import EventBus
+from .live_updates import LiveUpdates
+from .telemetry_aggregator import TelemetryAggregator
 
 # Create singleton instances to share across all API routes
-node_manager = NodeManager()
+agent_client = AgentClient()
+node_manager = NodeManager(agent_client=agent_client)
 container_manager = ContainerManager()
-scheduler = Scheduler(strategy="round_robin")  # Distribute jobs evenly across nodes
\ No newline at end of file
+scheduler = Scheduler(strategy="round_robin")  # Distribute jobs evenly across nodes
+event_bus = EventBus()  # Live node/container/job updates for /events/stream
+dispatcher = Dispatcher(node_manager, scheduler, agent_client, event_bus=event_bus)
+cluster_state = ClusterState(agent_client)  # Per-node container index fed by agent deltas
+live_updates = LiveUpdates(event_bus, node_manager, cluster_state)
+telemetry = TelemetryAggregator(agent_client, node_manager)  # Per-node usage and per-image job profiles
+
+# Drain the pending queue whenever a node comes online or capacity is freed
+node_manager.add_online_listener(dispatcher.notify)
+scheduler.add_release_listener(dispatcher.notify)
\ No newline at end of file
@@ -0,0 +1,177 @@
+# app/orchestrator/agent_client.py
+import os
+import time
+from contextlib import asynccontextmanager
+import httpx
+
+# Timeout (seconds) per class of agent operation
+DEFAULT_TIMEOUTS = {
+    "health": float(os.getenv("AGENT_HEALTH_TIMEOUT", "2.0")),
+    "list": float(os.getenv("AGENT_LIST_TIMEOUT", "5.0")),
+    "deploy": float(os.getenv("AGENT_DEPLOY_TIMEOUT", "10.0")),
+    "deploy_batch": float(os.getenv("AGENT_DEPLOY_BATCH_TIMEOUT", "300.0")),
+    "delete": float(os.getenv("AGENT_DELETE_TIMEOUT", "10.0")),
+    # Connecting and getting the headers of a stream; its body has no read timeout
+    "logs": float(os.getenv("AGENT_LOGS_TIMEOUT", "10.0")),
+}
+
+
+def node_base_url(node) -> str:
+    """Base URL of an agent, from a node spec dict or a Node model."""
+    if isinstance(node, dict):
+        return f"http://{node['ip']}:{node['port']}"
+    return f"http://{node.ip}:{node.port}"
+
+
+class AgentClient:
+    """
+    Orchestrator-wide HTTP client for talking to node agents.
+
+    Keeps one keep-alive connection pool per agent so repeated health checks,
+    deploys and listings reuse TCP connections instead of opening new ones.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = int(os.getenv("AGENT_POOL_MAX_CONNECTIONS", "20")),
+        max_keepalive: int = int(os.getenv("AGENT_POOL_MAX_KEEPALIVE", "10")),
+        keepalive_expiry: float = float(os.getenv("AGENT_POOL_KEEPALIVE_EXPIRY", "30")),
+        pool_timeout: float = float(os.getenv("AGENT_POOL_TIMEOUT", "5.0")),
+        timeouts: dict | None = None,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self._pool_timeout = pool_timeout
+        self.timeouts = {**DEFAULT_TIMEOUTS, **(timeouts or {})}
+        self._transport = transport
+        self._clients = {}
+
+        # Pool metrics
+        self._requests = 0
+        self._connections_opened = 0
+        self._wait_time_total = 0.0
+        self._errors = 0
+        # Responses per negotiated protocol ("HTTP/1.1", ...)
+        self._http_versions = {}
+
+    # ---------- private helpers ----------
+
+    def _client_for(self, base_url: str) -> httpx.AsyncClient:
+        client = self._clients.get(base_url)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                base_url=base_url,
+                limits=self._limits,
+                transport=self._transport,
+            )
+            self._clients[base_url] = client
+        return client
+
+    def _timeout_for(self, op: str) -> httpx.Timeout:
+        return httpx.Timeout(self.timeouts.get(op, self.timeouts["list"]), pool=self._pool_timeout)
+
+    def _make_trace(self, started: float):
+        """httpcore trace hook: counts new connections and time until the request is on the wire."""
+        state = {"sent": False}
+
+        async def trace(event: str, info: dict):
+            if event == "connection.connect_tcp.complete":
+                self._connections_opened += 1
+            elif event.endswith("send_request_headers.started") and not state["sent"]:
+                state["sent"] = True
+                self._wait_time_total += time.perf_counter() - started
+
+        return trace
+
+    def _count_version(self, response: httpx.Response):
+        self._http_versions[response.http_version] = self._http_versions.get(response.http_version, 0) + 1
+
+    # ---------- requests ----------
+
+    async def request(self, node, method: str, path: str, op: str = "list", **kwargs) -> httpx.Response:
+        client = self._client_for(node_base_url(node))
+        started = time.perf_counter()
+        self._requests += 1
+        try:
+            response = await client.request(
+                method,
+                path,
+                timeout=self._timeout_for(op),
+                extensions={"trace": self._make_trace(started)},
+                **kwargs,
+            )
+        except Exception:
+            self._errors += 1
+            raise
+        self._count_version(response)
+        return response
+
+    @asynccontextmanager
+    async def stream(self, node, method: str, path: str, op: str = "logs", **kwargs):
+        """
+        Like request(), but yields the response with its body unread, to be
+        consumed incrementally while the context is open. No read timeout:
+        a followed stream may be quiet for as long as the job is.
+        """
+        client = self._client_for(node_base_url(node))
+        started = time.perf_counter()
+        self._requests += 1
+        timeout = httpx.Timeout(self.timeouts.get(op, self.timeouts["list"]), read=None, pool=self._pool_timeout)
+        try:
+            request = client.build_request(method, path, timeout=timeout,
+                                           extensions={"trace": self._make_trace(started)}, **kwargs)
+            response = await client.send(request, stream=True)
+        except Exception:
+            self._errors += 1
+            raise
+        self._count_version(response)
+        try:
+            yield response
+        finally:
+            await response.aclose()
+
+    async def get(self, node, path: str, op: str = "list", **kwargs) -> httpx.Response:
+        return await self.request(node, "GET", path, op=op, **kwargs)
+
+    async def post(self, node, path: str, op: str = "deploy", **kwargs) -> httpx.Response:
+        return await self.request(node, "POST", path, op=op, **kwargs)
+
+    async def delete(self, node, path: str, op: str = "delete", **kwargs) -> httpx.Response:
+        return await self.request(node, "DELETE", path, op=op, **kwargs)
+
+    # ---------- metrics ----------
+
+    def metrics(self) -> dict:
+        reused = max(self._requests - self._connections_opened, 0)
+        return {
+            "pools": len(self._clients),
+            "http_versions": dict(self._http_versions),
+            "requests": self._requests,
+            "errors": self._errors,
+            "connections_opened": self._connections_opened,
+            "reuse_rate": round(reused / self._requests, 4) if self._requests else 0.0,
+            "avg_wait_ms": round(self._wait_time_total / self._requests * 1000, 3) if self._requests else 0.0,
+            "limits": {
+                "max_connections": self._limits.max_connections,
+                "max_keepalive_connections": self._limits.max_keepalive_connections,
+                "keepalive_expiry": self._limits.keepalive_expiry,
+            },
+            "timeouts": dict(self.timeouts),
+        }
+
+    # ---------- cleanup ----------
+
+    async def close_node(self, node):
+        """Drop the connection pool for a node (e.g. when it is deregistered)."""
+        client = self._clients.pop(node_base_url(node), None)
+        if client:
+            await client.aclose()
+
+    async def aclose(self):
+        for client in list(self._clients.values()):
+            await client.aclose()
+        self._clients.clear()
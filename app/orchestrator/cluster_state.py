@@ -0,0 +1,176 @@
+# app/orchestrator/cluster_state.py
+import asyncio
+import hashlib
+import time
+from .container_record import JOB_LABEL, newest_job_container, record_matches
+from .revision_index import RevisionIndex
+
+
+class _NodeContainers:
+    def __init__(self):
+        self.epoch = None
+        self.revision = 0
+        self.etag = None
+        self.by_id = {}
+        self.synced_at = None
+        # Revision of the cluster-wide change log at this node's last change
+        self.version = 0
+
+
+class ClusterState:
+    """
+    Orchestrator-side cache of every agent's containers, indexed by id, name
+    and job id. Kept current with the agents' `/containers?since=` deltas so a
+    steady-state sync moves only what changed.
+    """
+
+    def __init__(self, agent_client):
+        self._agent_client = agent_client
+        self._nodes = {}
+        self._by_name = {}
+        # Cluster-wide change log, served to clients as ?since= deltas
+        self.changes = RevisionIndex()
+        self.deltas = 0
+        self.full_syncs = 0
+        self.not_modified = 0
+
+    def _node(self, node_id: str) -> _NodeContainers:
+        state = self._nodes.get(node_id)
+        if state is None:
+            state = self._nodes[node_id] = _NodeContainers()
+        return state
+
+    def _put(self, node_id: str, state: _NodeContainers, record: dict):
+        record = {**record, "node_id": node_id}
+        old = state.by_id.get(record["id"])
+        if old == record:
+            return
+        if old and old.get("name") and self._by_name.get(old["name"]) == (node_id, old["id"]):
+            del self._by_name[old["name"]]
+        state.by_id[record["id"]] = record
+        if record.get("name"):
+            self._by_name[record["name"]] = (node_id, record["id"])
+        self.changes.upsert(record)
+        state.version = self.changes.revision
+
+    def _drop(self, node_id: str, state: _NodeContainers, container_id: str):
+        old = state.by_id.pop(container_id, None)
+        if old is None:
+            return
+        if old.get("name") and self._by_name.get(old["name"]) == (node_id, container_id):
+            del self._by_name[old["name"]]
+        self.changes.discard(container_id)
+        state.version = self.changes.revision
+
+    def apply(self, node_id: str, payload):
+        """
+        Apply an agent's /containers response: a delta dict from an agent that
+        supports `since`, or a plain list (full listing) from one that doesn't.
+        """
+        state = self._node(node_id)
+        if isinstance(payload, list):
+            payload = {"epoch": None, "revision": 0, "full": True, "containers": payload, "removed": []}
+
+        if payload.get("full"):
+            self.full_syncs += 1
+            keep = {record["id"] for record in payload.get("containers", [])}
+            for cid in [cid for cid in state.by_id if cid not in keep]:
+                self._drop(node_id, state, cid)
+        else:
+            self.deltas += 1
+        for record in payload.get("containers", []):
+            self._put(node_id, state, record)
+        for cid in payload.get("removed", []):
+            self._drop(node_id, state, cid)
+
+        state.epoch = payload.get("epoch")
+        state.revision = payload.get("revision", 0)
+        state.synced_at = time.monotonic()
+
+    async def sync_node(self, node_id: str, node: dict):
+        """Pull one node's changes since the last sync. Raises on transport or HTTP errors."""
+        state = self._node(node_id)
+        params = {"all": "true", "since": state.revision}
+        headers = {}
+        if state.epoch:
+            params["epoch"] = state.epoch
+        if state.etag:
+            headers["If-None-Match"] = state.etag
+        resp = await self._agent_client.get(node, "/containers", params=params, headers=headers)
+        if resp.status_code == 304:
+            self.not_modified += 1
+            state.synced_at = time.monotonic()
+            return
+        if resp.status_code != 200:
+            raise RuntimeError(f"HTTP {resp.status_code}")
+        self.apply(node_id, resp.json())
+        state.etag = resp.headers.get("etag")
+
+    async def sync_all(self, nodes: dict) -> dict:
+        """Sync every online node concurrently; returns {node_id: error} for the ones that failed."""
+        targets = [(nid, spec) for nid, spec in nodes.items() if spec.get("status") == "online"]
+        results = await asyncio.gather(
+            *(self.sync_node(nid, spec) for nid, spec in targets), return_exceptions=True
+        )
+        return {nid: str(res) for (nid, _), res in zip(targets, results) if isinstance(res, Exception)}
+
+    def forget_node(self, node_id: str):
+        state = self._nodes.pop(node_id, None)
+        if state:
+            for cid in list(state.by_id):
+                self._drop(node_id, state, cid)
+
+    def containers(self, node_id: str | None = None) -> list[dict]:
+        if node_id is not None:
+            state = self._nodes.get(node_id)
+            return list(state.by_id.values()) if state else []
+        return [c for state in self._nodes.values() for c in state.by_id.values()]
+
+    def query(self, node_id: str | None = None, states=None, labels=None,
+              finished_before: float | None = None) -> list[dict]:
+        """Cached containers filtered like the agents' /containers?state=&label=&finished_before="""
+        return [c for c in self.containers(node_id) if record_matches(c, states, labels, finished_before)]
+
+    def find_by_name(self, name: str) -> dict | None:
+        ref = self._by_name.get(name)
+        if ref is None:
+            return None
+        node_id, container_id = ref
+        return self._nodes[node_id].by_id.get(container_id)
+
+    def find_by_job(self, job_id: str, node_id: str | None = None) -> dict | None:
+        """
+        A job's container via the job label index, falling back to the
+        job-<id> naming convention for containers created before labels.
+        """
+        records = self.changes.with_label(f"{JOB_LABEL}={job_id}")
+        if node_id is not None:
+            records = [c for c in records if c.get("node_id") == node_id]
+        record = newest_job_container(records)
+        if record is None:
+            record = self.find_by_name(f"job-{job_id}")
+            if record is not None and node_id is not None and record.get("node_id") != node_id:
+                record = None
+        return record
+
+    def etag(self, node_ids, *variant) -> str:
+        """Validator for a listing built from these nodes' cached containers."""
+        versions = ",".join(f"{nid}:{self._nodes[nid].version if nid in self._nodes else 0}" for nid in node_ids)
+        digest = hashlib.blake2b(versions.encode(), digest_size=8).hexdigest()
+        return self.changes.etag(digest, *variant)
+
+    def synced_age(self, node_id: str) -> float | None:
+        state = self._nodes.get(node_id)
+        if state is None or state.synced_at is None:
+            return None
+        return time.monotonic() - state.synced_at
+
+    def stats(self) -> dict:
+        return {
+            "nodes": len(self._nodes),
+            "containers": sum(len(s.by_id) for s in self._nodes.values()),
+            "revision": self.changes.revision,
+            "deltas": self.deltas,
+            "full_syncs": self.full_syncs,
+            "not_modified": self.not_modified,
+        }
@@ -3,8 +3,10 @@ from __future__ import annotations
 
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
-from functools import partial
+from functools import partial, wraps
+import os
 import platform
+import threading
 
 try:
     import docker
@@ -15,107 +17,295 @@ except ImportError:
     NotFound = RuntimeError
     APIError = RuntimeError
 
+from .container_record import as_record
+from .docker_engine import (
+    AsyncDockerEngineClient, DockerEngineClient, EngineError, EngineNotFound, pull_params, usage_from_stats,
+)
 from .docker_subprocess import DockerSubprocessClient
 
+# Force a backend ("engine", "sdk" or "cli"); by default the first one that answers wins
+DOCKER_BACKEND = os.getenv("DOCKER_BACKEND", "auto")
+
+# Concurrent Docker calls per operation type, so slow stops can't starve reads
+DOCKER_OP_LIMITS = {
+    "read": int(os.getenv("DOCKER_READ_CONCURRENCY", "32")),
+    "start": int(os.getenv("DOCKER_START_CONCURRENCY", "16")),
+    "stop": int(os.getenv("DOCKER_STOP_CONCURRENCY", "8")),
+    "stats": int(os.getenv("DOCKER_STATS_CONCURRENCY", "8")),
+    "pull": int(os.getenv("DOCKER_PULL_CONCURRENCY", "2")),
+    # Log streams are held open for as long as their reader is (follow mode)
+    "logs": int(os.getenv("DOCKER_LOGS_CONCURRENCY", "64")),
+    # One stats stream per running container for telemetry
+    "stats_stream": int(os.getenv("DOCKER_STATS_STREAMS", "256")),
+}
+
+# Log chunks (or stats samples) read ahead of a slow reader before reading from docker pauses
+LOG_BUFFER_CHUNKS = int(os.getenv("LOG_BUFFER_CHUNKS", "64"))
+
+# IMPORTANT: Protect critical infrastructure containers from deletion
+PROTECTED_CONTAINERS = ["mongo"]
+
 
 class DockerUnavailable(RuntimeError):
     """Raised when the local Docker daemon cannot be reached."""
 
 
+def _check_protected(container):
+    container_name = (getattr(container, "name", "") or "").lower()
+    if any(protected in container_name for protected in PROTECTED_CONTAINERS):
+        raise APIError(f"Cannot stop/remove protected container: {container_name}")
+
+
+def _summary(c) -> dict:
+    record = as_record(c)
+    return {"id": record.id, "name": record.name, "image": record.image, "status": record.status}
+
+
+def _engine_errors(method):
+    """Surface Engine API errors as the docker SDK exceptions callers already handle."""
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        try:
+            return method(*args, **kwargs)
+        except EngineNotFound as e:
+            raise NotFound(str(e))
+        except EngineError as e:
+            raise APIError(str(e))
+    return wrapper
+
+
+def _engine_stream(chunks):
+    """_engine_errors for a stream of Engine API items."""
+    try:
+        yield from chunks
+    except EngineNotFound as e:
+        raise NotFound(str(e))
+    except EngineError as e:
+        raise APIError(str(e))
+
+
+def _close_stream(chunks):
+    try:
+        chunks.close()
+    except ValueError:
+        # A generator still running in its feeder thread; that thread closes it
+        pass
+
+
+# Marks the end of a stream in the read-ahead queue
+_STREAM_END = object()
+
+
 class ContainerManager:
-    def __init__(self, max_workers: int = 4) -> None:
+    def __init__(self, max_workers: int = 4, backend: str = DOCKER_BACKEND, op_limits: dict | None = None,
+                 log_buffer: int = LOG_BUFFER_CHUNKS) -> None:
         self._client = None
-        self._use_subprocess = False
+        self._async_client = None
+        # Engine API and CLI clients share the flat containers_* interface; the SDK does not
+        self._flat_api = False
+        self.backend = None
+        self._preferred_backend = backend
+        self.op_limits = {**DOCKER_OP_LIMITS, **(op_limits or {})}
+        self._limits = {op: asyncio.Semaphore(n) for op, n in self.op_limits.items()}
+        self.log_buffer = log_buffer
+        # Only the SDK/CLI fallbacks use threads; mutations get their own pool so they can't starve reads
         self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._write_executor = ThreadPoolExecutor(max_workers=max_workers)
 
     # ---------- private helpers ----------
 
+    def _try_engine(self):
+        if platform.system() == "Windows":
+            return None
+        engine = DockerEngineClient()
+        if engine.ping():
+            return engine
+        engine.close()
+        return None
+
+    def _try_cli(self):
+        cli = DockerSubprocessClient()
+        return cli if cli.ping() else None
+
     def _client_or_raise(self):
         if self._client is None:
-            try:
-                cli = DockerSubprocessClient()
-                if cli.ping():
-                    self._client = cli
-                    self._use_subprocess = True
-                    print("Using Docker CLI subprocess")
-                    return self._client
-            except Exception:
-                pass
-            if DOCKER_SDK_AVAILABLE:
+            # Preference: native Engine API, then docker SDK, then forking the CLI as a last resort
+            order = ["engine", "sdk", "cli"] if self._preferred_backend == "auto" else [self._preferred_backend]
+            errors = []
+            for backend in order:
                 try:
-                    if platform.system() == "Windows":
-                        # Try TCP first
-                        try:
-                            self._client = docker.DockerClient(base_url='tcp://localhost:2375')
-                            self._client.ping()
-                            print("Using Docker SDK via TCP")
-                        except Exception:
-                            # Try from_env
-                            self._client = docker.from_env()
-                            self._client.ping()
-                            print("Using Docker SDK via from_env")
-                    else:
-                        self._client = docker.from_env()
-                        self._client.ping()
-                    self._use_subprocess = False
-                    return self._client
+                    if backend == "engine":
+                        self._client = self._try_engine()
+                        self._flat_api = True
+                    elif backend == "cli":
+                        self._client = self._try_cli()
+                        self._flat_api = True
+                    elif backend == "sdk":
+                        self._client = self._sdk_client()
+                        self._flat_api = False
                 except Exception as e:
-                    raise DockerUnavailable(f"Docker unavailable: {e}")
-            else:
-                raise DockerUnavailable("Docker SDK not available and subprocess method failed")
+                    errors.append(f"{backend}: {e}")
+                    self._client = None
+                if self._client is not None:
+                    self.backend = backend
+                    print(f"Using Docker backend: {backend}")
+                    return self._client
+            raise DockerUnavailable("Docker unavailable" + (f" ({'; '.join(errors)})" if errors else ""))
         return self._client
 
+    def _sdk_client(self):
+        if not DOCKER_SDK_AVAILABLE:
+            return None
+        if platform.system() == "Windows":
+            # Try TCP first
+            try:
+                client = docker.DockerClient(base_url='tcp://localhost:2375')
+                client.ping()
+                return client
+            except Exception:
+                pass
+        client = docker.from_env()
+        client.ping()
+        return client
+
     # ---------- synchronous methods ----------
 
+    @_engine_errors
     def list_containers(self, all: bool = False):
         client = self._client_or_raise()
-        if self._use_subprocess:
+        if self._flat_api:
             return client.containers_list(all=all)
         else:
-            return client.containers.list(all=all)
+            return [as_record(c) for c in client.containers.list(all=all)]
 
+    @_engine_errors
     def get_container(self, container_id: str):
         client = self._client_or_raise()
-        if self._use_subprocess:
+        if self._flat_api:
             return client.containers_get(container_id)
         else:
-            return client.containers.get(container_id)
+            return as_record(client.containers.get(container_id))
+
+    @_engine_errors
+    def inspect_containers(self, container_ids: list[str]):
+        """Full records (state, exit code, timestamps) for many containers; missing ones are skipped"""
+        client = self._client_or_raise()
+        if self._flat_api:
+            return client.containers_inspect(container_ids)
+        records = []
+        for container_id in container_ids:
+            try:
+                records.append(as_record(client.containers.get(container_id)))
+            except NotFound:
+                pass
+        return records
 
-    def start_container(self, image: str, name: str | None = None, command: str | None = None):
+    @_engine_errors
+    def start_container(self, image: str, name: str | None = None, command: str | None = None,
+                        cpus: float = 0.5, memory_mb: int = 256, labels: dict | None = None,
+                        argv: list[str] | None = None):
         client = self._client_or_raise()
-        if self._use_subprocess:
-            c = client.containers_run(image=image, name=name, command=command, detach=True)
+        if self._flat_api:
+            c = client.containers_run(image=image, name=name, command=command, detach=True,
+                                      cpus=cpus, memory_mb=memory_mb, labels=labels, argv=argv)
         else:
-            c = client.containers.run(image=image, name=name, command=command, detach=True)
+            c = client.containers.run(image=image, name=name, command=argv or command, detach=True,
+                                      nano_cpus=int(cpus * 1e9), mem_limit=f"{memory_mb}m", labels=labels or {})
             try:
                 c.reload()
             except Exception:
                 pass
 
-        return {
-            "id": c.id,
-            "name": getattr(c, "name", None),
-            "image": (getattr(c.image, "tags", None) or ["<none>"])[0],
-            "status": getattr(c, "status", None),
-        }
+        return _summary(c)
 
-    def stop_container(self, container_id: str, remove: bool = True):
+    @_engine_errors
+    def prune_containers(self, until: float) -> dict:
+        """
+        Remove all stopped containers created before `until` in one call.
+        Returns {"removed": [ids], "space_reclaimed": bytes or None}.
+        """
+        client = self._client_or_raise()
+        if self._flat_api:
+            result = client.containers_prune(until)
+        else:
+            result = client.containers.prune(filters={"until": str(int(until))})
+        return {"removed": result.get("ContainersDeleted") or [], "space_reclaimed": result.get("SpaceReclaimed")}
+
+    @_engine_errors
+    def exec_in_container(self, container_id: str, argv: list[str]) -> int:
+        """Run argv in a running container, wait for it and return its exit code"""
+        client = self._client_or_raise()
+        if self._flat_api:
+            return client.containers_exec(container_id, argv)
+        return client.containers.get(container_id).exec_run(argv).exit_code
+
+    @_engine_errors
+    def rename_container(self, container_id: str, name: str):
+        client = self._client_or_raise()
+        if self._flat_api:
+            return client.containers_rename(container_id, name)
+        client.containers.get(container_id).rename(name)
+
+    @_engine_errors
+    def list_images(self) -> list[str]:
+        """Local image names ("repo:tag")"""
+        client = self._client_or_raise()
+        if self._flat_api:
+            return client.images_list()
+        return [tag for image in client.images.list() for tag in image.tags]
+
+    @_engine_errors
+    def pull_image(self, image: str, on_progress=None):
+        """Pull an image, calling on_progress with each Engine API progress event"""
+        client = self._client_or_raise()
+        if self._flat_api:
+            return client.images_pull(image, on_progress)
+        params = pull_params(image)
+        for event in client.api.pull(params["fromImage"], tag=params["tag"], stream=True, decode=True):
+            if event.get("error"):
+                raise APIError(f"Pull of {image} failed: {event['error']}")
+            if on_progress:
+                on_progress(event)
+
+    def container_logs(self, container_id: str, follow: bool = False, tail: int | None = None,
+                       since: float | None = None):
+        """
+        A container's stdout/stderr as an iterator of byte chunks; with follow,
+        until it stops. close() on it ends the stream.
+        """
+        client = self._client_or_raise()
+        if self._flat_api:
+            chunks = client.containers_logs(container_id, follow=follow, tail=tail, since=since)
+            return _engine_stream(chunks) if self.backend == "engine" else chunks
+        kwargs = {"stream": True, "follow": follow, "tail": "all" if tail is None else int(tail)}
+        if since is not None:
+            kwargs["since"] = since
+        return client.containers.get(container_id).logs(**kwargs)
+
+    def container_stats_stream(self, container_id: str):
+        """Raw Engine API stats samples for a container, about one a second, until it stops"""
         client = self._client_or_raise()
+        if self._flat_api:
+            return _engine_stream(client.containers_stats_stream(container_id))
+        return client.containers.get(container_id).stats(stream=True, decode=True)
+
+    @_engine_errors
+    def container_stats(self):
+        """Point-in-time CPU/memory usage of running containers"""
+        client = self._client_or_raise()
+        if self._flat_api:
+            return client.containers_stats()
+
+        return [usage_from_stats(c.id, getattr(c, "name", None), c.stats(stream=False))
+                for c in client.containers.list()]
 
-        # IMPORTANT: Protect critical infrastructure containers from deletion
-        PROTECTED_CONTAINERS = ["mongo"]
+    @_engine_errors
+    def stop_container(self, container_id: str, remove: bool = True):
+        client = self._client_or_raise()
 
-        if self._use_subprocess:
+        if self._flat_api:
             # Check if container is protected
-            try:
-                container_info = client.containers_get(container_id)
-                container_name = getattr(container_info, "name", "").lower()
-                if any(protected in container_name for protected in PROTECTED_CONTAINERS):
-                    raise APIError(f"Cannot stop/remove protected container: {container_name}")
-            except NotFound:
-                raise
-            except APIError:
-                raise
+            _check_protected(client.containers_get(container_id))
 
             try:
                 client.containers_stop(container_id, timeout=5)
@@ -134,9 +324,7 @@ class ContainerManager:
                 raise
 
             # Check if container is protected
-            container_name = getattr(c, "name", "").lower()
-            if any(protected in container_name for protected in PROTECTED_CONTAINERS):
-                raise APIError(f"Cannot stop/remove protected container: {container_name}")
+            _check_protected(c)
 
             try:
                 c.stop(timeout=5)
@@ -153,42 +341,224 @@ class ContainerManager:
 
         return {"status": "removed" if remove else "stopped", "id": container_id}
 
-    # ---------- async wrappers ----------
+    # ---------- async API ----------
+    # The Engine API backend is called natively over an async socket pool;
+    # the SDK and CLI fallbacks run their blocking calls in a thread pool.
+    # Either way each operation type is capped by its own semaphore.
+
+    async def _engine(self):
+        """The async Engine API client, or None when another backend is in use."""
+        if self.backend is None:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self._executor, self._client_or_raise)
+        if self.backend != "engine":
+            return None
+        if self._async_client is None:
+            self._async_client = AsyncDockerEngineClient(
+                socket_path=self._client.socket_path, stats_concurrency=self.op_limits["stats"]
+            )
+        return self._async_client
+
+    async def _run(self, op: str, engine_call, fallback, executor=None):
+        async with self._limits[op]:
+            engine = await self._engine()
+            if engine is None:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(executor or self._executor, fallback)
+            try:
+                return await engine_call(engine)
+            except EngineNotFound as e:
+                raise NotFound(str(e))
+            except EngineError as e:
+                raise APIError(str(e))
 
     async def list_containers_async(self, all: bool = False):
-        """Async version - runs blocking call in thread pool"""
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(
-            self._executor,
-            self.list_containers,
-            all
+        return await self._run(
+            "read", lambda e: e.containers_list(all=all), partial(self.list_containers, all)
         )
 
     async def get_container_async(self, container_id: str):
-        """Async version - runs blocking call in thread pool"""
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(
-            self._executor,
-            self.get_container,
-            container_id
+        return await self._run(
+            "read", lambda e: e.containers_get(container_id), partial(self.get_container, container_id)
+        )
+
+    async def inspect_containers_async(self, container_ids: list[str]):
+        return await self._run(
+            "read", lambda e: e.containers_inspect(container_ids), partial(self.inspect_containers, container_ids)
         )
 
-    async def start_container_async(self, image: str, name: str | None = None, command: str | None = None):
-        """Async version - runs blocking call in thread pool"""
-        loop = asyncio.get_event_loop()
-        func = partial(self.start_container, image=image, name=name, command=command)
-        return await loop.run_in_executor(self._executor, func)
+    async def start_container_async(self, image: str, name: str | None = None, command: str | None = None,
+                                    cpus: float = 0.5, memory_mb: int = 256, labels: dict | None = None,
+                                    argv: list[str] | None = None):
+        async def run(engine):
+            return _summary(await engine.containers_run(image=image, name=name, command=command,
+                                                        cpus=cpus, memory_mb=memory_mb, labels=labels, argv=argv))
+
+        fallback = partial(self.start_container, image=image, name=name, command=command,
+                           cpus=cpus, memory_mb=memory_mb, labels=labels, argv=argv)
+        return await self._run("start", run, fallback, self._write_executor)
+
+    async def exec_in_container_async(self, container_id: str, argv: list[str]) -> int:
+        return await self._run(
+            "start", lambda e: e.containers_exec(container_id, argv),
+            partial(self.exec_in_container, container_id, argv), self._write_executor,
+        )
+
+    async def rename_container_async(self, container_id: str, name: str):
+        return await self._run(
+            "start", lambda e: e.containers_rename(container_id, name),
+            partial(self.rename_container, container_id, name), self._write_executor,
+        )
+
+    async def list_images_async(self) -> list[str]:
+        return await self._run("read", lambda e: e.images_list(), self.list_images)
+
+    async def pull_image_async(self, image: str, on_progress=None):
+        # Pulls are long-running writes: keep them off the read pool
+        return await self._run(
+            "pull", lambda e: e.images_pull(image, on_progress), partial(self.pull_image, image, on_progress),
+            self._write_executor,
+        )
+
+    async def prune_containers_async(self, until: float) -> dict:
+        async def prune(engine):
+            result = await engine.containers_prune(until)
+            return {"removed": result.get("ContainersDeleted") or [], "space_reclaimed": result.get("SpaceReclaimed")}
+
+        return await self._run("stop", prune, partial(self.prune_containers, until), self._write_executor)
 
     async def stop_container_async(self, container_id: str, remove: bool = True):
-        """Async version - runs blocking call in thread pool"""
-        loop = asyncio.get_event_loop()
-        func = partial(self.stop_container, container_id=container_id, remove=remove)
-        return await loop.run_in_executor(self._executor, func)
+        async def stop(engine):
+            _check_protected(await engine.containers_get(container_id))
+            await engine.containers_stop(container_id, timeout=5)
+            if remove:
+                await engine.containers_remove(container_id, force=True)
+            return {"status": "removed" if remove else "stopped", "id": container_id}
+
+        fallback = partial(self.stop_container, container_id=container_id, remove=remove)
+        return await self._run("stop", stop, fallback, self._write_executor)
+
+    async def supports_stats_stream_async(self) -> bool:
+        """Whether the backend in use has a raw stats stream; the SDK and Engine API do, the CLI doesn't."""
+        await self._engine()
+        return not self._flat_api or self._client.supports_stats_stream
+
+    async def container_stats_async(self):
+        return await self._run("stats", lambda e: e.containers_stats(), self.container_stats)
+
+    async def _stream(self, op: str, engine_chunks, fallback_chunks):
+        """
+        Relay a long-lived Docker stream through a queue of at most log_buffer
+        items. Past that the reader waits, so a slow consumer slows the docker
+        stream down instead of growing memory.
+        """
+        async with self._limits[op]:
+            engine = await self._engine()
+            queue = asyncio.Queue(maxsize=self.log_buffer)
+            stop = threading.Event()
+            if engine is not None:
+                producer = asyncio.create_task(self._pump(engine_chunks(engine), queue))
+            else:
+                # Blocking SDK/CLI iterators get a thread of their own: a followed
+                # stream would otherwise pin a pool worker indefinitely
+                producer = None
+                opened = []
+                threading.Thread(
+                    target=self._feed, args=(fallback_chunks, opened, queue, asyncio.get_running_loop(), stop),
+                    daemon=True,
+                ).start()
+            try:
+                while True:
+                    item = await queue.get()
+                    if item is _STREAM_END:
+                        return
+                    if isinstance(item, Exception):
+                        raise item
+                    yield item
+            finally:
+                stop.set()
+                if producer is not None:
+                    producer.cancel()
+                else:
+                    # The feeder may be blocked reading a quiet followed stream;
+                    # closing it from here ends the read (and kills docker logs -f)
+                    for chunks in opened:
+                        _close_stream(chunks)
+                # Unblock a feeder thread waiting for room so it sees the stop flag
+                while not queue.empty():
+                    queue.get_nowait()
+
+    def container_logs_async(self, container_id: str, follow: bool = False, tail: int | None = None,
+                             since: float | None = None):
+        """Async iterator over a container's log output as byte chunks, read ahead at most log_buffer chunks"""
+        return self._stream(
+            "logs", lambda e: e.containers_logs(container_id, follow, tail, since),
+            partial(self.container_logs, container_id, follow, tail, since),
+        )
+
+    def container_stats_stream_async(self, container_id: str):
+        """Async iterator over a container's raw stats samples from one long-lived stats stream"""
+        return self._stream(
+            "stats_stream", lambda e: e.containers_stats_stream(container_id),
+            partial(self.container_stats_stream, container_id),
+        )
+
+    @staticmethod
+    async def _pump(chunks, queue: asyncio.Queue):
+        try:
+            async for chunk in chunks:
+                await queue.put(chunk)
+            await queue.put(_STREAM_END)
+        except EngineNotFound as e:
+            await queue.put(NotFound(str(e)))
+        except EngineError as e:
+            await queue.put(APIError(str(e)))
+        except Exception as e:
+            await queue.put(e)
+
+    @staticmethod
+    def _feed(open_chunks, opened: list, queue: asyncio.Queue, loop, stop: threading.Event):
+        def put(item):
+            # Blocks this thread, not the event loop, while the queue is full
+            asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+        chunks = None
+        try:
+            # Opened here, since opening can block too (SDK container lookup)
+            chunks = open_chunks()
+            opened.append(chunks)
+            if stop.is_set():
+                # The reader left while this was opening, before it could close it
+                return
+            for chunk in chunks:
+                if stop.is_set():
+                    return
+                put(chunk)
+            item = _STREAM_END
+        except Exception as e:
+            item = e
+        finally:
+            if chunks is not None:
+                _close_stream(chunks)
+        if not stop.is_set():
+            try:
+                put(item)
+            except RuntimeError:
+                # Event loop already gone (shutdown)
+                pass
 
     # ---------- cleanup ----------
 
+    async def aclose(self):
+        """Close the async Engine API pool, then everything shutdown() closes"""
+        if self._async_client:
+            await self._async_client.close()
+            self._async_client = None
+        self.shutdown()
+
     def shutdown(self):
-        """Call this on app shutdown to cleanup thread pool"""
+        """Call this on app shutdown to cleanup thread pools"""
         self._executor.shutdown(wait=True)
+        self._write_executor.shutdown(wait=True)
         if self._client:
-            self._client.close()
\ No newline at end of file
+            self._client.close()
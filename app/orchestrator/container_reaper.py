@@ -0,0 +1,187 @@
+# app/orchestrator/container_reaper.py
+import asyncio
+import os
+import time
+
+from .container_manager import PROTECTED_CONTAINERS
+from .container_record import JOB_LABEL
+
+# How often the agent applies its retention policy to exited containers
+REAP_INTERVAL = float(os.getenv("REAP_INTERVAL", "60"))
+# Exited containers older than this (seconds since they finished) are removed
+REAP_MAX_AGE = float(os.getenv("REAP_MAX_AGE", "3600"))
+# At most this many exited containers are kept on the node, newest first
+REAP_MAX_EXITED = int(os.getenv("REAP_MAX_EXITED", "500"))
+# Exited containers kept per job (older submissions of a job go first)
+REAP_KEEP_PER_JOB = int(os.getenv("REAP_KEEP_PER_JOB", "1"))
+# Above this disk usage every exited container past the grace period goes
+REAP_DISK_PERCENT = float(os.getenv("REAP_DISK_PERCENT", "85"))
+# Never remove a container that finished more recently than this, so its
+# exit status can still be read by the orchestrator (a running job whose
+# container is gone by the next reconciliation is marked failed)
+REAP_GRACE = float(os.getenv("REAP_GRACE", "60"))
+
+_FINISHED = ("exited", "dead")
+
+
+def _protected(record: dict) -> bool:
+    name = (record.get("name") or "").lower()
+    return any(protected in name for protected in PROTECTED_CONTAINERS)
+
+
+def select_victims(records: list[dict], now: float, disk_percent: float | None = None,
+                   max_age: float = REAP_MAX_AGE, max_exited: int = REAP_MAX_EXITED,
+                   keep_per_job: int = REAP_KEEP_PER_JOB, disk_threshold: float = REAP_DISK_PERCENT,
+                   grace: float = REAP_GRACE) -> dict:
+    """
+    Apply the retention policy to a node's container records.
+    Returns {container id: reason} for the ones to remove; reasons are
+    "per_job", "age", "count" and "disk".
+    """
+    finished = [
+        r for r in records
+        if r.get("state") in _FINISHED and not _protected(r)
+        and now - (r.get("finished_at") or r.get("created_at") or now) >= grace
+    ]
+    # Newest first, by when they finished
+    finished.sort(key=lambda r: r.get("finished_at") or r.get("created_at") or 0, reverse=True)
+
+    victims = {}
+    per_job = {}
+    for r in finished:
+        job_id = (r.get("labels") or {}).get(JOB_LABEL)
+        if job_id is None:
+            continue
+        per_job[job_id] = per_job.get(job_id, 0) + 1
+        if per_job[job_id] > keep_per_job:
+            victims[r["id"]] = "per_job"
+
+    for r in finished:
+        if r["id"] not in victims and now - (r.get("finished_at") or r.get("created_at") or now) > max_age:
+            victims[r["id"]] = "age"
+
+    kept = [r for r in finished if r["id"] not in victims]
+    for r in kept[max_exited:]:
+        victims[r["id"]] = "count"
+
+    if disk_percent is not None and disk_percent >= disk_threshold:
+        for r in kept[:max_exited]:
+            victims[r["id"]] = "disk"
+    return victims
+
+
+def prune_cutoff(records: list[dict], victims: dict) -> float | None:
+    """
+    A `docker container prune --filter until=` cutoff that removes only
+    victims: prune goes by creation time, so the cutoff has to be older than
+    every container we keep. None when no victim is older than that.
+    """
+    keep_created = [r.get("created_at") for r in records if r["id"] not in victims]
+    victim_created = [r.get("created_at") for r in records if r["id"] in victims]
+    if None in keep_created or None in victim_created or not victim_created:
+        return None
+    # Nothing newer than the listing may be caught either
+    cutoff = min(keep_created, default=max(victim_created) + 1)
+    if not any(created < cutoff for created in victim_created):
+        return None
+    return cutoff
+
+
+class ContainerReaper:
+    """
+    Agent-side retention for exited containers. Works from the agent's
+    container index, removes what it can with a single prune call and the
+    rest one by one, and keeps a report of what it removed.
+    """
+
+    def __init__(self, container_manager, records, disk_percent=lambda: None,
+                 interval: float = REAP_INTERVAL, on_removed=None, **policy):
+        self._cm = container_manager
+        # Callables so the reaper always sees the current index and disk sample
+        self._records = records
+        self._disk_percent = disk_percent
+        self._on_removed = on_removed
+        self.interval = interval
+        self.policy = policy
+        self.last_report = None
+        self.total_removed = 0
+        self.runs = 0
+        self._task = None
+
+    async def reap(self) -> dict:
+        """Apply the policy once and return a report of what was removed."""
+        records = await self._records()
+        disk_percent = self._disk_percent()
+        victims = select_victims(records, time.time(), disk_percent, **self.policy)
+
+        removed, space_reclaimed, errors = [], None, []
+        if victims:
+            cutoff = prune_cutoff(records, victims)
+            if cutoff is not None:
+                try:
+                    result = await self._cm.prune_containers_async(cutoff)
+                    removed.extend(result["removed"])
+                    space_reclaimed = result["space_reclaimed"]
+                except Exception as e:
+                    errors.append(f"prune: {e}")
+
+            pruned = set(removed)
+            rest = [cid for cid in victims if cid not in pruned]
+            results = await asyncio.gather(
+                *(self._cm.stop_container_async(cid, remove=True) for cid in rest), return_exceptions=True
+            )
+            for cid, result in zip(rest, results):
+                if isinstance(result, Exception):
+                    errors.append(f"{cid[:12]}: {result}")
+                else:
+                    removed.append(cid)
+
+        reasons = {}
+        for cid in removed:
+            reason = victims.get(cid, "prune")
+            reasons[reason] = reasons.get(reason, 0) + 1
+        self.runs += 1
+        self.total_removed += len(removed)
+        self.last_report = {
+            "at": time.time(),
+            "removed": removed,
+            "reasons": reasons,
+            "space_reclaimed": space_reclaimed,
+            "disk_percent": disk_percent,
+            "errors": errors,
+        }
+        if removed:
+            print(f"Reaped {len(removed)} exited containers: {reasons}")
+            if self._on_removed:
+                self._on_removed()
+        return self.last_report
+
+    def stats(self) -> dict:
+        return {
+            "runs": self.runs,
+            "total_removed": self.total_removed,
+            "interval": self.interval,
+            "last": self.last_report,
+        }
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.reap()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error reaping containers: {e}")
+
+    def start(self):
+        if not self._task or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
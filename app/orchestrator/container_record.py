@@ -0,0 +1,252 @@
+# app/orchestrator/container_record.py
+import json
+import re
+from datetime import datetime, timezone
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_EXIT_CODE = re.compile(r"\((-?\d+)\)")
+_ISO_FRACTION = re.compile(r"\.(\d+)")
+
+
+def parse_docker_time(value) -> float | None:
+    """
+    Unix time from the timestamp shapes Docker emits: epoch ints (Engine API
+    list), RFC 3339 with nanoseconds (inspect) and "2024-01-02 03:04:05 +0000 UTC"
+    (CLI ps). Docker's zero time ("0001-01-01T00:00:00Z") means never.
+    """
+    if value in (None, ""):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value)
+    if text.startswith("0001-01-01"):
+        return None
+    text = text.removesuffix(" UTC").replace("Z", "+00:00")
+    # Python only parses microseconds
+    text = _ISO_FRACTION.sub(lambda m: "." + m.group(1)[:6].ljust(6, "0"), text, count=1)
+    for fmt in (None, "%Y-%m-%d %H:%M:%S %z", "%Y-%m-%d %H:%M:%S.%f %z"):
+        try:
+            parsed = datetime.fromisoformat(text) if fmt is None else datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
+    return None
+
+
+def exit_code_from_status(status: str | None) -> int | None:
+    """Exit code from a `docker ps` Status such as "Exited (137) 2 minutes ago"."""
+    if status and status.lower().startswith("exited"):
+        match = _EXIT_CODE.search(status)
+        if match:
+            return int(match.group(1))
+    return None
+
+
+# Labels put on job containers, so agents and the orchestrator can find a
+# job's container without going by its name
+JOB_LABEL = "orchestrator.job"
+GENERATION_LABEL = "orchestrator.generation"
+ORCHESTRATOR_LABEL = "orchestrator.id"
+# Marks an agent's warm pool containers (value: the pool image)
+POOL_LABEL = "orchestrator.pool"
+
+# Docker's container states, as reported in State.Status
+CONTAINER_STATES = ("created", "running", "paused", "restarting", "removing", "exited", "dead")
+
+_STATUS_PREFIXES = (
+    ("up", "running"), ("exited", "exited"), ("created", "created"), ("restarting", "restarting"),
+    ("removal", "removing"), ("dead", "dead"),
+)
+
+
+def state_from_status(status: str | None) -> str | None:
+    """State enum from a human `docker ps` Status, for clients that don't report State."""
+    text = (status or "").lower()
+    # The docker SDK's Container.status is already the state
+    if text in CONTAINER_STATES:
+        return text
+    if "(paused)" in text:
+        return "paused"
+    for prefix, state in _STATUS_PREFIXES:
+        if text.startswith(prefix):
+            return state
+    return None
+
+
+def parse_labels(value) -> dict:
+    """Labels as a dict, from a dict or the CLI's "k=v,k2=v2" string."""
+    if not value:
+        return {}
+    if isinstance(value, dict):
+        return dict(value)
+    labels = {}
+    for pair in value.split(","):
+        key, _, val = pair.partition("=")
+        if key:
+            labels[key] = val
+    return labels
+
+
+class ContainerRecord:
+    """
+    One container as returned by any Docker backend. Plain slots instead of
+    a per-row class keeps listing thousands of containers cheap.
+    """
+
+    __slots__ = ("id", "name", "status", "image", "state", "exit_code", "oom_killed", "restart_count",
+                 "created_at", "started_at", "finished_at", "labels")
+
+    # Only known from inspect, not from list calls
+    DETAIL_FIELDS = ("exit_code", "oom_killed", "restart_count", "started_at", "finished_at")
+
+    def __init__(self, id: str, name: str | None = None, status: str | None = None, image: str = "<none>",
+                 state: str | None = None, exit_code: int | None = None, oom_killed: bool | None = None,
+                 restart_count: int | None = None, created_at: float | None = None,
+                 started_at: float | None = None, finished_at: float | None = None, labels: dict | None = None):
+        self.id = id
+        self.name = name
+        self.status = status
+        self.image = image
+        self.state = state
+        self.exit_code = exit_code
+        self.oom_killed = oom_killed
+        self.restart_count = restart_count
+        self.created_at = created_at
+        self.started_at = started_at
+        self.finished_at = finished_at
+        self.labels = labels or {}
+
+    def __repr__(self):
+        return f"ContainerRecord(id={self.id[:12]!r}, name={self.name!r}, status={self.status!r})"
+
+    def __eq__(self, other):
+        if not isinstance(other, ContainerRecord):
+            return NotImplemented
+        return all(getattr(self, f) == getattr(other, f) for f in self.__slots__)
+
+    def to_dict(self) -> dict:
+        return {f: getattr(self, f) for f in self.__slots__}
+
+    @classmethod
+    def from_inspect(cls, data: dict) -> "ContainerRecord":
+        """From `docker inspect` / GET /containers/{id}/json output."""
+        state = data.get("State") or {}
+        config = data.get("Config") or {}
+        finished_at = parse_docker_time(state.get("FinishedAt"))
+        return cls(
+            id=data["Id"],
+            name=(data.get("Name") or "").lstrip("/"),
+            status=state.get("Status"),
+            image=config.get("Image") or "unknown",
+            state=state.get("Status"),
+            exit_code=state.get("ExitCode") if finished_at is not None else None,
+            oom_killed=state.get("OOMKilled"),
+            restart_count=data.get("RestartCount"),
+            created_at=parse_docker_time(data.get("Created")),
+            started_at=parse_docker_time(state.get("StartedAt")),
+            finished_at=finished_at,
+            labels=parse_labels(config.get("Labels")),
+        )
+
+    @classmethod
+    def from_ps(cls, data: dict) -> "ContainerRecord":
+        """From a `docker ps --format '{{json .}}'` line or a GET /containers/json entry."""
+        names = data.get("Names") or data.get("Name") or ""
+        if isinstance(names, list):
+            names = names[0] if names else ""
+        status = data.get("Status", "")
+        state = data.get("State")
+        return cls(
+            id=data.get("Id") or data.get("ID", ""),
+            name=names.lstrip("/"),
+            status=status,
+            image=data.get("Image") or "<none>",
+            state=state.lower() if isinstance(state, str) and state else state_from_status(status),
+            exit_code=exit_code_from_status(status),
+            created_at=parse_docker_time(data.get("Created", data.get("CreatedAt"))),
+            labels=parse_labels(data.get("Labels")),
+        )
+
+
+def as_record(c) -> ContainerRecord:
+    """A ContainerRecord for any backend's container object (docker SDK containers included)."""
+    if isinstance(c, ContainerRecord):
+        return c
+    attrs = getattr(c, "attrs", None)
+    if isinstance(attrs, dict) and "Id" in attrs:
+        if isinstance(attrs.get("State"), dict):
+            return ContainerRecord.from_inspect(attrs)
+        if "Names" in attrs:
+            return ContainerRecord.from_ps(attrs)
+    image = getattr(c, "image", None)
+    tags = getattr(image, "tags", None) if image is not None else None
+    return ContainerRecord(
+        id=c.id,
+        name=getattr(c, "name", None),
+        status=getattr(c, "status", None),
+        image=tags[0] if tags else (image if isinstance(image, str) else "<none>"),
+        state=state_from_status(getattr(c, "status", None)),
+        exit_code=getattr(c, "exit_code", None),
+        labels=getattr(c, "labels", None),
+    )
+
+
+def record_matches(record: dict, states=None, labels=None, finished_before: float | None = None) -> bool:
+    """
+    Filter for serialized records. labels are "key" (present) or "key=value";
+    finished_before only matches containers that have finished.
+    """
+    if states and record.get("state") not in states:
+        return False
+    if labels:
+        have = record.get("labels") or {}
+        for label in labels:
+            key, sep, value = label.partition("=")
+            if key not in have or (sep and have[key] != value):
+                return False
+    if finished_before is not None:
+        finished_at = record.get("finished_at")
+        if finished_at is None or finished_at >= finished_before:
+            return False
+    return True
+
+
+def newest_job_container(records) -> dict | None:
+    """The container of a job's latest submission, when a resubmitted job left several behind."""
+    def generation(record):
+        try:
+            gen = int((record.get("labels") or {}).get(GENERATION_LABEL, 0))
+        except ValueError:
+            gen = 0
+        return gen, record.get("created_at") or 0
+
+    return max(records, key=generation, default=None)
+
+
+def finished_job_status(record: dict) -> str | None:
+    """
+    "completed" / "failed" for a container that has stopped, None while it
+    hasn't. Falls back to the human Status for agents that predate `state`.
+    """
+    state = record.get("state") or state_from_status(record.get("status"))
+    if state not in ("exited", "dead"):
+        return None
+    exit_code = record.get("exit_code")
+    if exit_code is None:
+        exit_code = exit_code_from_status(record.get("status"))
+    if state == "dead" or record.get("oom_killed") or exit_code != 0:
+        return "failed"
+    return "completed"
+
+
+def dumps(obj) -> bytes:
+    """Serialize API payloads with orjson when it is installed, compact stdlib json otherwise."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":")).encode()
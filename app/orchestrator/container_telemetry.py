@@ -0,0 +1,383 @@
+# app/orchestrator/container_telemetry.py
+import asyncio
+import os
+import time
+from array import array
+
+from .container_record import JOB_LABEL, POOL_LABEL
+
+# Seconds covered by one stored point; docker emits a stats sample about every second
+TELEMETRY_RESOLUTION = float(os.getenv("TELEMETRY_RESOLUTION", "10"))
+# Points kept per container (360 x 10s = the last hour)
+TELEMETRY_POINTS = int(os.getenv("TELEMETRY_POINTS", "360"))
+# Containers with history kept; exited ones are evicted first, oldest first
+TELEMETRY_MAX_SERIES = int(os.getenv("TELEMETRY_MAX_SERIES", "500"))
+# How often the container index is checked for containers to start a stats stream for
+TELEMETRY_DISCOVER_INTERVAL = float(os.getenv("TELEMETRY_DISCOVER_INTERVAL", "5"))
+
+# Stored per point: mean/max CPU over the point, peak memory, and IO rates
+METRICS = ("cpu_percent", "cpu_max", "memory_bytes", "net_rx_bps", "net_tx_bps", "io_read_bps", "io_write_bps")
+_RATES = METRICS[3:]
+
+
+def usage_counters(raw: dict) -> dict:
+    """The numbers tracked from one Engine API stats sample (as also returned by the SDK)."""
+    cpu = raw.get("cpu_stats") or {}
+    mem = raw.get("memory_stats") or {}
+    mem_detail = mem.get("stats") or {}
+    # Like `docker stats`: page cache that can be dropped isn't counted as used
+    cache = mem_detail.get("inactive_file", mem_detail.get("total_inactive_file", 0))
+    networks = (raw.get("networks") or {}).values()
+    io = (raw.get("blkio_stats") or {}).get("io_service_bytes_recursive") or []
+    return {
+        "cpu_total": (cpu.get("cpu_usage") or {}).get("total_usage", 0),
+        "cpu_system": cpu.get("system_cpu_usage", 0),
+        "online_cpus": cpu.get("online_cpus") or 1,
+        "memory_bytes": max(mem.get("usage", 0) - cache, 0),
+        "memory_limit": mem.get("limit") or 0,
+        "counters": (
+            sum(n.get("rx_bytes", 0) for n in networks),
+            sum(n.get("tx_bytes", 0) for n in networks),
+            sum(e.get("value", 0) for e in io if (e.get("op") or "").lower() == "read"),
+            sum(e.get("value", 0) for e in io if (e.get("op") or "").lower() == "write"),
+        ),
+    }
+
+
+def percentile(values: list[float], q: float) -> float | None:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+class TimeSeries:
+    """
+    Fixed-memory ring of points, one array('f') column per metric plus an
+    array('d') of point start times. Samples are folded into the current
+    point as they arrive, so reads never wait for a point to close.
+    """
+
+    __slots__ = ("resolution", "points", "times", "columns", "_bucket", "_slot",
+                 "_cpu_sum", "_cpu_n", "_cpu_max", "_mem_max", "_base", "_last")
+
+    def __init__(self, resolution: float = TELEMETRY_RESOLUTION, points: int = TELEMETRY_POINTS):
+        self.resolution = resolution
+        self.points = points
+        self.times = array("d", bytes(8 * points))
+        self.columns = {metric: array("f", bytes(4 * points)) for metric in METRICS}
+        self._bucket = None
+        self._slot = 0
+        self._cpu_sum = self._cpu_n = 0
+        self._cpu_max = self._mem_max = 0.0
+        # (time, counters) the current point's rates are measured from
+        self._base = None
+        self._last = None
+
+    def add(self, t: float, cpu_percent: float | None, memory_bytes: float | None, counters: tuple | None = None):
+        bucket = t - t % self.resolution
+        columns = self.columns
+        if bucket != self._bucket:
+            self._bucket = bucket
+            self._slot = int(bucket // self.resolution) % self.points
+            self._cpu_sum = self._cpu_n = 0
+            self._cpu_max = self._mem_max = 0.0
+            for column in columns.values():
+                column[self._slot] = 0.0
+            if self._last is not None:
+                self._base = self._last
+        i = self._slot
+        self.times[i] = bucket
+
+        if cpu_percent is not None:
+            self._cpu_sum += cpu_percent
+            self._cpu_n += 1
+            self._cpu_max = max(self._cpu_max, cpu_percent)
+            columns["cpu_percent"][i] = self._cpu_sum / self._cpu_n
+            columns["cpu_max"][i] = self._cpu_max
+        if memory_bytes is not None:
+            self._mem_max = max(self._mem_max, memory_bytes)
+            columns["memory_bytes"][i] = self._mem_max
+
+        if counters is not None:
+            if self._base is None:
+                self._base = (t, counters)
+            base_t, base = self._base
+            if t > base_t:
+                for metric, value, start in zip(_RATES, counters, base):
+                    # Counters restart with the container; never report a negative rate
+                    columns[metric][i] = max(value - start, 0) / (t - base_t)
+            self._last = (t, counters)
+
+    def read(self, since: float | None = None, step: int = 1) -> dict:
+        """
+        Points oldest first as {"t": [...], metric: [...]}. step > 1 merges
+        that many points into one: means for CPU and rates, max for peaks.
+        """
+        slots = sorted((i for i in range(self.points) if self.times[i] and (since is None or self.times[i] >= since)),
+                       key=self.times.__getitem__)
+        width = self.resolution * max(step, 1)
+        groups = []
+        for i in slots:
+            key = self.times[i] // width
+            if groups and groups[-1][0] == key:
+                groups[-1][1].append(i)
+            else:
+                groups.append((key, [i]))
+
+        out = {"t": [key * width for key, _ in groups]}
+        for metric, column in self.columns.items():
+            merge = max if metric in ("cpu_max", "memory_bytes") else (lambda v: sum(v) / len(v))
+            out[metric] = [round(merge([column[i] for i in slot_group]), 2) for _, slot_group in groups]
+        return out
+
+    def nbytes(self) -> int:
+        return self.times.itemsize * self.points + sum(c.itemsize * self.points for c in self.columns.values())
+
+
+class ContainerSeries:
+    """History and lifetime totals of one container's resource usage."""
+
+    __slots__ = ("id", "name", "image", "job", "first_at", "last_at", "finished_at", "ring", "latest",
+                 "samples", "cpu_sum", "cpu_n", "cpu_max", "memory_peak", "memory_limit", "counters", "_prev_cpu")
+
+    def __init__(self, container_id: str, resolution: float, points: int):
+        self.id = container_id
+        self.name = None
+        self.image = None
+        self.job = None
+        self.first_at = None
+        self.last_at = None
+        self.finished_at = None
+        self.ring = TimeSeries(resolution, points)
+        self.latest = None
+        self.samples = 0
+        self.cpu_sum = 0.0
+        self.cpu_n = 0
+        self.cpu_max = 0.0
+        self.memory_peak = 0
+        self.memory_limit = None
+        self.counters = None
+        self._prev_cpu = None
+
+    def add_raw(self, t: float, raw: dict):
+        """Fold in one sample from the container's stats stream."""
+        usage = usage_counters(raw)
+        cpu_percent = None
+        # CPU % is measured between consecutive samples of our own stream
+        if self._prev_cpu is not None:
+            cpu_delta = usage["cpu_total"] - self._prev_cpu[0]
+            system_delta = usage["cpu_system"] - self._prev_cpu[1]
+            if system_delta > 0 and cpu_delta >= 0:
+                cpu_percent = cpu_delta / system_delta * usage["online_cpus"] * 100
+        self._prev_cpu = (usage["cpu_total"], usage["cpu_system"])
+        self.memory_limit = usage["memory_limit"] or None
+        self.counters = usage["counters"]
+        self._add(t, cpu_percent, usage["memory_bytes"], usage["counters"])
+        limit = self.memory_limit
+        self.latest = {
+            "id": self.id,
+            "name": self.name,
+            "cpu_percent": round(cpu_percent or 0.0, 2),
+            "memory_percent": round(usage["memory_bytes"] / limit * 100, 2) if limit else 0.0,
+            "memory_usage": usage["memory_bytes"],
+        }
+
+    def add_usage(self, t: float, usage: dict):
+        """Fold in a one-shot usage sample (cpu/memory only), for backends without a stats stream."""
+        memory = usage.get("memory_usage")
+        self._add(t, usage.get("cpu_percent"), memory if isinstance(memory, (int, float)) else None)
+        self.latest = {**usage, "name": self.name or usage.get("name")}
+
+    def _add(self, t, cpu_percent, memory_bytes, counters=None):
+        self.ring.add(t, cpu_percent, memory_bytes, counters)
+        self.first_at = self.first_at or t
+        self.last_at = t
+        self.samples += 1
+        if cpu_percent is not None:
+            self.cpu_sum += cpu_percent
+            self.cpu_n += 1
+            self.cpu_max = max(self.cpu_max, cpu_percent)
+        if memory_bytes is not None:
+            self.memory_peak = max(self.memory_peak, memory_bytes)
+
+    def summary(self) -> dict:
+        # Spread over the retained points, so a short spike doesn't set it
+        cpu_points = self.ring.read()["cpu_percent"]
+        totals = dict(zip(("net_rx_bytes", "net_tx_bytes", "io_read_bytes", "io_write_bytes"), self.counters or ()))
+        return {
+            "id": self.id,
+            "name": self.name,
+            "image": self.image,
+            "job": self.job,
+            "running": self.finished_at is None,
+            "first_at": self.first_at,
+            "last_at": self.last_at,
+            "finished_at": self.finished_at,
+            "samples": self.samples,
+            "cpu_mean": round(self.cpu_sum / self.cpu_n, 2) if self.cpu_n else None,
+            "cpu_p95": percentile(cpu_points, 0.95),
+            "cpu_max": round(self.cpu_max, 2),
+            "memory_peak": self.memory_peak,
+            "memory_limit": self.memory_limit,
+            "latest": self.latest,
+            **totals,
+        }
+
+
+class ContainerTelemetry:
+    """
+    Per-container CPU, memory, network and block IO history for this node.
+    Each running container gets one long-lived docker stats stream whose
+    samples are folded into a fixed-size ring; exited containers keep their
+    history until evicted to make room. Backends without a stats stream
+    (the CLI) are polled once per point instead.
+    """
+
+    def __init__(self, container_manager, records, resolution: float = TELEMETRY_RESOLUTION,
+                 points: int = TELEMETRY_POINTS, max_series: int = TELEMETRY_MAX_SERIES,
+                 discover_interval: float = TELEMETRY_DISCOVER_INTERVAL):
+        self._cm = container_manager
+        # Callable returning the agent's current container records
+        self._records = records
+        self.resolution = resolution
+        self.points = points
+        self.max_series = max_series
+        self.discover_interval = discover_interval
+        self._series = {}
+        self._streams = {}
+        # Decided once the Docker backend is known: streams, or polling without them
+        self.streaming = None
+        self.sampled_at = None
+        self._task = None
+
+    def _series_for(self, container_id: str) -> ContainerSeries:
+        series = self._series.get(container_id)
+        if series is None:
+            series = self._series[container_id] = ContainerSeries(container_id, self.resolution, self.points)
+            self._evict()
+        return series
+
+    def _evict(self):
+        excess = len(self._series) - self.max_series
+        if excess <= 0:
+            return
+        finished = sorted((s for s in self._series.values() if s.finished_at is not None),
+                          key=lambda s: s.finished_at)
+        for series in finished[:excess]:
+            del self._series[series.id]
+
+    def record(self, container_id: str, raw: dict, t: float | None = None):
+        """Fold a raw stats sample into a container's history."""
+        t = time.time() if t is None else t
+        self._series_for(container_id).add_raw(t, raw)
+        self.sampled_at = t
+
+    async def _follow(self, container_id: str):
+        try:
+            async for raw in self._cm.container_stats_stream_async(container_id):
+                self.record(container_id, raw)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Stats stream of {container_id[:12]} ended: {e}")
+        finally:
+            self._streams.pop(container_id, None)
+
+    async def discover(self):
+        """Start a stats stream for every running container that has none; mark exited ones finished."""
+        if self.streaming is None:
+            self.streaming = await self._cm.supports_stats_stream_async()
+            if not self.streaming:
+                print("Docker backend has no container stats stream; polling instead")
+        records = await self._records()
+        running = set()
+        for record in records:
+            labels = record.get("labels") or {}
+            # Idle warm-pool containers aren't worth a stream until a job claims them
+            if POOL_LABEL in labels and JOB_LABEL not in labels:
+                continue
+            cid = record["id"]
+            if record.get("state") == "running":
+                running.add(cid)
+                series = self._series_for(cid)
+                series.name, series.image, series.job = record.get("name"), record.get("image"), labels.get(JOB_LABEL)
+                series.finished_at = None
+                if self.streaming and cid not in self._streams:
+                    self._streams[cid] = asyncio.create_task(self._follow(cid))
+        now = time.time()
+        for series in self._series.values():
+            if series.id not in running and series.finished_at is None:
+                series.finished_at = now
+
+    async def poll(self):
+        """One-shot usage of every running container, for backends without a stats stream."""
+        now = time.time()
+        for usage in await self._cm.container_stats_async():
+            self._series_for(usage["id"]).add_usage(now, usage)
+        self.sampled_at = now
+
+    def find(self, key: str) -> ContainerSeries | None:
+        """A container's series by id, id prefix or name."""
+        series = self._series.get(key)
+        if series is not None:
+            return series
+        matches = [s for s in self._series.values() if s.name == key or s.id.startswith(key)]
+        # Names are reused by resubmitted jobs: prefer the newest container
+        return max(matches, key=lambda s: s.first_at or 0, default=None)
+
+    def series(self, key: str, since: float | None = None, step: int = 1) -> dict | None:
+        found = self.find(key)
+        if found is None:
+            return None
+        return {"id": found.id, "name": found.name, "image": found.image, "job": found.job,
+                **found.ring.read(since, step)}
+
+    def query(self, since: float | None = None, step: int = 1, keys: list[str] | None = None) -> dict:
+        """Columnar history of many containers (all of them unless keys are given)."""
+        chosen = [self.find(key) for key in keys] if keys else list(self._series.values())
+        return {
+            "resolution": self.resolution * max(step, 1),
+            "containers": [self.series(s.id, since, step) for s in chosen if s is not None],
+        }
+
+    def latest(self) -> list[dict]:
+        """Most recent usage of each running container, in the shape of container_stats()."""
+        return [s.latest for s in self._series.values() if s.finished_at is None and s.latest]
+
+    def summaries(self) -> list[dict]:
+        return [s.summary() for s in self._series.values() if s.samples]
+
+    def stats(self) -> dict:
+        return {
+            "streaming": self.streaming,
+            "streams": len(self._streams),
+            "series": len(self._series),
+            "resolution": self.resolution,
+            "points": self.points,
+            "ring_bytes": sum(s.ring.nbytes() for s in self._series.values()),
+            "sampled_at": self.sampled_at,
+        }
+
+    async def _run(self):
+        while True:
+            try:
+                await self.discover()
+                if not self.streaming:
+                    await self.poll()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error collecting container telemetry: {e}")
+            await asyncio.sleep(self.discover_interval if self.streaming else self.resolution)
+
+    def start(self):
+        if not self._task or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        tasks = [t for t in (self._task, *self._streams.values()) if t]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._streams.clear()
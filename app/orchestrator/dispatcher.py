@@ -0,0 +1,356 @@
+# app/orchestrator/dispatcher.py
+import asyncio
+import json
+import os
+import socket
+import time
+from datetime import datetime
+import repository
+from .container_record import GENERATION_LABEL, JOB_LABEL, ORCHESTRATOR_LABEL, finished_job_status
+from .models import Job, Node
+from .node_manager import online_nodes
+
+# Max in-flight deploy calls per node when an agent has no bulk endpoint
+FALLBACK_DEPLOY_CONCURRENCY = int(os.getenv("BATCH_DEPLOY_CONCURRENCY", "8"))
+
+# Pending jobs pulled from the queue per dispatch pass
+DISPATCH_BATCH_SIZE = int(os.getenv("DISPATCH_BATCH_SIZE", "500"))
+# Fallback wake-up when no node-online / capacity-freed event arrives
+DISPATCH_INTERVAL = float(os.getenv("DISPATCH_INTERVAL", "10"))
+# Per-node deploy rate limit (token bucket)
+DISPATCH_RATE_PER_NODE = float(os.getenv("DISPATCH_RATE_PER_NODE", "20"))
+DISPATCH_BURST_PER_NODE = int(os.getenv("DISPATCH_BURST_PER_NODE", "50"))
+# Deploy attempts before a queued job is marked failed
+DISPATCH_MAX_ATTEMPTS = int(os.getenv("DISPATCH_MAX_ATTEMPTS", "3"))
+# Seconds before a job whose deploy failed is tried again, doubling after each failure
+DISPATCH_RETRY_BACKOFF = float(os.getenv("DISPATCH_RETRY_BACKOFF", "5"))
+# Stamped on every job container so agents can tell whose jobs they run
+ORCHESTRATOR_ID = os.getenv("ORCHESTRATOR_ID", socket.gethostname())
+
+
+def job_labels(job: Job) -> dict:
+    # A resubmitted job gets a new submitted_at, so it doubles as the submit generation
+    generation = int(job.submitted_at.timestamp() * 1000) if job.submitted_at else 0
+    return {JOB_LABEL: job.id, GENERATION_LABEL: str(generation), ORCHESTRATOR_LABEL: ORCHESTRATOR_ID}
+
+
+def deploy_params(job: Job) -> dict:
+    params = {"image": job.image, "name": f"job-{job.id}", "cpus": job.cpu, "memory_mb": job.memory,
+              "labels": job_labels(job)}
+    if job.command:
+        params["command"] = job.command
+    return params
+
+
+def deploy_query(job: Job) -> dict:
+    """deploy_params for the single-container endpoint, which takes labels as repeated key=value params."""
+    params = deploy_params(job)
+    params["label"] = [f"{key}={value}" for key, value in params.pop("labels").items()]
+    return params
+
+
+async def _deploy_one(agent_client, node: Node, job: Job, limit: asyncio.Semaphore):
+    params = deploy_query(job)
+    async with limit:
+        try:
+            resp = await agent_client.post(node, "/containers", op="deploy", params=params)
+            job.status = "running" if resp.status_code == 200 else "failed"
+        except Exception as e:
+            print(f"Failed to deploy job {job.id}: {e}")
+            job.status = "failed"
+
+
+async def deploy_to_node(agent_client, node: Node, jobs: list[Job]) -> list[Job]:
+    """
+    Deploy a group of jobs to one node with a single bulk request, setting
+    each job's node_id and status. Falls back to one call per job for agents
+    without POST /containers/batch.
+    """
+    for job in jobs:
+        job.node_id = node.id
+
+    specs = []
+    for job in jobs:
+        params = deploy_params(job)
+        specs.append({**params, "command": params.get("command")})
+
+    try:
+        resp = await agent_client.post(node, "/containers/batch", op="deploy_batch", json=specs)
+    except Exception as e:
+        print(f"Failed to deploy batch of {len(jobs)} jobs to {node.id}: {e}")
+        resp = None
+
+    if resp is not None and resp.status_code == 404:
+        limit = asyncio.Semaphore(FALLBACK_DEPLOY_CONCURRENCY)
+        await asyncio.gather(*(_deploy_one(agent_client, node, job, limit) for job in jobs))
+    else:
+        outcomes = {}
+        if resp is not None and resp.status_code == 200:
+            for line in resp.text.splitlines():
+                if line:
+                    outcome = json.loads(line)
+                    outcomes[outcome.get("name")] = outcome
+        for job in jobs:
+            outcome = outcomes.get(f"job-{job.id}")
+            job.status = "running" if outcome and outcome.get("id") else "failed"
+
+    return jobs
+
+
+class _TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self, wanted: int) -> int:
+        """Take up to `wanted` tokens; returns how many were granted."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        granted = min(wanted, int(self.tokens))
+        self.tokens -= granted
+        return granted
+
+
+class Dispatcher:
+    """
+    Drains the persisted queue of pending jobs onto nodes as capacity
+    appears. Wakes on node-online and capacity-freed notifications, with a
+    periodic fallback, and rate-limits deploys per node. A job whose deploy
+    fails goes back to the queue with a growing delay, and is only marked
+    failed after max_attempts tries.
+    """
+
+    def __init__(self, node_manager, scheduler, agent_client, event_bus=None,
+                 batch_size: int = DISPATCH_BATCH_SIZE,
+                 interval: float = DISPATCH_INTERVAL,
+                 rate_per_node: float = DISPATCH_RATE_PER_NODE,
+                 burst_per_node: int = DISPATCH_BURST_PER_NODE,
+                 max_attempts: int = DISPATCH_MAX_ATTEMPTS,
+                 retry_backoff: float = DISPATCH_RETRY_BACKOFF):
+        self._node_manager = node_manager
+        self._scheduler = scheduler
+        self._agent_client = agent_client
+        self._event_bus = event_bus
+        self.batch_size = batch_size
+        self.interval = interval
+        self.rate_per_node = rate_per_node
+        self.burst_per_node = burst_per_node
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self._buckets = {}
+        # job_id -> (failed deploys so far, monotonic time it may be tried again, node it failed on)
+        self._retries = {}
+        self._wake = asyncio.Event()
+        self._task = None
+        self.dispatched = 0
+        self.failed = 0
+        self.retried = 0
+        self.passes = 0
+
+    def notify(self, *args):
+        """Wake the dispatcher (node came online, capacity was freed, ...)."""
+        self._wake.set()
+
+    def _bucket(self, node_id: str) -> _TokenBucket:
+        bucket = self._buckets.get(node_id)
+        if bucket is None:
+            bucket = self._buckets[node_id] = _TokenBucket(self.rate_per_node, self.burst_per_node)
+        return bucket
+
+    async def _load_pending(self, exclude: list[str]) -> list[Job]:
+        docs = await repository.find_pending_jobs(self.batch_size, exclude=exclude)
+        return [Job(**d) for d in docs]
+
+    def _backing_off(self, now: float) -> list[str]:
+        """Jobs whose last deploy failed and that aren't due for another try yet."""
+        forget_after = self.interval + self.retry_backoff * 2 ** self.max_attempts
+        for job_id, (_, retry_at, _) in list(self._retries.items()):
+            # Long due and never tried again: deleted, or no longer pending
+            if now - retry_at > forget_after:
+                del self._retries[job_id]
+        return [job_id for job_id, (_, retry_at, _) in self._retries.items() if retry_at > now]
+
+    def _deploy_failed(self, job: Job, now: float) -> bool:
+        """Count a failed deploy; True if the job should go back to the queue."""
+        attempts = self._retries.get(job.id, (0, now, None))[0] + 1
+        if attempts >= self.max_attempts:
+            self._retries.pop(job.id, None)
+            return False
+        delay = self.retry_backoff * 2 ** (attempts - 1)
+        self._retries[job.id] = (attempts, now + delay, job.node_id)
+        asyncio.get_running_loop().call_later(delay, self.notify)
+        return True
+
+    def _publish(self, jobs: list[Job]):
+        if self._event_bus is not None and jobs:
+            self._event_bus.publish("jobs", {"jobs": [job.model_dump(mode="json") for job in jobs], "removed": []})
+
+    async def settle(self, jobs: list[Job]):
+        """
+        Record the outcome of deploys, made by a dispatch pass or by a submit
+        call, of jobs stored as pending on their node. A failed deploy goes
+        back to the queue until max_attempts tries, unless an agent event
+        shows its container started after all.
+        """
+        now = time.monotonic()
+        done, retry = [], []
+        for job in jobs:
+            if job.status != "failed":
+                self._retries.pop(job.id, None)
+                self.dispatched += 1
+                done.append(job)
+                continue
+            self._scheduler.release(job.id, notify=False)
+            # Most deploy failures are an agent restarting or a network blip
+            if self._deploy_failed(job, now):
+                retry.append(job)
+            else:
+                self.failed += 1
+                done.append(job)
+
+        await repository.assign_pending_jobs([(job.id, job.status, job.node_id) for job in done])
+        requeued = set(await repository.requeue_jobs([(job.id, job.node_id) for job in retry]))
+        for job in retry:
+            if job.id in requeued:
+                job.status, job.node_id, job.assigned_at = "pending", None, None
+                self.retried += 1
+            else:
+                # Reported failed, yet its start event already moved it on: it runs there
+                self._retries.pop(job.id, None)
+                self._scheduler.reserve(job, job.node_id)
+        self._publish(done + [job for job in retry if job.id in requeued])
+
+    async def _started_anyway(self, pending: list[Job], nodes: list[Node]) -> list[Job]:
+        """
+        Before redeploying a job whose last deploy failed, ask the node it
+        failed on whether its container exists after all (a timed-out deploy
+        may still have started it). Those jobs are recorded as placed there;
+        returns the jobs that still need a deploy.
+        """
+        by_id = {node.id: node for node in nodes}
+        retried = [(job, by_id.get(self._retries[job.id][2])) for job in pending if job.id in self._retries]
+        checks = [(job, node) for job, node in retried if node is not None]
+        if not checks:
+            return pending
+
+        async def container(job: Job, node: Node) -> dict | None:
+            try:
+                resp = await self._agent_client.get(node, f"/jobs/{job.id}/container", op="list")
+            except Exception:
+                # Unreachable: a redeploy there fails too, one elsewhere can't clash
+                return None
+            return resp.json() if resp.status_code == 200 else None
+
+        found = await asyncio.gather(*(container(job, node) for job, node in checks))
+        started = []
+        for (job, node), record in zip(checks, found):
+            if record is None:
+                continue
+            self._retries.pop(job.id, None)
+            job.node_id = node.id
+            job.status = finished_job_status(record) or "running"
+            if job.status == "running":
+                self._scheduler.reserve(job, node.id)
+            started.append(job)
+        if not started:
+            return pending
+        await repository.assign_pending_jobs([(job.id, job.status, job.node_id) for job in started])
+        self._publish(started)
+        started_ids = {job.id for job in started}
+        return [job for job in pending if job.id not in started_ids]
+
+    async def dispatch_once(self) -> tuple[int, bool]:
+        """
+        One pass over the head of the queue.
+        Returns (jobs deployed, whether work was deferred by rate limits or a full batch).
+        """
+        self.passes += 1
+        nodes = online_nodes(await self._node_manager.list_nodes_async())
+        if not nodes:
+            return 0, False
+
+        loaded = await self._load_pending(self._backing_off(time.monotonic()))
+        pending = await self._started_anyway(loaded, nodes)
+        if not pending:
+            return 0, False
+
+        assignments, _ = self._scheduler.schedule_batch(pending, nodes)
+
+        deferred = False
+        groups = []
+        for node, group in assignments.values():
+            granted = self._bucket(node.id).take(len(group))
+            for job in group[granted:]:
+                # Over this node's rate limit: give the reservation back and retry later
+                self._scheduler.release(job.id, notify=False)
+                deferred = True
+            if granted:
+                groups.append((node, group[:granted]))
+
+        # Claimed before the deploy, as submit calls do, so agent events and
+        # reconciliation see which node each job is going to
+        assigned_at = datetime.utcnow()
+        for node, group in groups:
+            for job in group:
+                job.assigned_at = assigned_at
+            await repository.claim_pending_jobs([job.id for job in group], node.id, assigned_at)
+
+        results = await asyncio.gather(
+            *(deploy_to_node(self._agent_client, node, group) for node, group in groups)
+        )
+        deployed = [job for group in results for job in group]
+        if deployed:
+            await self.settle(deployed)
+            # A full batch that made progress probably has more queued behind it
+            deferred = deferred or len(loaded) == self.batch_size
+
+        return len(deployed), deferred
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+            try:
+                deployed, deferred = await self.dispatch_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error in dispatcher: {e}")
+                continue
+
+            if deferred:
+                # Let the token buckets refill a little before the next pass
+                asyncio.get_event_loop().call_later(1.0 / max(self.rate_per_node, 0.1), self._wake.set)
+
+    def stats(self) -> dict:
+        return {
+            "dispatched": self.dispatched,
+            "failed": self.failed,
+            "retried": self.retried,
+            "backing_off": len(self._retries),
+            "passes": self.passes,
+            "rate_per_node": self.rate_per_node,
+            "burst_per_node": self.burst_per_node,
+        }
+
+    def start(self):
+        if not self._task or self._task.done():
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+            # Drain anything left pending from before a restart
+            self._wake.set()
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
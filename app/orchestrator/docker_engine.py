@@ -0,0 +1,484 @@
+# app/orchestrator/docker_engine.py
+import asyncio
+import json
+import os
+from urllib.parse import quote
+
+import httpx
+
+from .container_record import ContainerRecord
+from .docker_subprocess import validate_image, validate_command, interpreter_command
+
+# Engine API socket; DOCKER_HOST=unix:///path overrides the default
+DOCKER_SOCKET = os.getenv("DOCKER_HOST", "unix:///var/run/docker.sock").removeprefix("unix://")
+# Keep-alive connections held open to the daemon
+DOCKER_MAX_CONNECTIONS = int(os.getenv("DOCKER_MAX_CONNECTIONS", "32"))
+DOCKER_API_TIMEOUT = float(os.getenv("DOCKER_API_TIMEOUT", "30"))
+# Image pulls triggered by a run can take much longer than an API call
+DOCKER_PULL_TIMEOUT = float(os.getenv("DOCKER_PULL_TIMEOUT", "600"))
+
+
+class EngineError(RuntimeError):
+    """Non-2xx answer from the Docker Engine API."""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class EngineNotFound(EngineError):
+    pass
+
+
+def usage_from_stats(container_id: str, name: str | None, raw: dict) -> dict:
+    """CPU/memory usage from one Engine API stats sample (as also returned by the SDK)."""
+    cpu = raw.get("cpu_stats", {})
+    precpu = raw.get("precpu_stats", {})
+    cpu_delta = cpu.get("cpu_usage", {}).get("total_usage", 0) - precpu.get("cpu_usage", {}).get("total_usage", 0)
+    system_delta = cpu.get("system_cpu_usage", 0) - precpu.get("system_cpu_usage", 0)
+    online_cpus = cpu.get("online_cpus") or 1
+    mem = raw.get("memory_stats", {})
+    mem_limit = mem.get("limit") or 0
+    return {
+        "id": container_id,
+        "name": name,
+        "cpu_percent": round(cpu_delta / system_delta * online_cpus * 100, 2) if system_delta > 0 else 0.0,
+        "memory_percent": round(mem.get("usage", 0) / mem_limit * 100, 2) if mem_limit else 0.0,
+        "memory_usage": mem.get("usage", 0),
+    }
+
+
+def _error(resp: httpx.Response) -> EngineError:
+    try:
+        message = resp.json().get("message", resp.text)
+    except ValueError:
+        message = resp.text
+    cls = EngineNotFound if resp.status_code == 404 else EngineError
+    return cls(resp.status_code, message)
+
+
+def pull_params(image: str) -> dict:
+    repo, _, tag = image.rpartition(":") if ":" in image.split("/")[-1] else (image, "", "latest")
+    return {"fromImage": repo, "tag": tag}
+
+
+def _pull_event(image: str, line: str) -> dict | None:
+    """One pull progress line; failures are reported in-band with a 200 status."""
+    if not line:
+        return None
+    event = json.loads(line)
+    if event.get("error"):
+        raise EngineError(500, f"Pull of {image} failed: {event['error']}")
+    return event
+
+
+def image_tags(images: list[dict]) -> list[str]:
+    """Local "repo:tag" names from a GET /images/json listing."""
+    return [tag for image in images for tag in (image.get("RepoTags") or []) if tag != "<none>:<none>"]
+
+
+def prune_params(until: float) -> dict:
+    """Filters for POST /containers/prune: stopped containers created before `until`."""
+    return {"filters": json.dumps({"until": [str(int(until))]})}
+
+
+def exec_body(argv: list[str]) -> dict:
+    # Output is drained but not kept; only the exit code matters to callers
+    return {"Cmd": argv, "AttachStdout": True, "AttachStderr": True}
+
+
+def log_params(follow: bool = False, tail: int | None = None, since: float | None = None) -> dict:
+    """Query for GET /containers/{id}/logs: stdout and stderr interleaved, as docker logs shows them."""
+    params = {"stdout": "1", "stderr": "1", "follow": "1" if follow else "0",
+              "tail": "all" if tail is None else str(int(tail))}
+    if since is not None:
+        params["since"] = str(since)
+    return params
+
+
+class LogDemuxer:
+    """
+    Strips the 8-byte frame headers Docker puts in front of every write of a
+    container without a TTY (stream type, 3 zero bytes, big-endian length).
+    Frames may be split across reads, so partial ones are held back until
+    the rest arrives. Streams that don't start with a frame header (TTY
+    containers) are passed through untouched.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._raw = None
+
+    def feed(self, data: bytes) -> list[bytes]:
+        if self._raw:
+            return [data] if data else []
+        self._buffer += data
+        if self._raw is None:
+            if len(self._buffer) < 8:
+                return []
+            self._raw = self._buffer[0] not in (0, 1, 2) or self._buffer[1:4] != b"\0\0\0"
+            if self._raw:
+                return self.flush()
+        payloads = []
+        while len(self._buffer) >= 8:
+            size = int.from_bytes(self._buffer[4:8], "big")
+            if len(self._buffer) < 8 + size:
+                break
+            if size:
+                payloads.append(bytes(self._buffer[8:8 + size]))
+            del self._buffer[:8 + size]
+        return payloads
+
+    def flush(self) -> list[bytes]:
+        """Whatever is held back at the end of the stream: short raw output, never a torn frame."""
+        data, self._buffer = bytes(self._buffer), bytearray()
+        return [data] if data and self._raw is not False else []
+
+
+def _log_timeout(follow: bool) -> httpx.Timeout:
+    # A followed container can stay quiet for as long as it likes
+    return httpx.Timeout(DOCKER_API_TIMEOUT, read=None if follow else DOCKER_API_TIMEOUT)
+
+
+def _path(container_id: str) -> str:
+    return f"/containers/{quote(container_id, safe='')}"
+
+
+def create_body(image: str, command: str | None, cpus: float, memory_mb: int, labels: dict | None = None,
+                argv: list[str] | None = None) -> dict:
+    """
+    Container create request with the same isolation as the CLI backend's
+    docker run. argv, when given, is run as-is instead of `command` through
+    the image's interpreter.
+    """
+    body = {
+        "Image": image,
+        "HostConfig": {
+            "Memory": int(memory_mb) * 1024 * 1024,
+            "NanoCpus": int(cpus * 1e9),
+            "NetworkMode": "none",
+            "SecurityOpt": ["no-new-privileges"],
+            "CapDrop": ["ALL"],
+        },
+    }
+    cmd = argv or interpreter_command(image, command)
+    if cmd:
+        body["Cmd"] = cmd
+    if labels:
+        body["Labels"] = dict(labels)
+    return body
+
+
+class DockerEngineClient:
+    """
+    Talks to the Docker Engine API over its unix socket with a persistent
+    keep-alive connection pool, exposing the same containers_* methods as
+    DockerSubprocessClient without forking a CLI process per call.
+    """
+
+    # containers_stats_stream() is available
+    supports_stats_stream = True
+
+    def __init__(self, socket_path: str = DOCKER_SOCKET, max_connections: int = DOCKER_MAX_CONNECTIONS,
+                 timeout: float = DOCKER_API_TIMEOUT, transport: httpx.BaseTransport | None = None):
+        self.socket_path = socket_path
+        limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self._http = httpx.Client(
+            transport=transport or httpx.HTTPTransport(uds=socket_path, limits=limits),
+            base_url="http://docker",
+            timeout=timeout,
+        )
+
+    def _request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        resp = self._http.request(method, path, **kwargs)
+        if resp.status_code >= 400:
+            raise _error(resp)
+        return resp
+
+    def ping(self):
+        """Test Docker connection"""
+        try:
+            return self._http.get("/_ping", timeout=5).status_code == 200
+        except Exception:
+            return False
+
+    def containers_list(self, all=False):
+        data = self._request("GET", "/containers/json", params={"all": "1" if all else "0"}).json()
+        return [ContainerRecord.from_ps(d) for d in data]
+
+    def containers_get(self, container_id):
+        return ContainerRecord.from_inspect(self._request("GET", f"{_path(container_id)}/json").json())
+
+    def containers_inspect(self, container_ids):
+        records = []
+        for container_id in container_ids:
+            try:
+                records.append(self.containers_get(container_id))
+            except EngineNotFound:
+                pass
+        return records
+
+    def images_list(self):
+        return image_tags(self._request("GET", "/images/json").json())
+
+    def images_pull(self, image: str, on_progress=None):
+        """Pull an image, passing each progress event to on_progress"""
+        # The progress stream has to be read to the end for the pull to finish
+        with self._http.stream("POST", "/images/create", params=pull_params(image),
+                               timeout=DOCKER_PULL_TIMEOUT) as resp:
+            if resp.status_code >= 400:
+                resp.read()
+                raise _error(resp)
+            for line in resp.iter_lines():
+                event = _pull_event(image, line)
+                if event and on_progress:
+                    on_progress(event)
+
+    def containers_run(self, image, name=None, command=None, detach=True, cpus=0.5, memory_mb=256, labels=None,
+                       argv=None):
+        validate_image(image)
+        validate_command(command)
+
+        params = {"name": name} if name else {}
+        body = create_body(image, command, cpus, memory_mb, labels, argv)
+        try:
+            created = self._request("POST", "/containers/create", params=params, json=body).json()
+        except EngineNotFound:
+            # Image not present locally; docker run would pull it too
+            self.images_pull(image)
+            created = self._request("POST", "/containers/create", params=params, json=body).json()
+
+        self._request("POST", f"/containers/{created['Id']}/start")
+        return self.containers_get(created["Id"])
+
+    def containers_stats(self):
+        """One-shot resource usage for all running containers"""
+        stats = []
+        for c in self.containers_list():
+            try:
+                raw = self._request("GET", f"/containers/{c.id}/stats", params={"stream": "false"}).json()
+            except EngineNotFound:
+                continue
+            stats.append(usage_from_stats(c.id, c.name, raw))
+        return stats
+
+    def containers_stats_stream(self, container_id):
+        """Yield one raw stats sample about every second until the container stops"""
+        with self._http.stream("GET", f"{_path(container_id)}/stats", params={"stream": "1"}) as resp:
+            if resp.status_code >= 400:
+                resp.read()
+                raise _error(resp)
+            for line in resp.iter_lines():
+                if line:
+                    yield json.loads(line)
+
+    def containers_stop(self, container_id, timeout=5):
+        try:
+            self._request("POST", f"{_path(container_id)}/stop",
+                          params={"t": timeout}, timeout=timeout + 10)
+            return True
+        except EngineError:
+            return False
+
+    def containers_remove(self, container_id, force=True):
+        try:
+            self._request("DELETE", _path(container_id),
+                          params={"force": "1" if force else "0"})
+            return True
+        except EngineError:
+            return False
+
+    def containers_exec(self, container_id, argv):
+        """Run argv inside a running container and wait for it; returns its exit code"""
+        created = self._request("POST", f"{_path(container_id)}/exec", json=exec_body(argv)).json()
+        with self._http.stream("POST", f"/exec/{created['Id']}/start", json={"Detach": False, "Tty": False}) as resp:
+            if resp.status_code >= 400:
+                resp.read()
+                raise _error(resp)
+            for _ in resp.iter_raw():
+                pass
+        return self._request("GET", f"/exec/{created['Id']}/json").json().get("ExitCode")
+
+    def containers_logs(self, container_id, follow=False, tail=None, since=None):
+        """Yield a container's output as byte chunks; with follow, until the container stops"""
+        demuxer = LogDemuxer()
+        with self._http.stream("GET", f"{_path(container_id)}/logs", params=log_params(follow, tail, since),
+                               timeout=_log_timeout(follow)) as resp:
+            if resp.status_code >= 400:
+                resp.read()
+                raise _error(resp)
+            for data in resp.iter_raw():
+                yield from demuxer.feed(data)
+            yield from demuxer.flush()
+
+    def containers_rename(self, container_id, name):
+        self._request("POST", f"{_path(container_id)}/rename", params={"name": name})
+
+    def containers_prune(self, until):
+        """Remove every stopped container created before `until` in one call"""
+        return self._request("POST", "/containers/prune", params=prune_params(until)).json()
+
+    def close(self):
+        self._http.close()
+
+
+class AsyncDockerEngineClient:
+    """
+    Async counterpart of DockerEngineClient: same calls over an async
+    unix-socket pool, so container operations don't hold a thread each.
+    """
+
+    supports_stats_stream = True
+
+    def __init__(self, socket_path: str = DOCKER_SOCKET, max_connections: int = DOCKER_MAX_CONNECTIONS,
+                 timeout: float = DOCKER_API_TIMEOUT, transport: httpx.AsyncBaseTransport | None = None,
+                 stats_concurrency: int = 8):
+        self.socket_path = socket_path
+        self.stats_concurrency = stats_concurrency
+        limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self._http = httpx.AsyncClient(
+            transport=transport or httpx.AsyncHTTPTransport(uds=socket_path, limits=limits),
+            base_url="http://docker",
+            timeout=timeout,
+        )
+        # Followed logs and stats streams hold a connection for as long as the
+        # container runs, so they get a pool of their own; otherwise a few dozen
+        # of them would leave list/create/stop calls waiting for a free connection.
+        # Their number is bounded by ContainerManager's per-op limits instead.
+        stream_limits = httpx.Limits(max_connections=None, max_keepalive_connections=max_connections)
+        self._streams = httpx.AsyncClient(
+            transport=transport or httpx.AsyncHTTPTransport(uds=socket_path, limits=stream_limits),
+            base_url="http://docker",
+            timeout=timeout,
+        )
+
+    async def _request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        resp = await self._http.request(method, path, **kwargs)
+        if resp.status_code >= 400:
+            raise _error(resp)
+        return resp
+
+    async def ping(self):
+        try:
+            return (await self._http.get("/_ping", timeout=5)).status_code == 200
+        except Exception:
+            return False
+
+    async def containers_list(self, all=False):
+        resp = await self._request("GET", "/containers/json", params={"all": "1" if all else "0"})
+        return [ContainerRecord.from_ps(d) for d in resp.json()]
+
+    async def containers_get(self, container_id):
+        return ContainerRecord.from_inspect((await self._request("GET", f"{_path(container_id)}/json")).json())
+
+    async def containers_inspect(self, container_ids):
+        async def one(container_id):
+            try:
+                return await self.containers_get(container_id)
+            except EngineNotFound:
+                return None
+
+        results = await asyncio.gather(*(one(cid) for cid in container_ids))
+        return [r for r in results if r is not None]
+
+    async def images_list(self):
+        return image_tags((await self._request("GET", "/images/json")).json())
+
+    async def images_pull(self, image: str, on_progress=None):
+        async with self._http.stream("POST", "/images/create", params=pull_params(image),
+                                     timeout=DOCKER_PULL_TIMEOUT) as resp:
+            if resp.status_code >= 400:
+                await resp.aread()
+                raise _error(resp)
+            async for line in resp.aiter_lines():
+                event = _pull_event(image, line)
+                if event and on_progress:
+                    on_progress(event)
+
+    async def containers_run(self, image, name=None, command=None, detach=True, cpus=0.5, memory_mb=256, labels=None,
+                       argv=None):
+        validate_image(image)
+        validate_command(command)
+
+        params = {"name": name} if name else {}
+        body = create_body(image, command, cpus, memory_mb, labels, argv)
+        try:
+            created = (await self._request("POST", "/containers/create", params=params, json=body)).json()
+        except EngineNotFound:
+            await self.images_pull(image)
+            created = (await self._request("POST", "/containers/create", params=params, json=body)).json()
+
+        await self._request("POST", f"/containers/{created['Id']}/start")
+        return await self.containers_get(created["Id"])
+
+    async def containers_stats(self):
+        """One-shot resource usage for all running containers, sampled concurrently"""
+        limit = asyncio.Semaphore(self.stats_concurrency)
+
+        async def sample(c):
+            async with limit:
+                try:
+                    resp = await self._request("GET", f"/containers/{c.id}/stats", params={"stream": "false"})
+                except EngineNotFound:
+                    return None
+            return usage_from_stats(c.id, c.name, resp.json())
+
+        results = await asyncio.gather(*(sample(c) for c in await self.containers_list()))
+        return [r for r in results if r is not None]
+
+    async def containers_stats_stream(self, container_id):
+        async with self._streams.stream("GET", f"{_path(container_id)}/stats", params={"stream": "1"}) as resp:
+            if resp.status_code >= 400:
+                await resp.aread()
+                raise _error(resp)
+            async for line in resp.aiter_lines():
+                if line:
+                    yield json.loads(line)
+
+    async def containers_stop(self, container_id, timeout=5):
+        try:
+            await self._request("POST", f"{_path(container_id)}/stop", params={"t": timeout}, timeout=timeout + 10)
+            return True
+        except EngineError:
+            return False
+
+    async def containers_remove(self, container_id, force=True):
+        try:
+            await self._request("DELETE", _path(container_id), params={"force": "1" if force else "0"})
+            return True
+        except EngineError:
+            return False
+
+    async def containers_exec(self, container_id, argv):
+        created = (await self._request("POST", f"{_path(container_id)}/exec", json=exec_body(argv))).json()
+        async with self._http.stream("POST", f"/exec/{created['Id']}/start",
+                                     json={"Detach": False, "Tty": False}) as resp:
+            if resp.status_code >= 400:
+                await resp.aread()
+                raise _error(resp)
+            async for _ in resp.aiter_raw():
+                pass
+        return (await self._request("GET", f"/exec/{created['Id']}/json")).json().get("ExitCode")
+
+    async def containers_logs(self, container_id, follow=False, tail=None, since=None):
+        demuxer = LogDemuxer()
+        async with self._streams.stream("GET", f"{_path(container_id)}/logs", params=log_params(follow, tail, since),
+                                        timeout=_log_timeout(follow)) as resp:
+            if resp.status_code >= 400:
+                await resp.aread()
+                raise _error(resp)
+            async for data in resp.aiter_raw():
+                for payload in demuxer.feed(data):
+                    yield payload
+            for payload in demuxer.flush():
+                yield payload
+
+    async def containers_rename(self, container_id, name):
+        await self._request("POST", f"{_path(container_id)}/rename", params={"name": name})
+
+    async def containers_prune(self, until):
+        return (await self._request("POST", "/containers/prune", params=prune_params(until))).json()
+
+    async def close(self):
+        await self._streams.aclose()
+        await self._http.aclose()
@@ -1,6 +1,10 @@
 import subprocess
 import json
+import os
 import re
+from functools import lru_cache
+
+from .container_record import ContainerRecord
 
 ALLOWED_IMAGES = [
     'python:3.11-slim', 'python:3.10-slim', 'python:3.9-slim',
@@ -31,8 +35,58 @@ BLOCKED_PATTERNS = [
 ]
 
 
+# Verdicts remembered for repeated identical commands (batch submissions)
+COMMAND_CACHE_SIZE = int(os.getenv("COMMAND_CACHE_SIZE", "4096"))
+
+_REGEX_META = set('.^$*+?{}[]|()')
+
+
+def _literal_prefix(pattern: str) -> tuple[str, str]:
+    """Split a pattern into the literal text it must start with and the regex remainder."""
+    literal, i = [], 0
+    while i < len(pattern):
+        char, width = pattern[i], 1
+        if char == '\\':
+            if i + 1 == len(pattern) or pattern[i + 1].isalnum():
+                break
+            char, width = pattern[i + 1], 2
+        elif char in _REGEX_META:
+            break
+        # A quantified character is optional or repeated, so not part of a fixed prefix
+        if pattern[i + width:i + width + 1] in ('*', '+', '?', '{'):
+            break
+        literal.append(char)
+        i += width
+    return ''.join(literal), pattern[i:]
+
+
+def _factor(branches: list[tuple[str, str]]) -> str:
+    """Alternation of (literal, remainder) branches with shared literal prefixes merged into a trie."""
+    by_first = {}
+    tails = []
+    for literal, rest in branches:
+        if literal:
+            by_first.setdefault(literal[0], []).append((literal[1:], rest))
+        else:
+            tails.append(f'(?:{rest})')
+    alternatives = [re.escape(char) + _factor(sub) for char, sub in by_first.items()] + tails
+    return alternatives[0] if len(alternatives) == 1 else '(?:' + '|'.join(alternatives) + ')'
+
+
+# All blocked patterns as one regex, so a command is scanned once instead of
+# once per pattern. Plain alternation (or named groups per rule) defeats the
+# regex engine's literal-prefix skipping and is slower than the loop it
+# replaces; merging the patterns' literal prefixes into a trie keeps the
+# per-position work small. The rule itself is found afterwards by re-matching
+# only at the hit.
+_BLOCKED = re.compile(_factor([_literal_prefix(pattern) for pattern in BLOCKED_PATTERNS]))
+_BLOCKED_RULES = [(pattern, re.compile(pattern)) for pattern in BLOCKED_PATTERNS]
+
+
 class SecurityError(Exception):
-    pass
+    def __init__(self, message: str, rule: str | None = None):
+        super().__init__(message)
+        self.rule = rule
 
 
 def validate_image(image: str) -> None:
@@ -40,18 +94,85 @@ def validate_image(image: str) -> None:
         raise SecurityError(f"Image '{image}' not allowed")
 
 
+@lru_cache(maxsize=COMMAND_CACHE_SIZE)
+def blocked_rule(command: str) -> str | None:
+    """The BLOCKED_PATTERNS entry a command trips (the leftmost match), or None."""
+    command = command.lower()
+    match = _BLOCKED.search(command)
+    if match is None:
+        return None
+    for pattern, compiled in _BLOCKED_RULES:
+        if compiled.match(command, match.start()):
+            return pattern
+    return None
+
+
 def validate_command(command: str) -> None:
     if not command:
         return
-    cmd_lower = command.lower()
-    for pattern in BLOCKED_PATTERNS:
-        if re.search(pattern, cmd_lower):
-            raise SecurityError("Command contains blocked pattern")
+    rule = blocked_rule(command)
+    if rule is not None:
+        raise SecurityError(f"Command contains blocked pattern: {rule}", rule=rule)
+
+
+def interpreter_command(image: str, command: str | None) -> list[str]:
+    """Argv that runs a job command with the image's interpreter."""
+    if not command:
+        return []
+    if 'python' in image:
+        return ['python', '-c', command]
+    if 'node' in image:
+        return ['node', '-e', command]
+    if 'ruby' in image:
+        return ['ruby', '-e', command]
+    return ['sh', '-c', command]
+
+
+def _parse_percent(value):
+    try:
+        return float((value or '').rstrip('%'))
+    except ValueError:
+        return 0.0
+
+
+class ProcessOutput:
+    """
+    Iterator over a process's stdout in chunks. Unlike a generator, close()
+    may be called from another thread while a read is blocked: it kills the
+    process, so a quiet `docker logs -f` ends once its reader has gone.
+    """
+
+    def __init__(self, proc: subprocess.Popen, chunk_size: int = 65536):
+        self._proc = proc
+        self._chunk_size = chunk_size
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> bytes:
+        if self._proc.stdout.closed:
+            raise StopIteration
+        # Unbuffered pipe: each read returns whatever docker has written so far
+        chunk = self._proc.stdout.read(self._chunk_size)
+        if not chunk:
+            self.close()
+            # Only the reading thread closes the pipe; close() may run mid-read
+            self._proc.stdout.close()
+            raise StopIteration
+        return chunk
+
+    def close(self):
+        if self._proc.poll() is None:
+            self._proc.kill()
+        self._proc.wait()
 
 
 class DockerSubprocessClient:
     """Use Docker CLI as fallback for Windows named pipe issues"""
 
+    # docker stats only prints formatted percentages, not the raw counters a stream needs
+    supports_stats_stream = False
+
     def ping(self):
         """Test Docker connection"""
         try:
@@ -73,19 +194,7 @@ class DockerSubprocessClient:
         if result.returncode != 0:
             raise RuntimeError(f"Docker CLI error: {result.stderr}")
 
-        containers = []
-        for line in result.stdout.strip().split('\n'):
-            if line:
-                data = json.loads(line)
-                # Create a simple object that mimics docker SDK container
-                container = type('Container', (), {
-                    'id': data.get('ID', ''),
-                    'name': data.get('Names', ''),
-                    'status': data.get('Status', ''),
-                    'image': type('Image', (), {'tags': [data.get('Image', '')]})()
-                })()
-                containers.append(container)
-        return containers
+        return [ContainerRecord.from_ps(json.loads(line)) for line in result.stdout.splitlines() if line]
 
     def containers_get(self, container_id):
         """Get a single container"""
@@ -98,42 +207,41 @@ class DockerSubprocessClient:
         if result.returncode != 0:
             raise RuntimeError(f"Container not found: {container_id}")
 
-        data = json.loads(result.stdout)[0]
-        container = type('Container', (), {
-            'id': data['Id'],
-            'name': data['Name'].lstrip('/'),
-            'status': data['State']['Status'],
-            'image': type('Image', (), {
-                'tags': data.get('Config', {}).get('Image', 'unknown').split()
-            })()
-        })()
-        return container
-
-    def containers_run(self, image, name=None, command=None, detach=True):
+        return ContainerRecord.from_inspect(json.loads(result.stdout)[0])
+
+    def containers_inspect(self, container_ids):
+        """Full records for many containers with a single docker inspect; unknown ids are skipped"""
+        if not container_ids:
+            return []
+        result = subprocess.run(
+            ['docker', 'inspect', *container_ids],
+            capture_output=True,
+            text=True,
+            timeout=10
+        )
+        # Exits non-zero if any id is gone, but still prints the ones it found
+        return [ContainerRecord.from_inspect(data) for data in json.loads(result.stdout or '[]')]
+
+    def containers_run(self, image, name=None, command=None, detach=True, cpus=0.5, memory_mb=256, labels=None,
+                       argv=None):
         validate_image(image)
         validate_command(command)
 
         cmd = ['docker', 'run']
         if detach:
             cmd.append('-d')
-        cmd.extend(['--memory', '256m'])
-        cmd.extend(['--cpus', '0.5'])
+        cmd.extend(['--memory', f'{int(memory_mb)}m'])
+        cmd.extend(['--cpus', str(cpus)])
         cmd.extend(['--network', 'none'])
         cmd.extend(['--security-opt', 'no-new-privileges'])
         cmd.extend(['--cap-drop', 'ALL'])
         if name:
             cmd.extend(['--name', name])
+        for key, value in (labels or {}).items():
+            cmd.extend(['--label', f'{key}={value}'])
         cmd.append(image)
-        if command:
-            # Use appropriate interpreter based on image
-            if 'python' in image:
-                cmd.extend(['python', '-c', command])
-            elif 'node' in image:
-                cmd.extend(['node', '-e', command])
-            elif 'ruby' in image:
-                cmd.extend(['ruby', '-e', command])
-            else:
-                cmd.extend(['sh', '-c', command])
+        # Use appropriate interpreter based on image
+        cmd.extend(argv or interpreter_command(image, command))
 
         result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
         if result.returncode != 0:
@@ -142,6 +250,30 @@ class DockerSubprocessClient:
         container_id = result.stdout.strip()
         return self.containers_get(container_id)
 
+    def containers_stats(self):
+        """One-shot resource usage for all running containers via docker stats"""
+        result = subprocess.run(
+            ['docker', 'stats', '--no-stream', '--no-trunc', '--format', '{{json .}}'],
+            capture_output=True,
+            text=True,
+            timeout=15
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"Docker CLI error: {result.stderr}")
+
+        stats = []
+        for line in result.stdout.strip().split('\n'):
+            if line:
+                data = json.loads(line)
+                stats.append({
+                    'id': data.get('ID', ''),
+                    'name': data.get('Name', ''),
+                    'cpu_percent': _parse_percent(data.get('CPUPerc')),
+                    'memory_percent': _parse_percent(data.get('MemPerc')),
+                    'memory_usage': data.get('MemUsage', ''),
+                })
+        return stats
+
     def containers_stop(self, container_id, timeout=5):
         """Stop a container"""
         result = subprocess.run(
@@ -161,3 +293,68 @@ class DockerSubprocessClient:
 
         result = subprocess.run(cmd, capture_output=True, text=True, timeout=10)
         return result.returncode == 0
+
+    def images_list(self):
+        """Local "repo:tag" image names via docker images"""
+        result = subprocess.run(
+            ['docker', 'images', '--format', '{{.Repository}}:{{.Tag}}'],
+            capture_output=True,
+            text=True,
+            timeout=10
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"Docker CLI error: {result.stderr}")
+        return [line for line in result.stdout.splitlines() if line and '<none>' not in line]
+
+    def images_pull(self, image, on_progress=None):
+        """Pull an image with docker pull; progress is reported per output line"""
+        validate_image(image)
+        proc = subprocess.Popen(['docker', 'pull', image], stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE, text=True)
+        for line in proc.stdout:
+            if on_progress:
+                on_progress({"status": line.strip()})
+        if proc.wait() != 0:
+            raise RuntimeError(f"Docker pull failed: {proc.stderr.read()}")
+
+    def containers_exec(self, container_id, argv):
+        """Run argv inside a running container and wait for it; returns its exit code"""
+        result = subprocess.run(['docker', 'exec', container_id, *argv], capture_output=True, text=True, timeout=30)
+        return result.returncode
+
+    def containers_logs(self, container_id, follow=False, tail=None, since=None):
+        """A container's output as an iterator of byte chunks via docker logs (stderr interleaved with stdout)"""
+        cmd = ['docker', 'logs']
+        if follow:
+            cmd.append('--follow')
+        if tail is not None:
+            cmd.extend(['--tail', str(int(tail))])
+        if since is not None:
+            cmd.extend(['--since', str(since)])
+        cmd.append(container_id)
+
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, bufsize=0)
+        return ProcessOutput(proc)
+
+    def containers_rename(self, container_id, name):
+        result = subprocess.run(['docker', 'rename', container_id, name], capture_output=True, text=True, timeout=10)
+        if result.returncode != 0:
+            raise RuntimeError(f"Docker rename failed: {result.stderr}")
+
+    def containers_prune(self, until):
+        """Remove every stopped container created before `until` with one docker container prune"""
+        result = subprocess.run(
+            ['docker', 'container', 'prune', '-f', '--filter', f'until={int(until)}'],
+            capture_output=True,
+            text=True,
+            timeout=60
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"Docker CLI error: {result.stderr}")
+        # "Deleted Containers:", one id per line, then "Total reclaimed space: ..."
+        deleted = [line.strip() for line in result.stdout.splitlines()
+                   if re.fullmatch(r'[0-9a-f]{12,64}', line.strip())]
+        return {"ContainersDeleted": deleted, "SpaceReclaimed": None}
+
+    def close(self):
+        """Nothing to release; present so all backends can be shut down alike"""
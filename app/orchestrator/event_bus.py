@@ -0,0 +1,77 @@
+# app/orchestrator/event_bus.py
+import asyncio
+import itertools
+import os
+from collections import deque
+
+# Per-subscriber backlog before it is told to resync instead of being sent every event
+SUBSCRIBER_QUEUE_SIZE = int(os.getenv("EVENT_SUBSCRIBER_QUEUE_SIZE", "1000"))
+# Recent events kept so a reconnecting client can resume from Last-Event-ID
+EVENT_REPLAY_SIZE = int(os.getenv("EVENT_REPLAY_SIZE", "256"))
+
+
+class EventBus:
+    """
+    In-process fan-out of live update events (nodes, containers, jobs) to
+    any number of subscribers. Publishing never blocks: a subscriber that
+    falls behind gets a single "resync" event in place of its backlog.
+    """
+
+    def __init__(self, queue_size: int = SUBSCRIBER_QUEUE_SIZE, replay_size: int = EVENT_REPLAY_SIZE):
+        self.queue_size = queue_size
+        self._ids = itertools.count(1)
+        self._recent = deque(maxlen=replay_size)
+        self._subscribers = set()
+        self.published = 0
+        self.overflows = 0
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def publish(self, topic: str, data) -> int:
+        event = (next(self._ids), topic, data)
+        self._recent.append(event)
+        self.published += 1
+        for queue in list(self._subscribers):
+            self._offer(queue, event)
+        return event[0]
+
+    def _offer(self, queue: asyncio.Queue, event: tuple):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflows += 1
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait((event[0], "resync", None))
+
+    def subscribe(self, last_event_id: int | None = None) -> asyncio.Queue:
+        """
+        Register a subscriber queue of (id, topic, data) tuples. Events after
+        last_event_id are replayed when still buffered; otherwise the first
+        event is a "resync".
+        """
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        if last_event_id is not None:
+            latest = self._recent[-1][0] if self._recent else 0
+            oldest = self._recent[0][0] if self._recent else latest + 1
+            # Ahead of us (we restarted) or behind the replay buffer: can't fill the gap
+            if last_event_id > latest or last_event_id + 1 < oldest:
+                queue.put_nowait((latest, "resync", None))
+            else:
+                for event in self._recent:
+                    if event[0] > last_event_id:
+                        self._offer(queue, event)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": self.subscriber_count,
+            "published": self.published,
+            "overflows": self.overflows,
+        }
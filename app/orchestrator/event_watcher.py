@@ -0,0 +1,89 @@
+# app/orchestrator/event_watcher.py
+import asyncio
+import json
+
+# Container lifecycle actions the orchestrator cares about
+WATCHED_ACTIONS = ("start", "die", "oom")
+
+
+def parse_event(line: str) -> dict | None:
+    """Convert one `docker events --format '{{json .}}'` line into a small event dict."""
+    try:
+        data = json.loads(line)
+    except ValueError:
+        return None
+
+    action = data.get("Action") or data.get("status")
+    if data.get("Type", "container") != "container" or action not in WATCHED_ACTIONS:
+        return None
+
+    actor = data.get("Actor", {}) or {}
+    attrs = actor.get("Attributes", {}) or {}
+    exit_code = attrs.get("exitCode")
+    return {
+        "container_id": actor.get("ID") or data.get("id"),
+        "name": attrs.get("name"),
+        "image": attrs.get("image"),
+        "action": action,
+        "exit_code": int(exit_code) if exit_code not in (None, "") else None,
+        "time": data.get("time"),
+    }
+
+
+class ContainerEventWatcher:
+    """
+    Follows the Docker event stream and hands container lifecycle events
+    to a callback. Restarts the stream if the daemon goes away.
+    """
+
+    def __init__(self, on_event, retry_delay: float = 5.0):
+        self._on_event = on_event
+        self._retry_delay = retry_delay
+        self._task = None
+        self._proc = None
+
+    async def _follow(self):
+        cmd = ["docker", "events", "--format", "{{json .}}", "--filter", "type=container"]
+        for action in WATCHED_ACTIONS:
+            cmd.extend(["--filter", f"event={action}"])
+
+        self._proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        try:
+            while True:
+                line = await self._proc.stdout.readline()
+                if not line:
+                    break
+                event = parse_event(line.decode(errors="replace"))
+                if event:
+                    await self._on_event(event)
+        finally:
+            if self._proc.returncode is None:
+                self._proc.kill()
+                await self._proc.wait()
+            self._proc = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self._follow()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Docker event stream error: {e}")
+            await asyncio.sleep(self._retry_delay)
+
+    def start(self):
+        if not self._task or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
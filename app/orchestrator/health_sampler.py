@@ -0,0 +1,111 @@
+# app/orchestrator/health_sampler.py
+import asyncio
+import os
+import socket
+import time
+from collections import deque
+import psutil
+
+
+class HealthSampler:
+    """
+    Samples host and container utilisation on a background task so the
+    agent's /health endpoint can answer from memory without blocking.
+    """
+
+    def __init__(
+        self,
+        container_manager=None,
+        interval: float = float(os.getenv("HEALTH_SAMPLE_INTERVAL", "1.0")),
+        window: int = int(os.getenv("HEALTH_SAMPLE_WINDOW", "10")),
+        container_interval: float = float(os.getenv("CONTAINER_SAMPLE_INTERVAL", "10.0")),
+        disk_path: str = os.getenv("HEALTH_DISK_PATH", "/"),
+        telemetry=None,
+    ):
+        self._cm = container_manager
+        # When given, per-container usage comes from its stats streams instead of a poll
+        self._telemetry = telemetry
+        self.interval = interval
+        self.container_interval = container_interval
+        self.disk_path = disk_path
+        self._cpu_window = deque(maxlen=max(window, 1))
+        self._latest = None
+        self._containers = []
+        self._containers_at = None
+        self._task = None
+        self._container_task = None
+
+    def sample_now(self) -> dict:
+        """Take one non-blocking sample of host metrics and store it as the latest."""
+        # interval=None compares against the previous call instead of sleeping
+        cpu = psutil.cpu_percent(interval=None)
+        self._cpu_window.append(cpu)
+        mem = psutil.virtual_memory()
+        try:
+            disk_percent = psutil.disk_usage(self.disk_path).percent
+        except OSError:
+            disk_percent = None
+        try:
+            load_avg = [round(x, 2) for x in psutil.getloadavg()]
+        except (AttributeError, OSError):
+            load_avg = None
+
+        self._latest = {
+            "hostname": socket.gethostname(),
+            "status": "ok",
+            "cpu_percent": round(sum(self._cpu_window) / len(self._cpu_window), 2),
+            "cpu_percent_instant": cpu,
+            "memory_percent": mem.percent,
+            "cpu_count": psutil.cpu_count(),
+            "memory_total_mb": round(mem.total / (1024 * 1024)),
+            "disk_percent": disk_percent,
+            "load_avg": load_avg,
+            "sampled_at": time.time(),
+        }
+        return self._latest
+
+    def latest(self) -> dict:
+        """Most recent sample plus its age, taking a first sample if none exists yet."""
+        sample = self._latest or self.sample_now()
+        result = dict(sample)
+        result["sample_age"] = round(time.time() - sample["sampled_at"], 3)
+        containers, containers_at = self._containers, self._containers_at
+        if self._telemetry is not None:
+            containers, containers_at = self._telemetry.latest(), self._telemetry.sampled_at
+        result["containers"] = containers
+        result["containers_sample_age"] = round(time.time() - containers_at, 3) if containers_at else None
+        return result
+
+    async def _host_loop(self):
+        # Prime psutil's CPU counter so the first real sample covers one interval
+        psutil.cpu_percent(interval=None)
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.sample_now()
+            except Exception as e:
+                print(f"Health sample failed: {e}")
+
+    async def _container_loop(self):
+        while True:
+            try:
+                self._containers = await self._cm.container_stats_async()
+                self._containers_at = time.time()
+            except Exception as e:
+                print(f"Container stats sample failed: {e}")
+            await asyncio.sleep(self.container_interval)
+
+    def start(self):
+        if not self._task or self._task.done():
+            self._task = asyncio.create_task(self._host_loop())
+        if self._cm is not None and self._telemetry is None and (not self._container_task or self._container_task.done()):
+            self._container_task = asyncio.create_task(self._container_loop())
+
+    async def stop(self):
+        for task in (self._task, self._container_task):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
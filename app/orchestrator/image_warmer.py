@@ -0,0 +1,164 @@
+# app/orchestrator/image_warmer.py
+import asyncio
+import os
+import time
+
+from .docker_subprocess import ALLOWED_IMAGES, SecurityError, validate_image
+
+# Images kept pulled on every agent (comma separated); defaults to the allow-list
+WARM_IMAGES = [i.strip() for i in os.getenv("WARM_IMAGES", ",".join(ALLOWED_IMAGES)).split(",") if i.strip()]
+# How often the local image inventory is re-read and missing warm images pulled
+IMAGE_WARM_INTERVAL = float(os.getenv("IMAGE_WARM_INTERVAL", "300"))
+
+
+class _PullProgress:
+    """Aggregate of one image pull's per-layer progress events."""
+
+    __slots__ = ("image", "status", "started_at", "finished_at", "error", "_layers", "task")
+
+    def __init__(self, image: str):
+        self.image = image
+        self.status = "pulling"
+        self.started_at = time.time()
+        self.finished_at = None
+        self.error = None
+        self._layers = {}
+        self.task = None
+
+    def update(self, event: dict):
+        layer = event.get("id")
+        if not layer:
+            return
+        detail = event.get("progressDetail") or {}
+        current, total = self._layers.get(layer, (0, 0))
+        if event.get("status") in ("Pull complete", "Already exists"):
+            current = total
+        self._layers[layer] = (detail.get("current", current), detail.get("total", total))
+
+    def to_dict(self) -> dict:
+        current = sum(c for c, _ in self._layers.values())
+        total = sum(t for _, t in self._layers.values())
+        return {
+            "image": self.image,
+            "status": self.status,
+            "layers": len(self._layers),
+            "current_bytes": current,
+            "total_bytes": total,
+            "percent": round(current / total * 100, 1) if total else None,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+
+
+class ImageWarmer:
+    """
+    Keeps a set of images pulled on this node so job starts never pull
+    inline, tracks the local image inventory for health reports, and
+    records progress of every pull it runs. Concurrent requests for the
+    same image share one pull.
+    """
+
+    def __init__(self, container_manager, images: list[str] = WARM_IMAGES, interval: float = IMAGE_WARM_INTERVAL):
+        self._cm = container_manager
+        self.images = list(images)
+        self.interval = interval
+        self.inventory = set()
+        self.inventory_at = None
+        self._pulls = {}
+        self._task = None
+
+    async def refresh_inventory(self) -> set:
+        self.inventory = set(await self._cm.list_images_async())
+        self.inventory_at = time.time()
+        return self.inventory
+
+    def has(self, image: str) -> bool:
+        # Docker lists untagged pulls as repo:latest
+        return image in self.inventory or (":" not in image.split("/")[-1] and f"{image}:latest" in self.inventory)
+
+    async def _pull(self, progress: _PullProgress):
+        try:
+            await self._cm.pull_image_async(progress.image, progress.update)
+            progress.status = "done"
+            self.inventory.add(progress.image)
+        except Exception as e:
+            progress.status = "failed"
+            progress.error = str(e)
+            print(f"Failed to pull {progress.image}: {e}")
+        finally:
+            progress.finished_at = time.time()
+
+    def pull(self, image: str) -> asyncio.Task:
+        """Start pulling an image, or join the pull already running for it."""
+        validate_image(image)
+        progress = self._pulls.get(image)
+        if progress is None or progress.task.done():
+            progress = self._pulls[image] = _PullProgress(image)
+            progress.task = asyncio.create_task(self._pull(progress))
+        return progress.task
+
+    async def ensure(self, image: str) -> bool:
+        """Wait until an image is local (pulling it if needed); False if the pull failed."""
+        if self.has(image):
+            return True
+        try:
+            task = self.pull(image)
+        except SecurityError:
+            # Not ours to pull; starting the container will reject it
+            return False
+        await asyncio.shield(task)
+        return self.has(image)
+
+    async def warm(self):
+        """Re-read the inventory and pull every warm image that is missing."""
+        await self.refresh_inventory()
+        pulls = []
+        for image in self.images:
+            if self.has(image):
+                continue
+            try:
+                pulls.append(self.pull(image))
+            except SecurityError as e:
+                print(f"Not warming {image}: {e}")
+        if pulls:
+            await asyncio.gather(*pulls)
+
+    def progress(self, image: str | None = None):
+        if image is not None:
+            pull = self._pulls.get(image)
+            return pull.to_dict() if pull else None
+        return [pull.to_dict() for pull in self._pulls.values()]
+
+    def stats(self) -> dict:
+        return {
+            "images": sorted(self.inventory),
+            "warm": self.images,
+            "missing": [image for image in self.images if not self.has(image)],
+            "inventory_at": self.inventory_at,
+        }
+
+    async def _run(self):
+        while True:
+            try:
+                await self.warm()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error warming images: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if not self._task or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        for pull in self._pulls.values():
+            if pull.task and not pull.task.done():
+                pull.task.cancel()
@@ -0,0 +1,65 @@
+# app/orchestrator/live_updates.py
+import asyncio
+import os
+
+# How often node and container changes are collected for live subscribers
+LIVE_UPDATE_INTERVAL = float(os.getenv("LIVE_UPDATE_INTERVAL", "2"))
+
+
+class LiveUpdates:
+    """
+    Single producer of node and container change events for the event bus.
+    Only does work while someone is subscribed, so any number of open
+    dashboards costs one health snapshot read and one delta pull per node
+    per interval, however many are watching.
+    """
+
+    def __init__(self, bus, node_manager, cluster_state, interval: float = LIVE_UPDATE_INTERVAL):
+        self._bus = bus
+        self._node_manager = node_manager
+        self._cluster_state = cluster_state
+        self.interval = interval
+        self._nodes_seen = None
+        self._containers_seen = None
+        self._task = None
+
+    async def publish_changes(self):
+        """Publish whatever changed since the previous call as "nodes" / "containers" deltas."""
+        nodes = self._node_manager.track_changes()
+        self._nodes_seen = self._publish_delta("nodes", nodes, self._nodes_seen)
+
+        await self._cluster_state.sync_all(self._node_manager.list_nodes())
+        containers = self._cluster_state.changes
+        self._containers_seen = self._publish_delta("containers", containers, self._containers_seen)
+
+    def _publish_delta(self, topic: str, index, seen: tuple | None) -> tuple:
+        if seen is not None and seen == (index.epoch, index.revision):
+            return seen
+        since = seen[1] if seen is not None else 0
+        epoch = seen[0] if seen is not None else index.epoch
+        self._bus.publish(topic, index.delta(since, epoch))
+        return index.epoch, index.revision
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            if not self._bus.subscriber_count:
+                continue
+            try:
+                await self.publish_changes()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error publishing live updates: {e}")
+
+    def start(self):
+        if not self._task or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
@@ -0,0 +1,151 @@
+# app/orchestrator/log_archive.py
+import asyncio
+import gzip
+import os
+import re
+import time
+from collections import deque
+
+# Directory finished job logs are gzipped into; unset disables archiving
+LOG_ARCHIVE_DIR = os.getenv("LOG_ARCHIVE_DIR", "")
+# Archives older than this many seconds are deleted
+LOG_ARCHIVE_MAX_AGE = float(os.getenv("LOG_ARCHIVE_MAX_AGE", str(7 * 86400)))
+
+# Uncompressed bytes gathered before each write to an archive file
+_WRITE_BATCH = 256 * 1024
+_READ_CHUNK = 64 * 1024
+_PRUNE_EVERY = 3600
+# Container names as docker allows them; also keeps lookups inside the archive directory
+_NAME = re.compile(r"[A-Za-z0-9][A-Za-z0-9_.-]*")
+
+
+def _tail_lines(path: str, tail: int) -> bytes:
+    lines = deque(maxlen=tail)
+    with gzip.open(path, "rb") as f:
+        for line in f:
+            lines.append(line)
+    return b"".join(lines)
+
+
+class LogArchiver:
+    """
+    Copies the output of finished job containers into gzip files on local
+    disk, so a job's logs can still be served after its container has been
+    reaped. Logs are streamed from docker into the archive, never held in
+    memory whole.
+    """
+
+    def __init__(self, container_manager, directory: str = LOG_ARCHIVE_DIR, max_age: float = LOG_ARCHIVE_MAX_AGE):
+        self._cm = container_manager
+        self.directory = directory
+        self.max_age = max_age
+        self._tasks = {}
+        self._pruned_at = 0.0
+        self.archived = 0
+        self.failed = 0
+        self.pruned = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.directory)
+
+    def path(self, name: str) -> str | None:
+        """Archive file for a container name; None if archiving is off or the name isn't one docker allows."""
+        if not self.enabled or not _NAME.fullmatch(name or ""):
+            return None
+        return os.path.join(self.directory, f"{name}.log.gz")
+
+    def find(self, name: str) -> str | None:
+        path = self.path(name)
+        return path if path and os.path.exists(path) else None
+
+    def schedule(self, container_id: str, name: str) -> asyncio.Task | None:
+        """Archive a container's logs in the background, e.g. when it exits."""
+        path = self.path(name)
+        if path is None:
+            return None
+        task = self._tasks.get(name)
+        if task is None or task.done():
+            task = self._tasks[name] = asyncio.create_task(self.archive(container_id, path))
+            task.add_done_callback(lambda t: self._tasks.pop(name, None) if self._tasks.get(name) is t else None)
+        return task
+
+    async def archive(self, container_id: str, path: str):
+        tmp = f"{path}.tmp"
+        try:
+            await asyncio.to_thread(os.makedirs, self.directory, exist_ok=True)
+            gz = await asyncio.to_thread(gzip.open, tmp, "wb")
+            try:
+                batch, size = [], 0
+                async for chunk in self._cm.container_logs_async(container_id):
+                    batch.append(chunk)
+                    size += len(chunk)
+                    if size >= _WRITE_BATCH:
+                        await asyncio.to_thread(gz.write, b"".join(batch))
+                        batch, size = [], 0
+                if batch:
+                    await asyncio.to_thread(gz.write, b"".join(batch))
+            finally:
+                await asyncio.to_thread(gz.close)
+            # Readers only ever see complete archives
+            os.replace(tmp, path)
+            self.archived += 1
+        except Exception as e:
+            self.failed += 1
+            print(f"Failed to archive logs of {container_id[:12]}: {e}")
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        if time.time() - self._pruned_at > _PRUNE_EVERY:
+            await asyncio.to_thread(self.prune)
+
+    def prune(self) -> int:
+        """Delete archives older than max_age; returns how many went."""
+        self._pruned_at = time.time()
+        removed = 0
+        try:
+            entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return 0
+        for entry in entries:
+            if entry.name.endswith(".log.gz") and self._pruned_at - entry.stat().st_mtime > self.max_age:
+                try:
+                    os.remove(entry.path)
+                    removed += 1
+                except OSError:
+                    pass
+        self.pruned += removed
+        return removed
+
+    async def read(self, path: str, tail: int | None = None, compressed: bool = False):
+        """
+        Yield an archive's content: the gzip bytes as stored when compressed,
+        otherwise decompressed, and only the last `tail` lines when given.
+        """
+        if tail is not None:
+            yield await asyncio.to_thread(_tail_lines, path, tail)
+            return
+        f = await asyncio.to_thread(open if compressed else gzip.open, path, "rb")
+        try:
+            while True:
+                chunk = await asyncio.to_thread(f.read, _READ_CHUNK)
+                if not chunk:
+                    return
+                yield chunk
+        finally:
+            f.close()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "directory": self.directory or None,
+            "archived": self.archived,
+            "failed": self.failed,
+            "pruned": self.pruned,
+            "in_progress": len(self._tasks),
+        }
+
+    async def stop(self):
+        """Let archives already being written finish."""
+        if self._tasks:
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
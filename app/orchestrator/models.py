@@ -12,6 +12,7 @@ class Node(BaseModel):
     last_seen: Optional[datetime] = None
     cpu_percent: Optional[float] = None
     memory_percent: Optional[float] = None
+    images: list[str] = Field(default_factory=list, description="Images already pulled on the node")
 
 class Container(BaseModel):
     id: str
@@ -23,4 +24,9 @@ class Job(BaseModel):
     image: str
     status: str
     node_id: Optional[str] = None
-    command: Optional[str] = None  
\ No newline at end of file
+    command: Optional[str] = None
+    cpu: float = Field(default=0.5, gt=0, description="Requested CPU cores")
+    memory: int = Field(default=256, gt=0, description="Requested memory in MB")
+    priority: int = Field(default=0, description="Higher runs first when queued")
+    submitted_at: Optional[datetime] = None
+    assigned_at: Optional[datetime] = Field(default=None, description="When a deploy to node_id began")  
\ No newline at end of file
@@ -1,21 +1,79 @@
 # app/orchestrator/node_manager.py
 import asyncio
+import os
+import time
 from datetime import datetime
-import httpx
-from database import get_collection
+import repository
+from .agent_client import AgentClient
+from .models import Node
+from .revision_index import RevisionIndex
+
+# How often the background monitor probes every node's /health
+HEALTH_MONITOR_INTERVAL = float(os.getenv("HEALTH_MONITOR_INTERVAL", "5"))
+# Max age of the health snapshot before a reader forces a synchronous refresh
+HEALTH_MAX_STALENESS = float(os.getenv("HEALTH_MAX_STALENESS", "15"))
+# Percentage points a node's CPU or memory use must move to count as a change for ETags and deltas
+NODE_USAGE_THRESHOLD = float(os.getenv("NODE_USAGE_THRESHOLD", "5"))
+
+
+def online_nodes(nodes_dict: dict) -> list[Node]:
+    """Node models for every node in a snapshot whose last health check succeeded."""
+    return [
+        Node(
+            id=nid,
+            ip=spec["ip"],
+            port=spec["port"],
+            cpu=spec["cpu"],
+            memory=spec["memory"],
+            status=spec.get("status", "unknown"),
+            cpu_percent=spec.get("cpu_percent"),
+            memory_percent=spec.get("memory_percent"),
+            images=spec.get("images") or [],
+        )
+        for nid, spec in nodes_dict.items()
+        if spec.get("status") == "online"
+    ]
+
+
+def node_records(nodes_dict: dict) -> list[dict]:
+    """
+    JSON-ready Node records for every node in a snapshot, as served by GET /nodes.
+    last_seen is left out: it changes on every probe (GET /nodes/{id} has it).
+    """
+    return [
+        Node(
+            id=nid,
+            ip=spec["ip"],
+            port=spec["port"],
+            cpu=spec["cpu"],
+            memory=spec["memory"],
+            status=spec.get("status", "unknown"),
+            cpu_percent=spec.get("cpu_percent", 0),
+            memory_percent=spec.get("memory_percent", 0),
+            images=spec.get("images") or [],
+        ).model_dump(mode="json", exclude={"last_seen"})
+        for nid, spec in nodes_dict.items()
+    ]
 
 
 class NodeManager:
-    def __init__(self):
+    def __init__(self, agent_client: AgentClient | None = None, max_staleness: float = HEALTH_MAX_STALENESS,
+                 usage_threshold: float = NODE_USAGE_THRESHOLD):
         self.nodes = {}
+        self.max_staleness = max_staleness
+        self.usage_threshold = usage_threshold
+        self._snapshot_at = None
+        self._refresh_task = None
         self._monitor_task = None
-        self._client = None
-        self._load_nodes_from_db()
+        self._online_listeners = []
+        self._agent_client = agent_client or AgentClient()
+        # Revisioned copy of node_records(), for ETags and delta readers
+        self.changes = RevisionIndex(name="nodes")
 
-    def _load_nodes_from_db(self):
+    async def load_from_db(self):
+        """Load registered nodes from the database (call after init_db)."""
         try:
-            nodes_collection = get_collection("nodes")
-            for node_doc in nodes_collection.find({}):
+            for node_doc in await repository.list_nodes():
                 node_id = node_doc["id"]
                 self.nodes[node_id] = {
                     "ip": node_doc["ip"],
@@ -31,16 +89,11 @@ class NodeManager:
         except Exception as e:
             print(f"Error loading nodes from database: {e}")
 
-    async def _get_client(self):
-        """Lazy initialize httpx client"""
-        if self._client is None:
-            self._client = httpx.AsyncClient(timeout=2.0)
-        return self._client
-
     def register_node(self, node_id: str, info: dict):
         """
-        Register a new node with info:
+        Register a new node in memory with info:
         Example: {"ip": "127.0.0.1", "port": 8001, "cpu": 4, "memory": 8192}
+        Use register_node_async() to also persist it.
         """
         self.nodes[node_id] = {
             "ip": info["ip"],
@@ -53,19 +106,11 @@ class NodeManager:
             "last_seen": None,
         }
 
+    async def register_node_async(self, node_id: str, info: dict):
+        """Register a node and persist it to the database."""
+        self.register_node(node_id, info)
         try:
-            nodes_collection = get_collection("nodes")
-            nodes_collection.update_one(
-                {"id": node_id},
-                {"$set": {
-                    "id": node_id,
-                    "ip": info["ip"],
-                    "port": info["port"],
-                    "cpu": info["cpu"],
-                    "memory": info["memory"]
-                }},
-                upsert=True
-            )
+            await repository.upsert_node(node_id, info)
         except Exception as e:
             print(f"Error saving node to database: {e}")
 
@@ -74,15 +119,20 @@ class NodeManager:
         Internal helper to check /health endpoint and update stats.
         """
         try:
-            client = await self._get_client()
-            url = f"http://{node['ip']}:{node['port']}/health"
-            resp = await client.get(url)
+            resp = await self._agent_client.get(node, "/health", op="health")
             if resp.status_code == 200:
                 data = resp.json()
+                was_online = node.get("status") == "online"
                 node["status"] = "online"
                 node["cpu_percent"] = data.get("cpu_percent", 0.0)
                 node["memory_percent"] = data.get("memory_percent", 0.0)
+                # Older agents don't report images; keep whatever we knew
+                if "images" in data:
+                    node["images"] = data["images"]
                 node["last_seen"] = datetime.utcnow().isoformat()
+                if not was_online:
+                    for listener in self._online_listeners:
+                        listener(node_id)
                 return
         except Exception as e:
             pass
@@ -91,21 +141,68 @@ class NodeManager:
         node["cpu_percent"] = 0.0
         node["memory_percent"] = 0.0
 
-    async def list_nodes_async(self):
-        """
-        Return all nodes, refreshing their /health status concurrently.
-        """
-        if not self.nodes:
-            return self.nodes
-        
+    def add_online_listener(self, callback):
+        """Call callback(node_id) whenever a node transitions to online."""
+        self._online_listeners.append(callback)
+
+    async def _probe_all(self):
         # Check all nodes concurrently
         tasks = []
         for node_id, node in list(self.nodes.items()):
             tasks.append(self._refresh_node_status(node_id, node))
-        
+
         await asyncio.gather(*tasks, return_exceptions=True)
+        self._snapshot_at = time.monotonic()
+
+    async def refresh_all(self):
+        """
+        Probe every node's /health and update the snapshot. Concurrent callers
+        share a single in-flight refresh instead of fanning out again.
+        """
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.ensure_future(self._probe_all())
+        await asyncio.shield(self._refresh_task)
+
+    def snapshot_age(self) -> float | None:
+        """Seconds since the last full health refresh, or None if there has been none."""
+        if self._snapshot_at is None:
+            return None
+        return time.monotonic() - self._snapshot_at
+
+    def _is_stale(self) -> bool:
+        age = self.snapshot_age()
+        return age is None or age > self.max_staleness
+
+    async def list_nodes_async(self, refresh: bool = False):
+        """
+        Return all nodes from the last health snapshot. The background monitor
+        keeps it fresh; probing only happens here when refresh=True or the
+        snapshot is older than max_staleness.
+        """
+        if not self.nodes:
+            return self.nodes
+
+        if refresh or self._is_stale():
+            await self.refresh_all()
         return self.nodes
 
+    def track_changes(self) -> RevisionIndex:
+        """
+        Fold the current snapshot into the change log and return it. CPU and
+        memory use that moved less than usage_threshold points keep their
+        indexed value, so routine probes don't produce a new revision.
+        """
+        records = node_records(self.nodes)
+        for record in records:
+            previous = self.changes.get(record["id"])
+            if previous is None or previous["status"] != record["status"]:
+                continue
+            for field in ("cpu_percent", "memory_percent"):
+                if abs((record[field] or 0) - (previous[field] or 0)) < self.usage_threshold:
+                    record[field] = previous[field]
+        self.changes.replace(records)
+        return self.changes
+
     def list_nodes(self):
         """
         Synchronous version - returns nodes without refreshing status.
@@ -113,13 +210,14 @@ class NodeManager:
         """
         return self.nodes
 
-    async def get_node_async(self, node_id: str):
-        """Return single node with refreshed health info."""
+    async def get_node_async(self, node_id: str, refresh: bool = False):
+        """Return single node from the health snapshot, probing it only when asked or stale."""
         node = self.nodes.get(node_id)
         if not node:
             return None
 
-        await self._refresh_node_status(node_id, node)
+        if refresh or self._is_stale():
+            await self._refresh_node_status(node_id, node)
         return node
 
     def get_node(self, node_id: str):
@@ -127,14 +225,16 @@ class NodeManager:
         return self.nodes.get(node_id)
 
     def remove_node(self, node_id: str):
-        """Remove a node by ID."""
-        node = self.nodes.pop(node_id, None)
+        """Remove a node by ID from memory. Use remove_node_async() to also delete it from the database."""
+        return self.nodes.pop(node_id, None)
+
+    async def remove_node_async(self, node_id: str):
+        """Remove a node by ID from memory and the database."""
+        node = self.remove_node(node_id)
 
-        # Remove from database
         if node:
             try:
-                nodes_collection = get_collection("nodes")
-                nodes_collection.delete_one({"id": node_id})
+                await repository.delete_node(node_id)
             except Exception as e:
                 print(f"Error removing node from database: {e}")
 
@@ -146,13 +246,13 @@ class NodeManager:
         """
         while True:
             try:
-                await self.list_nodes_async()
-                await asyncio.sleep(5)  # every 5 seconds
+                await self.refresh_all()
+                await asyncio.sleep(HEALTH_MONITOR_INTERVAL)
             except asyncio.CancelledError:
                 break
             except Exception as e:
                 print(f"Error in monitor loop: {e}")
-                await asyncio.sleep(5)
+                await asyncio.sleep(HEALTH_MONITOR_INTERVAL)
 
     def start_monitoring(self):
         """
@@ -168,7 +268,4 @@ class NodeManager:
             try:
                 await self._monitor_task
             except asyncio.CancelledError:
-                pass
-        
-        if self._client:
-            await self._client.aclose()
\ No newline at end of file
+                pass
\ No newline at end of file
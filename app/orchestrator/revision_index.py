@@ -0,0 +1,125 @@
+# app/orchestrator/revision_index.py
+import time
+import uuid
+from collections import OrderedDict
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """True if an If-None-Match header value covers `etag` (weak comparison)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+class RevisionIndex:
+    """
+    Revisioned in-memory set of records keyed by their "id". Every change
+    bumps a revision counter so readers can ask for just what changed since
+    the revision they last saw instead of re-reading the whole set.
+    """
+
+    def __init__(self, name: str = "containers", max_tombstones: int = 10000):
+        # Key the records are listed under in delta payloads
+        self.name = name
+        # Identifies this process's counter; revisions from another epoch are meaningless
+        self.epoch = uuid.uuid4().hex[:12]
+        self.revision = 0
+        self.synced_at = None
+        self.max_tombstones = max_tombstones
+        self._entries = {}
+        self._changed_at = {}
+        self._removed = OrderedDict()
+        # Deltas from before this revision can no longer be reconstructed
+        self._floor = 0
+        # "key" and "key=value" -> ids of records carrying that label
+        self._by_label = {}
+
+    def replace(self, records: list[dict]) -> int:
+        """Reconcile the index against a full listing; returns the number of entries that changed."""
+        seen = set()
+        changed = 0
+        for record in records:
+            seen.add(record["id"])
+            changed += self.upsert(record)
+        for key in [key for key in self._entries if key not in seen]:
+            changed += self.discard(key)
+        self.synced_at = time.monotonic()
+        return changed
+
+    def upsert(self, record: dict) -> bool:
+        key = record["id"]
+        if self._entries.get(key) == record:
+            return False
+        self.revision += 1
+        old = self._entries.get(key)
+        if old is not None:
+            self._unindex(key, old)
+        self._entries[key] = record
+        self._index(key, record)
+        self._changed_at.pop(key, None)
+        self._changed_at[key] = self.revision
+        self._removed.pop(key, None)
+        return True
+
+    def discard(self, key: str) -> bool:
+        if key not in self._entries:
+            return False
+        self.revision += 1
+        self._unindex(key, self._entries.pop(key))
+        del self._changed_at[key]
+        self._removed[key] = self.revision
+        while len(self._removed) > self.max_tombstones:
+            _, rev = self._removed.popitem(last=False)
+            self._floor = rev
+        return True
+
+    @staticmethod
+    def _label_terms(record: dict):
+        for name, value in (record.get("labels") or {}).items():
+            yield name
+            yield f"{name}={value}"
+
+    def _index(self, key: str, record: dict):
+        for term in self._label_terms(record):
+            self._by_label.setdefault(term, set()).add(key)
+
+    def _unindex(self, key: str, record: dict):
+        for term in self._label_terms(record):
+            keys = self._by_label.get(term)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_label[term]
+
+    def with_label(self, label: str) -> list[dict]:
+        """Records carrying a label, given as "key" or "key=value"."""
+        return [self._entries[key] for key in self._by_label.get(label, ())]
+
+    def get(self, key: str) -> dict | None:
+        return self._entries.get(key)
+
+    def records(self) -> list[dict]:
+        return list(self._entries.values())
+
+    def etag(self, *variant) -> str:
+        """Strong validator for the current contents (plus any request-specific variant)."""
+        return '"' + "-".join(str(part) for part in (self.epoch, self.revision, *variant)) + '"'
+
+    def delta(self, since: int, epoch: str | None = None) -> dict:
+        """
+        Changes after revision `since`. Falls back to a full listing
+        (full=True) when `since` belongs to another epoch or predates the
+        retained tombstones.
+        """
+        if (epoch and epoch != self.epoch) or since < self._floor or since > self.revision:
+            return {"epoch": self.epoch, "revision": self.revision, "full": True,
+                    self.name: self.records(), "removed": []}
+        return {
+            "epoch": self.epoch,
+            "revision": self.revision,
+            "full": False,
+            self.name: [self._entries[key] for key, rev in self._changed_at.items() if rev > since],
+            "removed": [key for key, rev in self._removed.items() if rev > since],
+        }
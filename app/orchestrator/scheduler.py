@@ -1,13 +1,121 @@
+import bisect
 import itertools
+import os
 from orchestrator.models import Job, Node
 
+# best_fit, worst_fit and drf place jobs by requested CPU/memory against free capacity
+STRATEGIES = ["first_fit", "round_robin", "resource_aware", "best_fit", "worst_fit", "drf"]
+
+# Prefer nodes that already have a job's image pulled (any strategy)
+SCHEDULER_IMAGE_LOCALITY = os.getenv("SCHEDULER_IMAGE_LOCALITY", "true").lower() in ("1", "true", "yes")
+
+
+class CapacityIndex:
+    """
+    Per-node allocatable vs. allocated resources, kept in two sorted lists
+    (by free memory and by dominant share). A placement bisects to the first
+    node with enough free memory, then walks forward to the first one that
+    also fits on CPU (and is among the allowed ids), so it is still linear in
+    the number of nodes in the worst case; keeping the lists sorted (insort)
+    is linear too.
+    """
+
+    def __init__(self):
+        self.nodes = {}       # node_id -> Node
+        self.allocated = {}   # node_id -> [cpu, memory]
+        self._by_free_memory = []
+        self._by_share = []
+
+    def _free(self, node_id: str) -> tuple[float, int]:
+        node = self.nodes[node_id]
+        cpu, mem = self.allocated.get(node_id, (0.0, 0))
+        return node.cpu - cpu, node.memory - mem
+
+    def _share(self, node_id: str) -> float:
+        node = self.nodes[node_id]
+        cpu, mem = self.allocated.get(node_id, (0.0, 0))
+        return max(cpu / node.cpu if node.cpu else 1.0, mem / node.memory if node.memory else 1.0)
+
+    def _keys(self, node_id: str):
+        return (self._free(node_id)[1], node_id), (self._share(node_id), node_id)
+
+    def _unindex(self, node_id: str):
+        mem_key, share_key = self._keys(node_id)
+        del self._by_free_memory[bisect.bisect_left(self._by_free_memory, mem_key)]
+        del self._by_share[bisect.bisect_left(self._by_share, share_key)]
+
+    def _index(self, node_id: str):
+        mem_key, share_key = self._keys(node_id)
+        bisect.insort(self._by_free_memory, mem_key)
+        bisect.insort(self._by_share, share_key)
+
+    def sync_nodes(self, available_nodes: list[Node]):
+        """Track exactly the given nodes, keeping allocations of nodes that stay."""
+        wanted = {node.id: node for node in available_nodes}
+        for node_id in list(self.nodes):
+            current = wanted.get(node_id)
+            if current is None or (current.cpu, current.memory) != (self.nodes[node_id].cpu, self.nodes[node_id].memory):
+                self._unindex(node_id)
+                del self.nodes[node_id]
+        for node_id, node in wanted.items():
+            is_new = node_id not in self.nodes
+            self.nodes[node_id] = node
+            if is_new:
+                self._index(node_id)
+
+    def add(self, node_id: str, cpu: float, memory: int):
+        indexed = node_id in self.nodes
+        if indexed:
+            self._unindex(node_id)
+        alloc = self.allocated.setdefault(node_id, [0.0, 0])
+        alloc[0] += cpu
+        alloc[1] += memory
+        if indexed:
+            self._index(node_id)
+
+    def fits(self, node_id: str, cpu: float, memory: int) -> bool:
+        free_cpu, free_mem = self._free(node_id)
+        # Small tolerance for float drift from repeated reserve/release of CPU
+        return free_cpu + 1e-9 >= cpu and free_mem >= memory
+
+    def best_fit(self, cpu: float, memory: int, among: set | None = None) -> Node | None:
+        """Node with the least free memory that still fits the request (optionally only `among` these ids)."""
+        start = bisect.bisect_left(self._by_free_memory, (memory, ""))
+        for _, node_id in itertools.islice(self._by_free_memory, start, None):
+            if (among is None or node_id in among) and self.fits(node_id, cpu, memory):
+                return self.nodes[node_id]
+        return None
+
+    def worst_fit(self, cpu: float, memory: int, among: set | None = None) -> Node | None:
+        """Node with the most free memory, spreading load across the cluster."""
+        for free_mem, node_id in reversed(self._by_free_memory):
+            if free_mem < memory:
+                break
+            if (among is None or node_id in among) and self.fits(node_id, cpu, memory):
+                return self.nodes[node_id]
+        return None
+
+    def lowest_share(self, cpu: float, memory: int, among: set | None = None) -> Node | None:
+        """Node whose dominant (max of CPU, memory) allocated share is lowest."""
+        for _, node_id in self._by_share:
+            if (among is None or node_id in among) and self.fits(node_id, cpu, memory):
+                return self.nodes[node_id]
+        return None
+
+
 class Scheduler:
-    def __init__(self, strategy: str = "first_fit"):
+    def __init__(self, strategy: str = "first_fit", image_locality: bool = SCHEDULER_IMAGE_LOCALITY):
         self.strategy = strategy
+        self.image_locality = image_locality
+        # Placements that landed on a node with the image already pulled
+        self.locality_hits = 0
         self._rr_cycle = None
+        self.capacity = CapacityIndex()
+        self._placements = {}  # job_id -> (node_id, cpu, memory)
+        self._release_listeners = []
 
     def set_strategy(self, strategy: str):
-        if strategy not in ["first_fit", "round_robin", "resource_aware"]:
+        if strategy not in STRATEGIES:
             raise ValueError(f"Unknown scheduling strategy: {strategy}")
         self.strategy = strategy
         self._rr_cycle = None
@@ -15,21 +123,125 @@ class Scheduler:
     def get_strategy(self) -> str:
         return self.strategy
 
-    def schedule_job(self, job, available_nodes: list[Node]) -> Node | None:
-        if not available_nodes:
+    # ---------- allocation tracking ----------
+
+    def reserve(self, job, node_id: str):
+        """Record that a job's requested resources are allocated on a node."""
+        if job.id in self._placements:
+            return
+        cpu, memory = job.cpu, job.memory
+        self._placements[job.id] = (node_id, cpu, memory)
+        self.capacity.add(node_id, cpu, memory)
+
+    def add_release_listener(self, callback):
+        """Call callback(node_id) whenever a job's resources are freed."""
+        self._release_listeners.append(callback)
+
+    def release(self, job_id: str, notify: bool = True) -> str | None:
+        """Free a job's resources; returns the node it was on, if it was tracked."""
+        placement = self._placements.pop(job_id, None)
+        if placement is None:
             return None
-        
+        node_id, cpu, memory = placement
+        self.capacity.add(node_id, -cpu, -memory)
+        if notify:
+            for listener in self._release_listeners:
+                listener(node_id)
+        return node_id
+
+    def restore(self, jobs: list[Job]):
+        """Rebuild allocations from jobs that are already placed (e.g. on startup)."""
+        for job in jobs:
+            if job.node_id:
+                self.reserve(job, job.node_id)
+
+    def allocations(self) -> dict:
+        return {
+            node_id: {"cpu": round(cpu, 3), "memory": memory}
+            for node_id, (cpu, memory) in self.capacity.allocated.items()
+        }
+
+    # ---------- placement ----------
+
+    def _pick_among(self, job, available_nodes: list[Node], among: set | None) -> Node | None:
+        candidates = available_nodes if among is None else (n for n in available_nodes if n.id in among)
         if self.strategy == "first_fit":
-            return available_nodes[0]
-        
+            return next(iter(candidates), None)
+
         elif self.strategy == "round_robin":
             if self._rr_cycle is None:
                 self._rr_cycle = itertools.cycle(available_nodes)
-            return next(self._rr_cycle)
-        
+            # Keep the rotation shared; skip ahead to the next candidate
+            for node in itertools.islice(self._rr_cycle, len(available_nodes)):
+                if among is None or node.id in among:
+                    return node
+            return None
+
         elif self.strategy == "resource_aware":
-            return max(available_nodes, key=lambda node: (100 - (node.cpu_percent or 50)))
+            return max(candidates, key=lambda node: (100 - (node.cpu_percent or 50)), default=None)
+
+        elif self.strategy == "best_fit":
+            return self.capacity.best_fit(job.cpu, job.memory, among)
+
+        elif self.strategy == "worst_fit":
+            return self.capacity.worst_fit(job.cpu, job.memory, among)
+
+        elif self.strategy == "drf":
+            return self.capacity.lowest_share(job.cpu, job.memory, among)
 
         else:
             raise ValueError(f"Unknown scheduling strategy: {self.strategy}")
-    
\ No newline at end of file
+
+    @staticmethod
+    def _image_index(available_nodes: list[Node]) -> dict[str, set]:
+        index = {}
+        for node in available_nodes:
+            for image in node.images:
+                index.setdefault(image, set()).add(node.id)
+        return index
+
+    def _pick(self, job, available_nodes: list[Node], image_index: dict | None = None) -> Node | None:
+        warm = image_index.get(job.image) if self.image_locality and image_index else None
+        node = None
+        # Only worth a separate pass when some, but not all, nodes have the image
+        if warm and len(warm) < len(available_nodes):
+            node = self._pick_among(job, available_nodes, warm)
+        if node is None:
+            node = self._pick_among(job, available_nodes, None)
+        if node is not None and warm and node.id in warm:
+            self.locality_hits += 1
+        return node
+
+    def schedule_job(self, job, available_nodes: list[Node]) -> Node | None:
+        if not available_nodes:
+            return None
+
+        self.capacity.sync_nodes(available_nodes)
+        image_index = self._image_index(available_nodes) if self.image_locality else None
+        node = self._pick(job, available_nodes, image_index)
+        if node is not None:
+            self.reserve(job, node.id)
+        return node
+
+    def schedule_batch(self, jobs: list, available_nodes: list[Node]) -> tuple[dict[str, tuple[Node, list]], list]:
+        """
+        Place a batch of jobs in one pass over a single node snapshot, so the
+        capacity and image indexes are synced once per batch rather than per
+        job (each placement is still linear in the number of nodes).
+        Returns ({node_id: (node, [jobs])}, [jobs that could not be placed]).
+        """
+        assignments = {}
+        unscheduled = []
+        if not available_nodes:
+            return assignments, list(jobs)
+
+        self.capacity.sync_nodes(available_nodes)
+        image_index = self._image_index(available_nodes) if self.image_locality else None
+        for job in jobs:
+            node = self._pick(job, available_nodes, image_index)
+            if node is None:
+                unscheduled.append(job)
+            else:
+                self.reserve(job, node.id)
+                assignments.setdefault(node.id, (node, []))[1].append(job)
+        return assignments, unscheduled
@@ -0,0 +1,147 @@
+# app/orchestrator/telemetry_aggregator.py
+import asyncio
+import math
+import os
+import time
+from collections import deque
+
+from .container_telemetry import percentile
+
+# How often every online agent's per-container usage summary is collected
+TELEMETRY_POLL_INTERVAL = float(os.getenv("TELEMETRY_POLL_INTERVAL", "30"))
+# Finished job containers remembered per image for its usage profile
+TELEMETRY_PROFILE_SAMPLES = int(os.getenv("TELEMETRY_PROFILE_SAMPLES", "200"))
+# Finished jobs an image needs before limits are recommended for it
+TELEMETRY_MIN_SAMPLES = int(os.getenv("TELEMETRY_MIN_SAMPLES", "5"))
+# Margin added on top of observed p95 usage when recommending limits
+TELEMETRY_HEADROOM = float(os.getenv("TELEMETRY_HEADROOM", "1.2"))
+
+_MB = 1024 * 1024
+
+
+class TelemetryAggregator:
+    """
+    Cluster-wide view of the usage telemetry agents collect: current totals
+    per node for dashboards, and per-image usage profiles of finished jobs,
+    with recommended CPU and memory limits, for sizing and scheduling.
+    """
+
+    def __init__(self, agent_client, node_manager, interval: float = TELEMETRY_POLL_INTERVAL,
+                 profile_samples: int = TELEMETRY_PROFILE_SAMPLES, min_samples: int = TELEMETRY_MIN_SAMPLES,
+                 headroom: float = TELEMETRY_HEADROOM):
+        self._agent_client = agent_client
+        self._node_manager = node_manager
+        self.interval = interval
+        self.profile_samples = profile_samples
+        self.min_samples = min_samples
+        self.headroom = headroom
+        self._nodes = {}
+        # image -> deque of finished-container summaries; _profiled dedupes across polls
+        self._profiles = {}
+        self._profiled = set()
+        self._task = None
+
+    async def _collect_node(self, node_id: str, node_spec: dict):
+        resp = await self._agent_client.get(node_spec, "/telemetry/summary", op="list")
+        resp.raise_for_status()
+        body = resp.json()
+        self._nodes[node_id] = {"collected_at": time.time(), "containers": body.get("containers", [])}
+        self._fold(body.get("containers", []))
+
+    async def collect(self) -> dict:
+        """Pull a usage summary from every online agent; returns {node_id: error} for those that failed."""
+        nodes = await self._node_manager.list_nodes_async()
+        online = {nid: spec for nid, spec in nodes.items() if spec.get("status") == "online"}
+        for node_id in [nid for nid in self._nodes if nid not in nodes]:
+            del self._nodes[node_id]
+        results = await asyncio.gather(
+            *(self._collect_node(nid, spec) for nid, spec in online.items()), return_exceptions=True
+        )
+        return {nid: str(r) for nid, r in zip(online, results) if isinstance(r, Exception)}
+
+    def _fold(self, containers: list[dict]):
+        """Add finished job containers to their image's profile, once each."""
+        for c in containers:
+            if c.get("running") or not c.get("job") or not c.get("image") or c["id"] in self._profiled:
+                continue
+            profile = self._profiles.setdefault(c["image"], deque())
+            profile.append({"id": c["id"], "cpu_p95": c.get("cpu_p95"), "cpu_max": c.get("cpu_max"),
+                            "memory_peak": c.get("memory_peak"), "memory_limit": c.get("memory_limit")})
+            self._profiled.add(c["id"])
+            if len(profile) > self.profile_samples:
+                self._profiled.discard(profile.popleft()["id"])
+
+    def nodes(self) -> dict:
+        """Current usage per node, summed over its running containers."""
+        result = {}
+        for node_id, data in self._nodes.items():
+            running = [c for c in data["containers"] if c.get("running") and c.get("latest")]
+            result[node_id] = {
+                "collected_at": data["collected_at"],
+                "running": len(running),
+                "cpu_percent": round(sum(c["latest"].get("cpu_percent") or 0 for c in running), 2),
+                "memory_bytes": sum(c["latest"].get("memory_usage") or 0 for c in running
+                                    if isinstance(c["latest"].get("memory_usage"), (int, float))),
+                "containers": data["containers"],
+            }
+        return result
+
+    def recommend(self, image: str) -> dict | None:
+        """
+        Limits that would have fit p95 of this image's finished jobs, with
+        headroom: {"cpus", "memory_mb"}; None until enough jobs have run.
+        """
+        profile = self._profiles.get(image)
+        if not profile or len(profile) < self.min_samples:
+            return None
+        cpu = percentile([p["cpu_p95"] for p in profile if p["cpu_p95"] is not None], 0.95)
+        memory = percentile([p["memory_peak"] for p in profile if p["memory_peak"]], 0.95)
+        return {
+            # cpu_p95 is in percent of one core; round up to a quarter core
+            "cpus": max(math.ceil((cpu or 0) / 100 * self.headroom * 4) / 4, 0.25),
+            "memory_mb": max(math.ceil((memory or 0) * self.headroom / _MB / 32) * 32, 32),
+        }
+
+    def profiles(self) -> dict:
+        """Usage of finished jobs per image, against the limits they ran with."""
+        result = {}
+        for image, profile in self._profiles.items():
+            peaks = [p["memory_peak"] for p in profile if p["memory_peak"]]
+            cpus = [p["cpu_p95"] for p in profile if p["cpu_p95"] is not None]
+            limits = [p["memory_limit"] for p in profile if p["memory_limit"]]
+            result[image] = {
+                "jobs": len(profile),
+                "cpu_p95_percent": {"p50": percentile(cpus, 0.5), "p95": percentile(cpus, 0.95)},
+                "memory_peak_mb": {
+                    "p50": round(percentile(peaks, 0.5) / _MB, 1) if peaks else None,
+                    "p95": round(percentile(peaks, 0.95) / _MB, 1) if peaks else None,
+                    "max": round(max(peaks) / _MB, 1) if peaks else None,
+                },
+                "memory_limit_mb": round(percentile(limits, 0.5) / _MB) if limits else None,
+                "recommended": self.recommend(image),
+            }
+        return result
+
+    async def _run(self):
+        while True:
+            try:
+                failed = await self.collect()
+                for node_id, error in failed.items():
+                    print(f"Failed to collect telemetry from {node_id}: {error}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error collecting telemetry: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if not self._task or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
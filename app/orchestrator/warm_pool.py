@@ -0,0 +1,260 @@
+# app/orchestrator/warm_pool.py
+import asyncio
+import os
+import time
+import uuid
+from collections import deque
+
+from .container_record import POOL_LABEL
+from .docker_subprocess import SecurityError, validate_command
+
+# Idle sandbox containers kept per pool image; 0 disables the pool
+WARM_POOL_SIZE = int(os.getenv("WARM_POOL_SIZE", "0"))
+# Interpreter images to keep a pool for (comma separated)
+WARM_POOL_IMAGES = [i.strip() for i in os.getenv("WARM_POOL_IMAGES", "python:3.11-slim,node:20-slim").split(",")
+                    if i.strip()]
+# Pool containers created per second at most while refilling
+WARM_POOL_REPLENISH_RATE = float(os.getenv("WARM_POOL_REPLENISH_RATE", "2"))
+# Idle containers older than this are replaced with fresh ones
+WARM_POOL_MAX_IDLE = float(os.getenv("WARM_POOL_MAX_IDLE", "600"))
+# Limits pool containers are created with; only jobs asking for exactly these can claim one
+WARM_POOL_CPUS = float(os.getenv("WARM_POOL_CPUS", "0.5"))
+WARM_POOL_MEMORY_MB = int(os.getenv("WARM_POOL_MEMORY_MB", "256"))
+
+# Where a claimed container's stub picks up the job's code
+_JOB_FILE = "/tmp/.job"
+
+# Waits for the job file, then runs it as the container's main program, so the
+# exit code and "die" event are the job's own, exactly as with `python -c`
+_PYTHON_STUB = (
+    "import os, time\n"
+    f"p = {_JOB_FILE!r}\n"
+    "while not os.path.exists(p):\n"
+    "    time.sleep(0.01)\n"
+    "code = open(p).read()\n"
+    "os.remove(p)\n"
+    "exec(compile(code, '<string>', 'exec'), {'__name__': '__main__', '__builtins__': __builtins__})\n"
+)
+_PYTHON_WRITER = (
+    "import os, sys\n"
+    f"p = {_JOB_FILE!r}\n"
+    "open(p + '.tmp', 'w').write(sys.argv[1])\n"
+    "os.rename(p + '.tmp', p)\n"
+)
+# Same idea for `node -e`: the code gets the stub's CommonJS scope (require,
+# module, __dirname, ...) as it would as the eval'd main program. The scope is
+# captured up front since `node -e` only exposes it while the stub itself runs
+_NODE_STUB = (
+    "const fs = require('fs');"
+    "const scope = [exports, require, module, __filename, __dirname];"
+    f"const p = '{_JOB_FILE}';"
+    "const t = setInterval(() => {"
+    " if (!fs.existsSync(p)) return;"
+    " clearInterval(t);"
+    " const code = fs.readFileSync(p, 'utf8'); fs.unlinkSync(p);"
+    " new Function('exports', 'require', 'module', '__filename', '__dirname', code)"
+    "(...scope);"
+    "}, 10);"
+)
+_NODE_WRITER = (
+    "const fs = require('fs');"
+    f"const p = '{_JOB_FILE}';"
+    "fs.writeFileSync(p + '.tmp', process.argv[1]); fs.renameSync(p + '.tmp', p);"
+)
+
+
+def pool_programs(image: str) -> tuple[list[str], list[str]] | None:
+    """(stub argv, job writer argv prefix) for an interpreter image, None if it can't be pooled."""
+    if "python" in image:
+        return ["python", "-c", _PYTHON_STUB], ["python", "-c", _PYTHON_WRITER]
+    if "node" in image:
+        return ["node", "-e", _NODE_STUB], ["node", "-e", _NODE_WRITER]
+    return None
+
+
+class WarmPool:
+    """
+    Pre-started, idle sandbox containers per interpreter image, created with
+    the same isolation as any job container. A job claims one by renaming
+    it and handing it its code, instead of a cold create+start.
+    """
+
+    def __init__(self, container_manager, images: list[str] = WARM_POOL_IMAGES, size: int = WARM_POOL_SIZE,
+                 replenish_rate: float = WARM_POOL_REPLENISH_RATE, max_idle: float = WARM_POOL_MAX_IDLE,
+                 cpus: float = WARM_POOL_CPUS, memory_mb: int = WARM_POOL_MEMORY_MB):
+        self._cm = container_manager
+        self.images = [image for image in images if pool_programs(image)]
+        self.size = size
+        self.replenish_rate = replenish_rate
+        self.max_idle = max_idle
+        self.cpus = cpus
+        self.memory_mb = memory_mb
+        self._idle = {image: deque() for image in self.images}  # image -> deque of (id, created_at)
+        # Job labels of claimed containers: docker can't relabel a running container
+        self._claimed = {}
+        self._wake = asyncio.Event()
+        self._task = None
+        self.hits = 0
+        self.misses = {}
+        self.created = 0
+        self.expired = 0
+        self._claim_seconds = deque(maxlen=256)
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0 and bool(self.images)
+
+    def _miss(self, reason: str):
+        self.misses[reason] = self.misses.get(reason, 0) + 1
+
+    async def claim(self, image: str, name: str | None, command: str | None,
+                    cpus: float, memory_mb: int, labels: dict | None = None) -> dict | None:
+        """Start a job in a pooled container; None means use a cold start instead."""
+        if not self.enabled or image not in self._idle or not command:
+            return None
+        if (cpus, memory_mb) != (self.cpus, self.memory_mb):
+            self._miss("limits")
+            return None
+        try:
+            validate_command(command)
+        except SecurityError:
+            # Let the cold path reject it the usual way
+            return None
+
+        idle = self._idle[image]
+        now = time.time()
+        container_id = None
+        while idle:
+            cid, created_at = idle.popleft()
+            if now - created_at <= self.max_idle:
+                container_id = cid
+                break
+            self._discard(cid)
+            self.expired += 1
+        self._wake.set()
+        if container_id is None:
+            self._miss("empty")
+            return None
+
+        started = time.perf_counter()
+        try:
+            if name:
+                await self._cm.rename_container_async(container_id, name)
+            exit_code = await self._cm.exec_in_container_async(container_id, pool_programs(image)[1] + [command])
+            if exit_code != 0:
+                raise RuntimeError(f"job handoff exited with {exit_code}")
+        except Exception as e:
+            print(f"Warm pool claim of {container_id[:12]} failed: {e}")
+            self._discard(container_id)
+            self._miss("error")
+            return None
+
+        self._claim_seconds.append(time.perf_counter() - started)
+        self._claimed[container_id] = dict(labels or {})
+        self.hits += 1
+        return {"id": container_id, "name": name, "image": image, "status": "running"}
+
+    def labels_for(self, container_id: str) -> dict | None:
+        """Job labels a claimed container should be listed with."""
+        return self._claimed.get(container_id)
+
+    def forget(self, live_ids):
+        """Drop claim labels of containers that no longer exist."""
+        live = set(live_ids)
+        for cid in [cid for cid in self._claimed if cid not in live]:
+            del self._claimed[cid]
+
+    def _discard(self, container_id: str):
+        asyncio.create_task(self._remove(container_id))
+
+    async def _remove(self, container_id: str):
+        try:
+            await self._cm.stop_container_async(container_id, remove=True)
+        except Exception as e:
+            print(f"Failed to remove pool container {container_id[:12]}: {e}")
+
+    async def _create(self, image: str):
+        stub, _ = pool_programs(image)
+        slug = image.replace(":", "-").replace("/", "-").replace(".", "")
+        result = await self._cm.start_container_async(
+            image=image, name=f"pool-{slug}-{uuid.uuid4().hex[:8]}", cpus=self.cpus, memory_mb=self.memory_mb,
+            labels={POOL_LABEL: image}, argv=stub,
+        )
+        self._idle[image].append((result["id"], time.time()))
+        self.created += 1
+
+    def _deficit(self) -> str | None:
+        """The pool image furthest below its target size, if any."""
+        now = time.time()
+        for image, idle in self._idle.items():
+            while idle and now - idle[0][1] > self.max_idle:
+                self._discard(idle.popleft()[0])
+                self.expired += 1
+        image = min(self._idle, key=lambda i: len(self._idle[i]), default=None)
+        if image is None or len(self._idle[image]) >= self.size:
+            return None
+        return image
+
+    async def _run(self):
+        await self._clear_leftovers()
+        while True:
+            image = self._deficit()
+            if image is None:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=min(self.max_idle, 30))
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                await self._create(image)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Failed to create pool container for {image}: {e}")
+            await asyncio.sleep(1 / max(self.replenish_rate, 0.01))
+
+    async def _clear_leftovers(self):
+        """Remove idle pool containers left behind by a previous agent process."""
+        try:
+            containers = await self._cm.list_containers_async(all=True)
+        except Exception as e:
+            print(f"Could not list leftover pool containers: {e}")
+            return
+        for c in containers:
+            labels = getattr(c, "labels", None) or {}
+            if POOL_LABEL in labels and (getattr(c, "name", "") or "").startswith("pool-"):
+                await self._remove(c.id)
+
+    def stats(self) -> dict:
+        misses = sum(self.misses.values())
+        claims = sorted(self._claim_seconds)
+        return {
+            "enabled": self.enabled,
+            "size": self.size,
+            "idle": {image: len(idle) for image, idle in self._idle.items()},
+            "hits": self.hits,
+            "misses": misses,
+            "miss_reasons": dict(self.misses),
+            "hit_rate": round(self.hits / (self.hits + misses), 3) if self.hits + misses else None,
+            "claim_ms_p50": round(claims[len(claims) // 2] * 1000, 1) if claims else None,
+            "created": self.created,
+            "expired": self.expired,
+        }
+
+    def start(self):
+        if self.enabled and (not self._task or self._task.done()):
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        idle = [cid for queue in self._idle.values() for cid, _ in queue]
+        for queue in self._idle.values():
+            queue.clear()
+        await asyncio.gather(*(self._remove(cid) for cid in idle))
@@ -0,0 +1,157 @@
+# app/repository.py
+# Async data-access functions shared by the routers and background tasks.
+import asyncio
+from pymongo import UpdateOne
+from database import get_collection
+
+# Queue order: highest priority first, then oldest submission
+QUEUE_SORT = [("priority", -1), ("submitted_at", 1)]
+
+
+# ---------- jobs ----------
+
+async def insert_job(doc: dict):
+    await get_collection("jobs").insert_one(doc)
+
+
+async def insert_jobs(docs: list[dict]):
+    if docs:
+        await get_collection("jobs").insert_many(docs, ordered=False)
+
+
+async def get_job(job_id: str) -> dict | None:
+    return await get_collection("jobs").find_one({"id": job_id})
+
+
+async def delete_job(job_id: str) -> int:
+    res = await get_collection("jobs").delete_one({"id": job_id})
+    return res.deleted_count
+
+
+async def find_jobs(query: dict, sort: list | None = None, limit: int = 0) -> list[dict]:
+    cursor = get_collection("jobs").find(query)
+    if sort:
+        cursor = cursor.sort(sort)
+    if limit:
+        cursor = cursor.limit(limit)
+    return await cursor.to_list()
+
+
+async def iter_jobs(query: dict, sort: list, limit: int, projection: dict | None = None):
+    """Async iterator over matching jobs, streamed from the server cursor."""
+    cursor = get_collection("jobs").find(query, projection).sort(sort).limit(limit)
+    async for doc in cursor:
+        yield doc
+
+
+async def count_jobs_by_status(query: dict) -> dict[str, int]:
+    pipeline = [{"$match": query}, {"$group": {"_id": "$status", "count": {"$sum": 1}}}]
+    cursor = await get_collection("jobs").aggregate(pipeline)
+    return {row["_id"]: row["count"] async for row in cursor}
+
+
+async def count_jobs(query: dict) -> int:
+    return await get_collection("jobs").count_documents(query)
+
+
+async def find_pending_jobs(limit: int, exclude: list[str] | None = None) -> list[dict]:
+    """Queued jobs; pending jobs with a node_id are being deployed by the submit call that stored them."""
+    query = {"status": "pending", "node_id": None}
+    if exclude:
+        query["id"] = {"$nin": exclude}
+    return await find_jobs(query, sort=QUEUE_SORT, limit=limit)
+
+
+async def set_job_status(job_id: str, status: str, from_statuses: list[str] | None = None) -> int:
+    """Set a job's status, optionally only if it is currently in one of from_statuses."""
+    query = {"id": job_id}
+    if from_statuses is not None:
+        query["status"] = {"$in": from_statuses}
+    res = await get_collection("jobs").update_one(query, {"$set": {"status": status}})
+    return res.modified_count
+
+
+async def apply_status_transitions(transitions: list[tuple[str, str, list[str]]]) -> list[tuple[str, str]]:
+    """
+    Apply (job_id, new_status, from_statuses) tuples as set_job_status would,
+    returning the (job_id, new_status) pairs that actually changed a job.
+    Each job's transitions run in order; different jobs' run concurrently.
+    """
+    by_job = {}
+    for job_id, status, from_statuses in transitions:
+        by_job.setdefault(job_id, []).append((status, from_statuses))
+
+    async def apply(job_id: str, steps: list[tuple[str, list[str]]]) -> list[tuple[str, str]]:
+        return [(job_id, status) for status, from_statuses in steps
+                if await set_job_status(job_id, status, from_statuses)]
+
+    results = await asyncio.gather(*(apply(job_id, steps) for job_id, steps in by_job.items()))
+    return [applied for job_results in results for applied in job_results]
+
+
+async def assign_pending_jobs(assignments: list[tuple[str, str, str | None]]) -> int:
+    """
+    Record dispatch results for (job_id, status, node_id). The node is always
+    stored; the status only replaces "pending", since the agent's start/die
+    event may have moved the job on while the deploy call was returning.
+    """
+    if not assignments:
+        return 0
+    ops = []
+    for job_id, status, node_id in assignments:
+        ops.append(UpdateOne({"id": job_id}, {"$set": {"node_id": node_id}}))
+        ops.append(UpdateOne({"id": job_id, "status": "pending"}, {"$set": {"status": status}}))
+    res = await get_collection("jobs").bulk_write(ops, ordered=False)
+    return res.modified_count
+
+
+async def claim_pending_jobs(job_ids: list[str], node_id: str, assigned_at) -> int:
+    """Mark queued jobs as being deployed to a node; the dispatcher's queue query skips them from then on."""
+    if not job_ids:
+        return 0
+    res = await get_collection("jobs").update_many(
+        {"id": {"$in": job_ids}, "status": "pending", "node_id": None},
+        {"$set": {"node_id": node_id, "assigned_at": assigned_at}},
+    )
+    return res.modified_count
+
+
+async def requeue_jobs(deploys: list[tuple[str, str]]) -> list[str]:
+    """
+    Put (job_id, node_id) deploys back in the queue by clearing the node of
+    jobs still pending on it; a job an agent event already moved on keeps
+    its node. Returns the ids that were requeued.
+    """
+    collection = get_collection("jobs")
+
+    async def requeue(job_id: str, node_id: str) -> bool:
+        res = await collection.update_one({"id": job_id, "status": "pending", "node_id": node_id},
+                                          {"$set": {"node_id": None, "assigned_at": None}})
+        return res.modified_count > 0
+
+    results = await asyncio.gather(*(requeue(job_id, node_id) for job_id, node_id in deploys))
+    return [job_id for (job_id, _), requeued in zip(deploys, results) if requeued]
+
+
+# ---------- nodes ----------
+
+async def list_nodes() -> list[dict]:
+    return await get_collection("nodes").find({}).to_list()
+
+
+async def upsert_node(node_id: str, info: dict):
+    await get_collection("nodes").update_one(
+        {"id": node_id},
+        {"$set": {
+            "id": node_id,
+            "ip": info["ip"],
+            "port": info["port"],
+            "cpu": info["cpu"],
+            "memory": info["memory"]
+        }},
+        upsert=True
+    )
+
+
+async def delete_node(node_id: str):
+    await get_collection("nodes").delete_one({"id": node_id})
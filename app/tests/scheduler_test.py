@@ -62,3 +62,98 @@ def test_invalid_strategy(sample_job, sample_nodes):
     scheduler = Scheduler(strategy="does_not_exist")
     with pytest.raises(ValueError):
         scheduler.schedule_job(sample_job, sample_nodes)
+
+
+def test_schedule_batch_groups_jobs_per_node(sample_nodes):
+    scheduler = Scheduler(strategy="round_robin")
+    jobs = [Job(id=f"job{i}", image="nginx", status="pending") for i in range(4)]
+
+    assignments, unscheduled = scheduler.schedule_batch(jobs, sample_nodes)
+
+    assert unscheduled == []
+    assert [j.id for j in assignments["node1"][1]] == ["job0", "job2"]
+    assert [j.id for j in assignments["node2"][1]] == ["job1", "job3"]
+
+
+def test_schedule_batch_without_nodes_leaves_jobs_unscheduled(sample_job):
+    assignments, unscheduled = Scheduler().schedule_batch([sample_job], [])
+    assert assignments == {}
+    assert unscheduled == [sample_job]
+
+
+@pytest.fixture
+def capacity_nodes():
+    # node1: 4 cores / 4 GB, node2: 8 cores / 16 GB
+    return [
+        Node(id="node1", ip="127.0.0.1", port=8001, cpu=4, memory=4096),
+        Node(id="node2", ip="127.0.0.1", port=8002, cpu=8, memory=16384),
+    ]
+
+
+def test_best_fit_packs_smallest_node_first(capacity_nodes):
+    scheduler = Scheduler(strategy="best_fit")
+    job = Job(id="j1", image="nginx", status="pending", cpu=1, memory=1024)
+    assert scheduler.schedule_job(job, capacity_nodes).id == "node1"
+
+
+def test_worst_fit_spreads_to_largest_free_node(capacity_nodes):
+    scheduler = Scheduler(strategy="worst_fit")
+    job = Job(id="j1", image="nginx", status="pending", cpu=1, memory=1024)
+    assert scheduler.schedule_job(job, capacity_nodes).id == "node2"
+
+
+def test_bin_packing_does_not_oversubscribe(capacity_nodes):
+    scheduler = Scheduler(strategy="best_fit")
+    jobs = [Job(id=f"j{i}", image="nginx", status="pending", cpu=2, memory=2048) for i in range(8)]
+
+    assignments, unscheduled = scheduler.schedule_batch(jobs, capacity_nodes)
+
+    # node1 fits 2 jobs (4 cores), node2 fits 4 jobs (8 cores), 2 are left over
+    assert len(assignments["node1"][1]) == 2
+    assert len(assignments["node2"][1]) == 4
+    assert len(unscheduled) == 2
+    assert scheduler.allocations()["node1"] == {"cpu": 4.0, "memory": 4096}
+
+
+def test_release_frees_capacity(capacity_nodes):
+    scheduler = Scheduler(strategy="best_fit")
+    big = Job(id="big", image="nginx", status="pending", cpu=4, memory=4096)
+    assert scheduler.schedule_job(big, capacity_nodes[:1]).id == "node1"
+    assert scheduler.schedule_job(Job(id="next", image="nginx", status="pending", cpu=4, memory=4096), capacity_nodes[:1]) is None
+
+    assert scheduler.release("big") == "node1"
+    assert scheduler.schedule_job(Job(id="next", image="nginx", status="pending", cpu=4, memory=4096), capacity_nodes[:1]).id == "node1"
+
+
+def test_drf_balances_dominant_share(capacity_nodes):
+    scheduler = Scheduler(strategy="drf")
+    # Memory-heavy job puts node2 at 50% memory share, so the next job goes to node1
+    scheduler.reserve(Job(id="mem", image="nginx", status="pending", cpu=1, memory=8192), "node2")
+    job = Job(id="j1", image="nginx", status="pending", cpu=1, memory=512)
+    assert scheduler.schedule_job(job, capacity_nodes).id == "node1"
+
+
+def test_image_locality_prefers_nodes_with_the_image(capacity_nodes):
+    capacity_nodes[1].images = ["python:3.11-slim"]
+    scheduler = Scheduler(strategy="best_fit")
+    job = Job(id="j1", image="python:3.11-slim", status="pending", cpu=1, memory=1024)
+
+    # best_fit alone would pick node1; node2 already has the image
+    assert scheduler.schedule_job(job, capacity_nodes).id == "node2"
+    assert scheduler.locality_hits == 1
+    # No node has nginx: placement falls back to the plain strategy
+    assert scheduler.schedule_job(Job(id="j2", image="nginx", status="pending"), capacity_nodes).id == "node1"
+
+
+def test_image_locality_falls_back_when_warm_nodes_are_full(capacity_nodes):
+    capacity_nodes[0].images = ["python:3.11-slim"]
+    scheduler = Scheduler(strategy="best_fit")
+    jobs = [Job(id=f"j{i}", image="python:3.11-slim", status="pending", cpu=2, memory=2048) for i in range(3)]
+
+    assignments, _ = scheduler.schedule_batch(jobs, capacity_nodes)
+
+    assert [j.id for j in assignments["node1"][1]] == ["j0", "j1"]
+    assert [j.id for j in assignments["node2"][1]] == ["j2"]
+    assert Scheduler(strategy="best_fit", image_locality=False).schedule_job(
+        Job(id="x", image="python:3.11-slim", status="pending", cpu=1, memory=1024), capacity_nodes
+    ).id == "node1"
@@ -0,0 +1,288 @@
+import asyncio
+import gzip
+import json
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+
+import agent
+from orchestrator.container_record import ContainerRecord
+from orchestrator.container_telemetry import ContainerTelemetry
+from orchestrator.image_warmer import ImageWarmer
+from orchestrator.log_archive import LogArchiver
+from orchestrator.revision_index import RevisionIndex
+
+
+class DummyContainerManager:
+    def __init__(self):
+        self.started = []
+        self.listing = []
+        self.list_calls = 0
+        self.inspected = []
+        self.images = ["alpine:3.18"]
+        self.pulled = []
+
+    async def list_containers_async(self, all: bool = False):
+        self.list_calls += 1
+        return [
+            SimpleNamespace(id=cid, name=name, status=status, image=SimpleNamespace(tags=["alpine:3.18"]),
+                            labels={"orchestrator.job": name.removeprefix("job-")})
+            for cid, name, status in self.listing
+        ]
+
+    async def inspect_containers_async(self, container_ids):
+        self.inspected.extend(container_ids)
+        records = []
+        for cid, name, status in self.listing:
+            if cid in container_ids:
+                finished = status == "exited"
+                records.append(ContainerRecord(
+                    cid, name=name, status=status, state=status, exit_code=0 if finished else None,
+                    oom_killed=False, restart_count=0, started_at=100.0, finished_at=200.0 if finished else None,
+                ))
+        return records
+
+    async def list_images_async(self):
+        return list(self.images)
+
+    async def pull_image_async(self, image, on_progress=None):
+        self.pulled.append(image)
+        on_progress({"id": "layer1", "status": "Downloading", "progressDetail": {"current": 5, "total": 10}})
+        await asyncio.sleep(0)
+        on_progress({"id": "layer1", "status": "Pull complete", "progressDetail": {}})
+        self.images.append(image)
+
+    async def get_container_async(self, container_id):
+        if container_id not in {cid for cid, _, _ in self.listing} | {name for _, name, _ in self.listing}:
+            raise agent.NotFound(container_id)
+        return ContainerRecord(container_id)
+
+    async def container_logs_async(self, container_id, follow=False, tail=None, since=None):
+        self.log_args = (container_id, follow, tail, since)
+        for line in (b"line 1\n", b"line 2\n", b"line 3\n")[-(tail or 3):]:
+            yield line
+
+    async def start_container_async(self, image: str, name: str | None = None, command: str | None = None, **limits):
+        self.started.append(name)
+        self.labels = limits.get("labels")
+        if name == "boom":
+            raise RuntimeError("docker run failed")
+        return {"id": f"id-{name}", "name": name, "image": image, "status": "running"}
+
+
+def create_client(monkeypatch):
+    dummy = DummyContainerManager()
+    monkeypatch.setattr(agent, "cm", dummy)
+    monkeypatch.setattr(agent, "index", RevisionIndex())
+    monkeypatch.setattr(agent, "warmer", ImageWarmer(dummy, images=["alpine:3.18"]))
+    return TestClient(agent.app), dummy
+
+
+def test_batch_create_reports_each_outcome(monkeypatch):
+    client, dummy = create_client(monkeypatch)
+
+    response = client.post("/containers/batch", json=[
+        {"image": "alpine:3.18", "name": "a"},
+        {"image": "alpine:3.18", "name": "boom"},
+        {"image": "evil:latest", "name": "c"},
+        {"image": "alpine:3.18", "name": "d", "command": "sudo reboot"},
+    ])
+
+    assert response.status_code == 200
+    outcomes = {o["name"]: o for o in map(json.loads, response.text.splitlines())}
+    assert outcomes["a"]["id"] == "id-a"
+    assert outcomes["boom"]["status"] == "failed"
+    assert outcomes["c"]["status"] == "rejected"
+    assert outcomes["d"]["status"] == "rejected"
+    # Rejected specs never reach Docker
+    assert sorted(dummy.started) == ["a", "boom"]
+
+
+def test_health_returns_cached_sample_with_age(monkeypatch):
+    client, _ = create_client(monkeypatch)
+
+    first = client.get("/health").json()
+    second = client.get("/health").json()
+
+    assert first["status"] == "ok"
+    assert second["sampled_at"] == first["sampled_at"]
+    assert second["sample_age"] >= 0
+    for key in ("cpu_percent", "memory_percent", "cpu_count", "memory_total_mb", "disk_percent", "load_avg"):
+        assert key in second
+
+
+def test_containers_since_returns_only_changes(monkeypatch):
+    client, dummy = create_client(monkeypatch)
+    dummy.listing = [("c1", "job-1", "running"), ("c2", "job-2", "running")]
+
+    first = client.get("/containers", params={"since": 0}).json()
+    assert {c["id"] for c in first["containers"]} == {"c1", "c2"}
+
+    # Served from the index: no re-list until something marks it dirty
+    again = client.get("/containers", params={"since": first["revision"], "epoch": first["epoch"]}).json()
+    assert again["containers"] == [] and again["removed"] == []
+    assert dummy.list_calls == 1
+
+    dummy.listing = [("c1", "job-1", "exited")]
+    asyncio.run(agent._refresh_index())
+
+    delta = client.get("/containers", params={"since": first["revision"], "epoch": first["epoch"]}).json()
+    assert delta["full"] is False
+    assert [(c["id"], c["status"]) for c in delta["containers"]] == [("c1", "exited")]
+    assert delta["removed"] == ["c2"]
+
+    # A revision from another agent process gets a full listing back
+    other = client.get("/containers", params={"since": delta["revision"], "epoch": "restarted"}).json()
+    assert other["full"] is True
+    assert [c["id"] for c in other["containers"]] == ["c1"]
+
+
+def test_containers_not_modified_when_index_unchanged(monkeypatch):
+    client, dummy = create_client(monkeypatch)
+    dummy.listing = [("c1", "job-1", "running")]
+
+    first = client.get("/containers")
+    second = client.get("/containers", headers={"If-None-Match": first.headers["ETag"]})
+
+    assert first.json()[0]["id"] == "c1"
+    assert second.status_code == 304
+
+
+def test_running_only_listing_has_its_own_etag(monkeypatch):
+    client, dummy = create_client(monkeypatch)
+    dummy.listing = [("c1", "job-1", "exited"), ("c2", "job-2", "running")]
+
+    everything = client.get("/containers")
+    running = client.get("/containers", params={"all": "false"}, headers={"If-None-Match": everything.headers["ETag"]})
+
+    assert running.status_code == 200
+    assert [c["id"] for c in running.json()] == ["c2"]
+    assert running.headers["ETag"] != everything.headers["ETag"]
+
+
+def test_index_inspects_only_new_or_changed_containers(monkeypatch):
+    client, dummy = create_client(monkeypatch)
+    dummy.listing = [("c1", "job-1", "running"), ("c2", "job-2", "running")]
+
+    asyncio.run(agent._refresh_index())
+    asyncio.run(agent._refresh_index())
+    assert sorted(dummy.inspected) == ["c1", "c2"]
+
+    dummy.listing = [("c1", "job-1", "exited"), ("c2", "job-2", "running")]
+    asyncio.run(agent._refresh_index())
+
+    assert sorted(dummy.inspected) == ["c1", "c1", "c2"]
+    c1, c2 = sorted(agent.index.records(), key=lambda c: c["id"])
+    assert (c1["state"], c1["exit_code"], c1["finished_at"]) == ("exited", 0, 200.0)
+    # Unchanged containers keep the details from their last inspect
+    assert c2["started_at"] == 100.0
+
+
+def test_containers_filtered_by_state_label_and_finish_time(monkeypatch):
+    client, dummy = create_client(monkeypatch)
+    dummy.listing = [("c1", "job-1", "exited"), ("c2", "job-2", "running")]
+
+    exited = client.get("/containers", params={"state": "exited", "finished_before": 300})
+    recent = client.get("/containers", params={"state": "exited", "finished_before": 150})
+    everything = client.get("/containers")
+
+    assert [c["id"] for c in exited.json()] == ["c1"]
+    assert recent.json() == []
+    assert len(everything.json()) == 2
+    assert exited.headers["ETag"] != everything.headers["ETag"] != recent.headers["ETag"]
+
+
+def test_job_container_found_by_label(monkeypatch):
+    client, dummy = create_client(monkeypatch)
+    dummy.listing = [("c1", "job-1", "running"), ("c2", "job-2", "exited")]
+
+    found = client.get("/jobs/2/container")
+    labelled = client.get("/containers", params={"label": "orchestrator.job=1"})
+
+    assert found.json()["id"] == "c2"
+    assert client.get("/jobs/3/container").status_code == 404
+    assert [c["id"] for c in labelled.json()] == ["c1"]
+
+
+def test_create_passes_labels(monkeypatch):
+    client, dummy = create_client(monkeypatch)
+
+    client.post("/containers", params={"image": "alpine:3.18", "name": "x", "label": ["orchestrator.job=x", "team=a"]})
+
+    assert dummy.labels == {"orchestrator.job": "x", "team": "a"}
+
+
+def test_missing_images_are_pulled_once_before_a_batch(monkeypatch):
+    client, dummy = create_client(monkeypatch)
+    asyncio.run(agent.warmer.refresh_inventory())
+
+    response = client.post("/containers/batch", json=[
+        {"image": "python:3.11-slim", "name": "a"},
+        {"image": "python:3.11-slim", "name": "b"},
+        {"image": "alpine:3.18", "name": "c"},
+    ])
+
+    assert response.status_code == 200
+    assert dummy.pulled == ["python:3.11-slim"]
+    progress = client.get("/images/pulls", params={"image": "python:3.11-slim"}).json()
+    assert progress["status"] == "done" and progress["current_bytes"] == progress["total_bytes"] == 10
+    assert "python:3.11-slim" in client.get("/health").json()["images"]
+
+
+def test_pull_endpoint_rejects_images_off_the_allow_list(monkeypatch):
+    client, _ = create_client(monkeypatch)
+
+    assert client.post("/images/pull", params={"image": "evil:latest"}).status_code == 400
+    assert client.get("/images/pulls", params={"image": "evil:latest"}).status_code == 404
+
+
+def test_logs_stream_from_the_container(monkeypatch):
+    client, dummy = create_client(monkeypatch)
+    dummy.listing = [("c1", "job-7", "running")]
+
+    response = client.get("/containers/job-7/logs", params={"follow": "true", "tail": 2, "since": 100})
+
+    assert response.status_code == 200
+    assert response.text == "line 2\nline 3\n"
+    assert response.headers["x-log-source"] == "container"
+    assert dummy.log_args == ("job-7", True, 2, 100.0)
+
+
+def test_logs_fall_back_to_the_archive_once_the_container_is_gone(monkeypatch, tmp_path):
+    client, dummy = create_client(monkeypatch)
+    archiver = LogArchiver(dummy, directory=str(tmp_path))
+    monkeypatch.setattr(agent, "archiver", archiver)
+    dummy.listing = [("c1", "job-7", "exited")]
+    asyncio.run(archiver.archive("c1", archiver.path("job-7")))
+    dummy.listing = []
+
+    plain = client.get("/containers/job-7/logs", headers={"Accept-Encoding": "identity"})
+    stored = client.get("/containers/job-7/logs", headers={"Accept-Encoding": "gzip"})
+    tail = client.get("/containers/job-7/logs", params={"tail": 1})
+    missing = client.get("/containers/job-8/logs")
+
+    assert gzip.decompress((tmp_path / "job-7.log.gz").read_bytes()) == b"line 1\nline 2\nline 3\n"
+    assert plain.text == "line 1\nline 2\nline 3\n" and plain.headers["x-log-source"] == "archive"
+    # Served as stored; the client undoes the gzip
+    assert stored.headers["content-encoding"] == "gzip" and stored.text == plain.text
+    assert tail.text == "line 3\n"
+    assert missing.status_code == 404
+    assert archiver.stats()["archived"] == 1
+
+
+def test_telemetry_series_by_container_name(monkeypatch):
+    client, dummy = create_client(monkeypatch)
+    telemetry = ContainerTelemetry(dummy, agent._current_records, resolution=10)
+    monkeypatch.setattr(agent, "telemetry", telemetry)
+    telemetry.record("c1", {"memory_stats": {"usage": 1000, "limit": 4000}}, t=1005)
+    telemetry.record("c1", {"memory_stats": {"usage": 3000, "limit": 4000}}, t=1012)
+    telemetry._series["c1"].name = "job-7"
+
+    series = client.get("/telemetry/containers/job-7").json()
+    merged = client.get("/telemetry/containers", params={"step": 2, "container": "c1"}).json()
+    summary = client.get("/telemetry/summary").json()
+
+    assert series["t"] == [1000, 1010] and series["memory_bytes"] == [1000, 3000]
+    assert merged["resolution"] == 20 and merged["containers"][0]["memory_bytes"] == [3000]
+    assert summary["containers"][0]["memory_peak"] == 3000
+    assert client.get("/telemetry/containers/job-8").status_code == 404
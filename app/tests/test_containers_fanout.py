@@ -0,0 +1,131 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+
+import main
+from api import containers as containers_api
+from orchestrator.cluster_state import ClusterState
+
+
+class DummyContainerManager:
+    async def list_containers_async(self, all: bool = False):
+        return [SimpleNamespace(id="local1", name="local", image=SimpleNamespace(tags=["nginx:latest"]), status="running")]
+
+
+class DummyNodeManager:
+    def __init__(self, nodes):
+        self.nodes = nodes
+
+    def list_nodes(self):
+        return self.nodes
+
+
+class SlowAgentClient:
+    """Answers per node after a configurable delay; "boom" raises."""
+
+    def __init__(self, delays):
+        self.delays = delays
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls = []
+
+    async def get(self, node, path, **kwargs):
+        self.calls.append(node["name"])
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            delay = self.delays[node["name"]]
+            if delay == "boom":
+                raise RuntimeError("connection refused")
+            await asyncio.sleep(delay)
+            return SimpleNamespace(status_code=200, headers={}, json=lambda: [{"id": f"{node['name']}-c", "name": "c"}])
+        finally:
+            self.in_flight -= 1
+
+
+def setup(monkeypatch, nodes, delays):
+    agent = SlowAgentClient(delays)
+    monkeypatch.setattr(containers_api, "container_manager", DummyContainerManager())
+    monkeypatch.setattr(containers_api, "node_manager", DummyNodeManager(nodes))
+    monkeypatch.setattr(containers_api, "cluster_state", ClusterState(agent))
+    return TestClient(main.app), agent
+
+
+def node(name, status="online"):
+    return {"name": name, "ip": "127.0.0.1", "port": 8001, "status": status}
+
+
+def test_list_is_partial_when_a_node_misses_the_deadline(monkeypatch):
+    client, _ = setup(
+        monkeypatch,
+        {"fast": node("fast"), "hung": node("hung"), "down": node("down")},
+        {"fast": 0, "hung": 10, "down": "boom"},
+    )
+
+    response = client.get("/containers", params={"deadline": 0.2})
+
+    assert response.status_code == 200
+    ids = [c["id"] for c in response.json()]
+    assert sorted(ids) == ["fast-c", "local1"]
+    assert response.headers["X-Timed-Out-Nodes"] == "hung"
+    assert response.headers["X-Failed-Nodes"] == "down"
+
+
+def test_nodes_are_queried_concurrently_under_the_cap(monkeypatch):
+    monkeypatch.setattr(containers_api, "LIST_CONCURRENCY", 3)
+    nodes = {f"n{i}": node(f"n{i}") for i in range(9)}
+    client, agent = setup(monkeypatch, nodes, {f"n{i}": 0.05 for i in range(9)})
+
+    response = client.get("/containers")
+
+    assert len(response.json()) == 10
+    assert agent.max_in_flight == 3
+
+
+def test_offline_nodes_are_not_queried(monkeypatch):
+    client, agent = setup(monkeypatch, {"gone": node("gone", status="offline")}, {"gone": 10})
+
+    response = client.get("/containers")
+
+    assert agent.calls == []
+    assert "X-Timed-Out-Nodes" not in response.headers
+
+
+def test_stream_mode_emits_one_record_per_node(monkeypatch):
+    client, _ = setup(monkeypatch, {"fast": node("fast"), "hung": node("hung")}, {"fast": 0, "hung": 10})
+
+    response = client.get("/containers", params={"stream": "true", "deadline": 0.2})
+
+    records = [json.loads(line) for line in response.text.splitlines() if line]
+    by_node = {r["node_id"]: r for r in records}
+    assert by_node["orchestrator"]["containers"][0]["id"] == "local1"
+    assert by_node["fast"]["status"] == "ok"
+    assert by_node["fast"]["containers"][0]["node_id"] == "fast"
+    assert by_node["hung"] == {"node_id": "hung", "status": "timeout", "containers": []}
+    assert records[-1]["node_id"] == "hung"
+
+
+def test_unchanged_listing_answers_304(monkeypatch):
+    client, _ = setup(monkeypatch, {"fast": node("fast")}, {"fast": 0})
+
+    first = client.get("/containers")
+    etag = first.headers["ETag"]
+    second = client.get("/containers", headers={"If-None-Match": etag})
+
+    assert second.status_code == 304
+    assert second.content == b""
+    # A different view of the same data has its own validator
+    assert client.get("/containers", params={"all": "false"}, headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_since_returns_cluster_delta(monkeypatch):
+    client, agent = setup(monkeypatch, {"fast": node("fast")}, {"fast": 0})
+    first = client.get("/containers", params={"since": 0}).json()
+    assert "fast-c" in {c["id"] for c in first["containers"]}
+
+    again = client.get("/containers", params={"since": first["revision"], "epoch": first["epoch"]}).json()
+
+    assert again["full"] is False
+    assert again["containers"] == [] and again["removed"] == []
@@ -0,0 +1,222 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import httpx
+
+import repository
+from orchestrator.dispatcher import Dispatcher, ORCHESTRATOR_ID, deploy_query
+from orchestrator.models import Job
+from orchestrator.scheduler import Scheduler
+
+
+class DummyJobsRepository:
+    def __init__(self, docs):
+        self.docs = docs
+        self.assigned = []
+
+    async def find_pending_jobs(self, limit, exclude=None):
+        pending = [d for d in self.docs
+                   if d["status"] == "pending" and d.get("node_id") is None and d["id"] not in (exclude or [])]
+        for key, direction in reversed(repository.QUEUE_SORT):
+            pending.sort(key=lambda d: d[key], reverse=direction < 0)
+        return pending[:limit]
+
+    def _doc(self, job_id):
+        return next(doc for doc in self.docs if doc["id"] == job_id)
+
+    async def assign_pending_jobs(self, assignments):
+        self.assigned.extend(assignments)
+        for job_id, status, node_id in assignments:
+            doc = self._doc(job_id)
+            doc["node_id"] = node_id
+            if doc["status"] == "pending":
+                doc["status"] = status
+
+    async def claim_pending_jobs(self, job_ids, node_id, assigned_at):
+        for job_id in job_ids:
+            doc = self._doc(job_id)
+            if doc["status"] == "pending" and doc.get("node_id") is None:
+                doc["node_id"], doc["assigned_at"] = node_id, assigned_at
+
+    async def requeue_jobs(self, deploys):
+        requeued = []
+        for job_id, node_id in deploys:
+            doc = self._doc(job_id)
+            if doc["status"] == "pending" and doc.get("node_id") == node_id:
+                doc["node_id"] = doc["assigned_at"] = None
+                requeued.append(job_id)
+        return requeued
+
+
+class DummyNodeManager:
+    def __init__(self, nodes):
+        self.nodes = nodes
+
+    async def list_nodes_async(self, refresh=False):
+        return self.nodes
+
+
+class DummyAgentClient:
+    def __init__(self, failures=0):
+        self.deployed = []
+        self.specs = []
+        self.failures = failures
+        # job_id -> container record an agent reports for GET /jobs/{id}/container
+        self.containers = {}
+        # Called with the job ids of a deploy that is about to be reported as failed
+        self.on_failure = None
+
+    async def post(self, node, path, op="deploy", **kwargs):
+        if self.failures:
+            self.failures -= 1
+            if self.on_failure:
+                self.on_failure([spec["name"][len("job-"):] for spec in kwargs["json"]])
+            raise httpx.ReadTimeout("agent too slow")
+        self.specs.extend(kwargs["json"])
+        names = [spec["name"] for spec in kwargs["json"]]
+        self.deployed.extend(names)
+        return httpx.Response(200, text="\n".join(json.dumps({"name": n, "id": "c"}) for n in names))
+
+    async def get(self, node, path, op="list", **kwargs):
+        job_id = path.split("/")[2]
+        if job_id in self.containers:
+            return httpx.Response(200, json=self.containers[job_id])
+        return httpx.Response(404)
+
+
+def pending_doc(job_id, priority=0, age=0):
+    return {
+        "id": job_id,
+        "image": "alpine:3.18",
+        "status": "pending",
+        "priority": priority,
+        "submitted_at": datetime(2024, 1, 1) + timedelta(seconds=age),
+    }
+
+
+ONLINE = {"node1": {"ip": "127.0.0.1", "port": 8001, "cpu": 4, "memory": 8192, "status": "online"}}
+
+
+def make_dispatcher(monkeypatch, docs, nodes=ONLINE, failures=0, **kwargs):
+    collection = DummyJobsRepository(docs)
+    monkeypatch.setattr(repository, "find_pending_jobs", collection.find_pending_jobs)
+    monkeypatch.setattr(repository, "assign_pending_jobs", collection.assign_pending_jobs)
+    monkeypatch.setattr(repository, "claim_pending_jobs", collection.claim_pending_jobs)
+    monkeypatch.setattr(repository, "requeue_jobs", collection.requeue_jobs)
+    agent = DummyAgentClient(failures)
+    d = Dispatcher(DummyNodeManager(nodes), Scheduler(strategy="best_fit"), agent, **kwargs)
+    return d, collection, agent
+
+
+def test_dispatch_drains_queue_in_priority_order(monkeypatch):
+    docs = [pending_doc("old", age=0), pending_doc("new", age=10), pending_doc("urgent", priority=5, age=20)]
+    d, collection, agent = make_dispatcher(monkeypatch, docs, batch_size=2)
+
+    deployed, _ = asyncio.run(d.dispatch_once())
+
+    assert deployed == 2
+    assert agent.deployed == ["job-urgent", "job-old"]
+    assert [job_id for job_id, _, _ in collection.assigned] == ["urgent", "old"]
+
+
+def test_dispatch_rate_limits_per_node(monkeypatch):
+    docs = [pending_doc(f"j{i}", age=i) for i in range(5)]
+    d, collection, agent = make_dispatcher(monkeypatch, docs, rate_per_node=0.001, burst_per_node=2)
+
+    deployed, deferred = asyncio.run(d.dispatch_once())
+
+    assert deployed == 2
+    assert deferred is True
+    # Rate-limited jobs gave their reservation back
+    assert d._scheduler.allocations()["node1"]["memory"] == 2 * 256
+
+
+def test_dispatch_without_online_nodes_is_noop(monkeypatch):
+    d, collection, agent = make_dispatcher(monkeypatch, [pending_doc("j1")], nodes={})
+
+    assert asyncio.run(d.dispatch_once()) == (0, False)
+    assert agent.deployed == []
+
+
+def test_job_containers_are_labelled(monkeypatch):
+    d, _, agent = make_dispatcher(monkeypatch, [pending_doc("a")])
+
+    asyncio.run(d.dispatch_once())
+
+    labels = agent.specs[0]["labels"]
+    assert labels["orchestrator.job"] == "a"
+    assert labels["orchestrator.id"] == ORCHESTRATOR_ID
+    assert labels["orchestrator.generation"] == str(int(datetime(2024, 1, 1).timestamp() * 1000))
+    query = deploy_query(Job(**pending_doc("a")))
+    assert "orchestrator.job=a" in query["label"] and "labels" not in query
+
+
+def test_failed_deploys_are_retried_with_backoff_before_failing(monkeypatch):
+    docs = [pending_doc("a")]
+    d, collection, agent = make_dispatcher(monkeypatch, docs, failures=2, max_attempts=3, retry_backoff=0.05)
+
+    async def scenario():
+        await d.dispatch_once()
+        after_first = dict(docs[0])
+        # Still backing off: the job isn't picked up again yet
+        skipped = await d.dispatch_once()
+        await asyncio.sleep(0.06)
+        await d.dispatch_once()
+        await asyncio.sleep(0.11)
+        await d.dispatch_once()
+        return after_first, skipped
+
+    after_first, skipped = asyncio.run(scenario())
+
+    assert after_first["status"] == "pending" and after_first["node_id"] is None
+    assert skipped == (0, False)
+    assert docs[0]["status"] == "running" and docs[0]["node_id"] == "node1"
+    assert (d.retried, d.failed, d.dispatched) == (2, 0, 1)
+    assert d._scheduler.allocations()["node1"]["memory"] == 256
+
+
+def test_deploy_fails_for_good_after_max_attempts(monkeypatch):
+    docs = [pending_doc("a")]
+    d, collection, agent = make_dispatcher(monkeypatch, docs, failures=5, max_attempts=2, retry_backoff=0)
+
+    asyncio.run(d.dispatch_once())
+    asyncio.run(d.dispatch_once())
+
+    assert docs[0]["status"] == "failed"
+    assert (d.retried, d.failed) == (1, 1)
+    assert d.stats()["backing_off"] == 0
+
+
+def test_failed_deploy_whose_container_started_is_not_requeued(monkeypatch):
+    docs = [pending_doc("a")]
+    d, collection, agent = make_dispatcher(monkeypatch, docs, failures=1, retry_backoff=60)
+
+    def start_event_arrives(job_ids):
+        # The container started; its start event lands before the timed-out deploy returns
+        for job_id in job_ids:
+            collection._doc(job_id)["status"] = "running"
+
+    agent.on_failure = start_event_arrives
+    asyncio.run(d.dispatch_once())
+
+    assert docs[0]["status"] == "running" and docs[0]["node_id"] == "node1"
+    assert d.retried == 0 and d.stats()["backing_off"] == 0
+    assert d._scheduler.allocations()["node1"]["memory"] == 256
+
+
+def test_retry_adopts_a_container_the_failed_deploy_started(monkeypatch):
+    docs = [pending_doc("a")]
+    d, collection, agent = make_dispatcher(monkeypatch, docs, failures=1, retry_backoff=0)
+
+    async def scenario():
+        await d.dispatch_once()
+        # The start event was lost, but the agent has the container
+        agent.containers["a"] = {"id": "c1", "state": "running", "labels": {"orchestrator.job": "a"}}
+        await d.dispatch_once()
+
+    asyncio.run(scenario())
+
+    assert agent.deployed == []
+    assert docs[0]["status"] == "running" and docs[0]["node_id"] == "node1"
+    assert d._scheduler.allocations()["node1"]["memory"] == 256
@@ -0,0 +1,294 @@
+import asyncio
+import json
+import subprocess
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from orchestrator.container_manager import ContainerManager, NotFound
+from orchestrator.docker_engine import AsyncDockerEngineClient, DockerEngineClient
+from orchestrator.docker_subprocess import ProcessOutput, SecurityError
+
+
+class FakeEngine:
+    """Minimal Engine API: one container store, images that must be pulled first."""
+
+    def __init__(self):
+        self.images = set()
+        self.containers = {}
+        self.requests = []
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        path, method = request.url.path, request.method
+        self.requests.append((method, path))
+        if path == "/_ping":
+            return httpx.Response(200, text="OK")
+        if path == "/containers/json":
+            return httpx.Response(200, json=[
+                {"Id": cid, "Names": [f"/{c['name']}"], "Status": c["status"], "Image": c["image"]}
+                for cid, c in self.containers.items()
+            ])
+        if path == "/images/create":
+            self.images.add(f"{request.url.params['fromImage']}:{request.url.params['tag']}")
+            return httpx.Response(200, text='{"status":"Pulling"}\n{"status":"Done"}\n')
+        if path == "/containers/create":
+            body = json.loads(request.content)
+            if body["Image"] not in self.images:
+                return httpx.Response(404, json={"message": "No such image"})
+            cid = f"id{len(self.containers)}"
+            self.containers[cid] = {"name": request.url.params["name"], "status": "created",
+                                    "image": body["Image"], "body": body}
+            return httpx.Response(201, json={"Id": cid})
+        cid = path.split("/")[2]
+        c = self.containers.get(cid)
+        if c is None:
+            return httpx.Response(404, json={"message": f"No such container: {cid}"})
+        if path.endswith("/start"):
+            c["status"] = "running"
+            return httpx.Response(204)
+        if path.endswith("/json"):
+            return httpx.Response(200, json={"Id": cid, "Name": f"/{c['name']}", "State": {"Status": c["status"]},
+                                             "Config": {"Image": c["image"]}})
+        if path.endswith("/stop"):
+            c["status"] = "exited"
+            return httpx.Response(204)
+        if method == "DELETE":
+            del self.containers[cid]
+            return httpx.Response(204)
+        return httpx.Response(500)
+
+
+@pytest.fixture
+def engine():
+    fake = FakeEngine()
+    return fake, DockerEngineClient(transport=httpx.MockTransport(fake.handler))
+
+
+def test_run_pulls_missing_image_and_applies_isolation(engine):
+    fake, client = engine
+
+    c = client.containers_run("python:3.11-slim", name="job-1", command="print(1)", cpus=0.5, memory_mb=128)
+
+    assert (c.name, c.status, c.image) == ("job-1", "running", "python:3.11-slim")
+    assert "python:3.11-slim" in fake.images
+    body = fake.containers[c.id]["body"]
+    assert body["Cmd"] == ["python", "-c", "print(1)"]
+    assert body["HostConfig"]["NetworkMode"] == "none"
+    assert body["HostConfig"]["CapDrop"] == ["ALL"]
+    assert body["HostConfig"]["Memory"] == 128 * 1024 * 1024
+    assert body["HostConfig"]["NanoCpus"] == 500_000_000
+
+
+def test_run_validates_before_calling_docker(engine):
+    fake, client = engine
+
+    with pytest.raises(SecurityError):
+        client.containers_run("evil:latest", name="x")
+    assert fake.requests == []
+
+
+def test_list_strips_leading_slash(engine):
+    fake, client = engine
+    fake.images.add("alpine:3.18")
+    client.containers_run("alpine:3.18", name="job-2")
+
+    [c] = client.containers_list(all=True)
+
+    assert c.name == "job-2"
+
+
+def test_manager_prefers_engine_and_maps_not_found(engine, monkeypatch):
+    fake, client = engine
+    manager = ContainerManager(backend="auto")
+    monkeypatch.setattr(manager, "_try_engine", lambda: client)
+    monkeypatch.setattr(manager, "_sdk_client", lambda: pytest.fail("SDK should not be tried"))
+
+    assert manager.list_containers(all=True) == []
+    assert manager.backend == "engine"
+    with pytest.raises(NotFound):
+        manager.get_container("missing")
+    manager.shutdown()
+
+
+def async_manager(fake, slow_stop=0.0, **op_limits):
+    async def handler(request):
+        if request.url.path.endswith("/stop"):
+            await asyncio.sleep(slow_stop)
+        return fake.handler(request)
+
+    manager = ContainerManager(backend="engine", op_limits=op_limits)
+    manager.backend = "engine"
+    manager._async_client = AsyncDockerEngineClient(transport=httpx.MockTransport(handler))
+    return manager
+
+
+def test_async_manager_runs_lists_and_stops_natively():
+    fake = FakeEngine()
+    fake.images.add("alpine:3.18")
+    manager = async_manager(fake)
+
+    async def scenario():
+        started = await manager.start_container_async("alpine:3.18", name="job-a")
+        listed = await manager.list_containers_async(all=True)
+        stopped = await manager.stop_container_async(started["id"])
+        with pytest.raises(NotFound):
+            await manager.get_container_async("gone")
+        await manager.aclose()
+        return started, listed, stopped
+
+    started, listed, stopped = asyncio.run(scenario())
+
+    assert started["status"] == "running"
+    assert [c.name for c in listed] == ["job-a"]
+    assert stopped == {"status": "removed", "id": started["id"]}
+    assert fake.containers == {}
+
+
+def test_slow_stops_do_not_block_reads():
+    fake = FakeEngine()
+    fake.images.add("alpine:3.18")
+    manager = async_manager(fake, slow_stop=0.3, stop=1)
+
+    async def scenario():
+        ids = [(await manager.start_container_async("alpine:3.18", name=f"job-{i}"))["id"] for i in range(2)]
+        stops = [asyncio.create_task(manager.stop_container_async(cid)) for cid in ids]
+        await asyncio.sleep(0.05)
+        t0 = time.monotonic()
+        await manager.list_containers_async(all=True)
+        read_latency = time.monotonic() - t0
+        await asyncio.gather(*stops)
+        return read_latency
+
+    assert asyncio.run(scenario()) < 0.2
+
+
+def frame(stream, payload):
+    return bytes([stream, 0, 0, 0]) + len(payload).to_bytes(4, "big") + payload
+
+
+def test_logs_are_demultiplexed_across_split_frames():
+    raw = frame(1, b"hello\n") + frame(2, b"oops\n") + frame(1, b"bye\n")
+
+    async def pieces():
+        # Splits land mid-header and mid-payload
+        for i in range(0, len(raw), 5):
+            yield raw[i:i + 5]
+
+    async def handler(request):
+        assert request.url.params["tail"] == "10" and request.url.params["stderr"] == "1"
+        return httpx.Response(200, content=pieces())
+
+    async def scenario():
+        client = AsyncDockerEngineClient(transport=httpx.MockTransport(handler))
+        chunks = [chunk async for chunk in client.containers_logs("job-1", tail=10)]
+        await client.close()
+        return chunks
+
+    assert asyncio.run(scenario()) == [b"hello\n", b"oops\n", b"bye\n"]
+
+
+def test_log_reader_stays_a_bounded_distance_ahead_of_a_slow_consumer():
+    produced = []
+
+    def chunks():
+        for i in range(100):
+            produced.append(i)
+            yield b"x" * 10
+
+    manager = ContainerManager(backend="cli", log_buffer=4)
+    manager.backend = "cli"
+    manager._client = SimpleNamespace(containers_logs=lambda *args, **kwargs: chunks(), close=lambda: None)
+    manager._flat_api = True
+
+    async def scenario():
+        logs = manager.container_logs_async("job-1", follow=True)
+        first = await logs.__anext__()
+        await asyncio.sleep(0.2)
+        ahead = len(produced)
+        await logs.aclose()
+        return first, ahead
+
+    first, ahead = asyncio.run(scenario())
+    manager.shutdown()
+
+    assert first == b"x" * 10
+    # The queue plus the chunk in hand, not the whole log
+    assert ahead <= 4 + 3
+
+
+def test_leaving_a_quiet_cli_log_stream_kills_docker_logs():
+    proc = subprocess.Popen(["sh", "-c", "echo started; exec sleep 30"], stdout=subprocess.PIPE, bufsize=0)
+    manager = ContainerManager(backend="cli")
+    manager.backend = "cli"
+    manager._client = SimpleNamespace(containers_logs=lambda *args, **kwargs: ProcessOutput(proc), close=lambda: None)
+    manager._flat_api = True
+
+    async def scenario():
+        logs = manager.container_logs_async("job-1", follow=True)
+        first = await logs.__anext__()
+        # The feeder thread is now blocked reading a process that prints nothing more
+        await asyncio.sleep(0.05)
+        await logs.aclose()
+        return first
+
+    assert asyncio.run(scenario()) == b"started\n"
+    assert proc.wait(timeout=2) is not None
+    manager.shutdown()
+
+
+async def serve_docker(path, streamed):
+    """
+    A Docker socket whose logs/stats streams send one item and then stay
+    open, like a followed container that has gone quiet.
+    """
+    async def handle(reader, writer):
+        try:
+            while True:
+                request = await reader.readuntil(b"\r\n\r\n")
+                target = request.split(b" ")[1]
+                if b"/logs" in target or b"/stats" in target:
+                    streamed.append(target)
+                    item = frame(1, b"hi\n") if b"/logs" in target else b"{}\n"
+                    writer.write(b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n"
+                                 + b"%x\r\n%s\r\n" % (len(item), item))
+                    await writer.drain()
+                    await asyncio.Event().wait()
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: 2\r\n\r\n[]")
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_unix_server(handle, path=path)
+
+
+@pytest.mark.parametrize("kind", ["logs", "stats"])
+def test_long_lived_streams_leave_the_request_pool_free(tmp_path, kind):
+    socket_path = str(tmp_path / "docker.sock")
+    streamed = []
+
+    async def scenario():
+        server = await serve_docker(socket_path, streamed)
+        manager = ContainerManager(backend="engine")
+        manager.backend = "engine"
+        manager._async_client = AsyncDockerEngineClient(socket_path=socket_path, max_connections=2, timeout=1)
+        if kind == "logs":
+            streams = [manager.container_logs_async(f"job-{i}", follow=True) for i in range(2)]
+        else:
+            streams = [manager.container_stats_stream_async(f"job-{i}") for i in range(2)]
+        firsts = [await stream.__anext__() for stream in streams]
+        # As many idle streams as the request pool has connections
+        listed = await asyncio.wait_for(manager.list_containers_async(all=True), 2)
+        for stream in streams:
+            await stream.aclose()
+        await manager.aclose()
+        server.close()
+        return firsts, listed
+
+    firsts, listed = asyncio.run(scenario())
+
+    assert firsts == ([b"hi\n"] * 2 if kind == "logs" else [{}] * 2) and len(streamed) == 2
+    assert listed == []
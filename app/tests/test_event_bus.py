@@ -0,0 +1,77 @@
+import asyncio
+
+from api.events import format_sse
+from orchestrator.cluster_state import ClusterState
+from orchestrator.event_bus import EventBus
+from orchestrator.live_updates import LiveUpdates
+from orchestrator.node_manager import NodeManager
+
+
+def drain(queue):
+    events = []
+    while not queue.empty():
+        events.append(queue.get_nowait())
+    return events
+
+
+def test_subscribers_receive_published_events():
+    bus = EventBus()
+    a, b = bus.subscribe(), bus.subscribe()
+
+    bus.publish("jobs", {"jobs": [{"id": "1"}]})
+    bus.unsubscribe(b)
+    bus.publish("jobs", {"jobs": [{"id": "2"}]})
+
+    assert [e[2]["jobs"][0]["id"] for e in drain(a)] == ["1", "2"]
+    assert len(drain(b)) == 1
+
+
+def test_slow_subscriber_gets_resync_instead_of_backlog():
+    bus = EventBus(queue_size=3)
+    queue = bus.subscribe()
+
+    for i in range(5):
+        bus.publish("nodes", i)
+
+    events = drain(queue)
+    assert [topic for _, topic, _ in events] == ["resync", "nodes"]
+    assert bus.stats()["overflows"] == 1
+
+
+def test_reconnect_replays_from_last_event_id():
+    bus = EventBus(replay_size=2)
+    ids = [bus.publish("jobs", n) for n in range(3)]
+
+    resumed = drain(bus.subscribe(last_event_id=ids[1]))
+    too_old = drain(bus.subscribe(last_event_id=0))
+    from_before_restart = drain(bus.subscribe(last_event_id=99))
+
+    assert [data for _, _, data in resumed] == [2]
+    assert [topic for _, topic, _ in too_old] == ["resync"]
+    assert [topic for _, topic, _ in from_before_restart] == ["resync"]
+
+
+def test_format_sse():
+    assert format_sse(7, "jobs", {"id": "a"}) == 'id: 7\nevent: jobs\ndata: {"id": "a"}\n\n'
+
+
+class NoAgents:
+    async def get(self, *args, **kwargs):
+        raise AssertionError("no online nodes to sync")
+
+
+def test_live_updates_publish_only_changes():
+    bus = EventBus()
+    queue = bus.subscribe()
+    nodes = NodeManager(agent_client=NoAgents())
+    nodes.register_node("n1", {"ip": "10.0.0.1", "port": 8001, "cpu": 4, "memory": 8192})
+    live = LiveUpdates(bus, nodes, ClusterState(NoAgents()))
+
+    asyncio.run(live.publish_changes())
+    asyncio.run(live.publish_changes())
+    nodes.nodes["n1"]["cpu_percent"] = 42.0
+    asyncio.run(live.publish_changes())
+
+    events = [(topic, data) for _, topic, data in drain(queue)]
+    assert [topic for topic, _ in events] == ["nodes", "containers", "nodes"]
+    assert [n["cpu_percent"] for n in events[-1][1]["nodes"]] == [42.0]
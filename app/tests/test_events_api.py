@@ -0,0 +1,104 @@
+import json
+
+from fastapi.testclient import TestClient
+
+import main
+import repository
+from api import events as events_api
+from orchestrator.event_watcher import parse_event
+
+
+class DummyJobsRepository:
+    """Applies status transitions against an in-memory job table."""
+
+    def __init__(self, jobs):
+        self.jobs = {j["id"]: dict(j) for j in jobs}
+
+    async def apply_status_transitions(self, transitions):
+        applied = []
+        for job_id, status, from_statuses in transitions:
+            job = self.jobs.get(job_id)
+            if job is not None and job["status"] in from_statuses:
+                job["status"] = status
+                applied.append((job_id, status))
+        return applied
+
+
+def create_client_with_jobs(monkeypatch, jobs):
+    collection = DummyJobsRepository(jobs)
+    monkeypatch.setattr(repository, "apply_status_transitions", collection.apply_status_transitions)
+    return TestClient(main.app), collection
+
+
+def test_die_events_complete_or_fail_jobs(monkeypatch):
+    client, col = create_client_with_jobs(monkeypatch, [
+        {"id": "ok", "status": "running"},
+        {"id": "bad", "status": "running"},
+    ])
+
+    response = client.post("/events/containers", json={
+        "node_id": "node1",
+        "events": [
+            {"name": "job-ok", "action": "die", "exit_code": 0},
+            {"name": "job-bad", "action": "die", "exit_code": 1},
+            {"name": "unrelated", "action": "die", "exit_code": 0},
+        ],
+    })
+
+    assert response.status_code == 200
+    assert response.json() == {"received": 3, "applied": 2}
+    assert col.jobs["ok"]["status"] == "completed"
+    assert col.jobs["bad"]["status"] == "failed"
+
+
+def test_start_event_does_not_revive_finished_job(monkeypatch):
+    client, col = create_client_with_jobs(monkeypatch, [{"id": "done", "status": "completed"}])
+
+    response = client.post("/events/containers", json={
+        "events": [{"name": "job-done", "action": "start"}],
+    })
+
+    assert response.json()["applied"] == 0
+    assert col.jobs["done"]["status"] == "completed"
+
+
+def test_only_applied_transitions_release_and_publish(monkeypatch):
+    client, col = create_client_with_jobs(monkeypatch, [
+        {"id": "live", "status": "running"},
+        {"id": "done", "status": "completed"},
+    ])
+    released, published = [], []
+    monkeypatch.setattr(events_api.scheduler, "release", lambda job_id: released.append(job_id))
+    monkeypatch.setattr(events_api.event_bus, "publish", lambda topic, data: published.append(data))
+
+    response = client.post("/events/containers", json={"events": [
+        {"name": "job-live", "action": "oom"},
+        # Redelivered or late: both jobs are already finished by now
+        {"name": "job-live", "action": "die", "exit_code": 137},
+        {"name": "job-done", "action": "die", "exit_code": 1},
+    ]})
+
+    assert response.json()["applied"] == 1
+    assert released == ["live"]
+    assert published == [{"jobs": [{"id": "live", "status": "failed"}], "removed": []}]
+    assert col.jobs["done"]["status"] == "completed"
+
+
+def test_parse_event_extracts_exit_code():
+    line = json.dumps({
+        "Type": "container",
+        "Action": "die",
+        "Actor": {"ID": "abc", "Attributes": {"name": "job-1", "exitCode": "137", "image": "alpine:3.18"}},
+        "time": 1700000000,
+    })
+
+    event = parse_event(line)
+
+    assert event["container_id"] == "abc"
+    assert event["name"] == "job-1"
+    assert event["exit_code"] == 137
+
+
+def test_parse_event_ignores_other_actions():
+    assert parse_event(json.dumps({"Type": "container", "Action": "rename"})) is None
+    assert parse_event("not json") is None
@@ -0,0 +1,114 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import main
+import repository
+from orchestrator.scheduler import Scheduler
+
+NODES = {"n1": {"ip": "10.0.0.1", "port": 8001, "cpu": 4, "memory": 8192, "status": "online"}}
+LONG_AGO = datetime.utcnow() - timedelta(hours=1)
+
+
+def matches(doc, query):
+    for key, want in query.items():
+        value = doc.get(key)
+        if isinstance(want, dict):
+            if "$ne" in want and value == want["$ne"]:
+                return False
+            if "$lt" in want and (value is None or not value < want["$lt"]):
+                return False
+        elif value != want:
+            return False
+    return True
+
+
+class DummyJobsRepository:
+    def __init__(self, docs):
+        self.docs = {d["id"]: d for d in docs}
+
+    async def find_jobs(self, query, sort=None, limit=0):
+        return [dict(d) for d in self.docs.values() if matches(d, query)]
+
+    async def apply_status_transitions(self, transitions):
+        applied = []
+        for job_id, status, from_statuses in transitions:
+            doc = self.docs.get(job_id)
+            if doc is not None and doc["status"] in from_statuses:
+                doc["status"] = status
+                applied.append((job_id, status))
+        return applied
+
+    async def requeue_jobs(self, deploys):
+        requeued = []
+        for job_id, node_id in deploys:
+            doc = self.docs[job_id]
+            if doc["status"] == "pending" and doc["node_id"] == node_id:
+                doc["node_id"] = doc["assigned_at"] = None
+                requeued.append(job_id)
+        return requeued
+
+
+class DummyClusterState:
+    def __init__(self, containers):
+        self.containers = containers
+
+    async def sync_all(self, nodes_dict):
+        return {}
+
+    def find_by_job(self, job_id, node_id=None):
+        return self.containers.get(job_id)
+
+
+def job_doc(job_id, status, node_id="n1", assigned_at=LONG_AGO):
+    return {"id": job_id, "image": "alpine:3.18", "status": status, "node_id": node_id,
+            "assigned_at": assigned_at, "cpu": 0.5, "memory": 256}
+
+
+def reconcile(monkeypatch, docs, containers):
+    jobs = DummyJobsRepository(docs)
+    for name in ("find_jobs", "apply_status_transitions", "requeue_jobs"):
+        monkeypatch.setattr(repository, name, getattr(jobs, name))
+
+    async def list_nodes_async():
+        return NODES
+
+    monkeypatch.setattr(main.node_manager, "list_nodes_async", list_nodes_async)
+    monkeypatch.setattr(main, "cluster_state", DummyClusterState(containers))
+    monkeypatch.setattr(main, "scheduler", Scheduler())
+    asyncio.run(main.reconcile_jobs())
+    return jobs.docs
+
+
+def test_job_whose_start_event_was_lost_is_recovered(monkeypatch):
+    docs = reconcile(monkeypatch, [
+        job_doc("started", "pending"),
+        job_doc("finished", "pending"),
+        job_doc("never-started", "pending"),
+        # Still within its deploy: left alone
+        job_doc("deploying", "pending", assigned_at=datetime.utcnow()),
+    ], {
+        "started": {"id": "c1", "state": "running"},
+        "finished": {"id": "c2", "state": "exited", "exit_code": 0},
+    })
+
+    assert docs["started"]["status"] == "running"
+    assert docs["finished"]["status"] == "completed"
+    # No container on its node: back in the queue for the dispatcher
+    assert docs["never-started"]["status"] == "pending" and docs["never-started"]["node_id"] is None
+    assert docs["deploying"]["node_id"] == "n1"
+    assert main.scheduler.allocations()["n1"]["memory"] == 256
+
+
+def test_running_job_whose_container_was_reaped_is_failed(monkeypatch):
+    docs = reconcile(monkeypatch, [
+        job_doc("reaped", "running"),
+        job_doc("alive", "running"),
+        # Its node could not be synced: no verdict yet
+        job_doc("elsewhere", "running", node_id="n2"),
+    ], {
+        "alive": {"id": "c1", "state": "running"},
+    })
+
+    assert docs["reaped"]["status"] == "failed"
+    assert docs["alive"]["status"] == "running"
+    assert docs["elsewhere"]["status"] == "running"
@@ -0,0 +1,205 @@
+import json
+
+import httpx
+from fastapi.testclient import TestClient
+
+import main
+import repository
+from api import jobs as jobs_api
+from orchestrator.agent_client import AgentClient
+from orchestrator.dispatcher import Dispatcher
+from orchestrator.scheduler import Scheduler
+
+
+class DummyJobsRepository:
+    def __init__(self):
+        self.insert_many_calls = []
+        self.docs = {}
+        self.assign_calls = 0
+
+    async def insert_job(self, doc):
+        await self.insert_jobs([doc])
+
+    async def insert_jobs(self, docs):
+        self.insert_many_calls.append(list(docs))
+        self.docs.update((doc["id"], dict(doc)) for doc in docs)
+
+    async def requeue_jobs(self, deploys):
+        requeued = []
+        for job_id, node_id in deploys:
+            doc = self.docs[job_id]
+            if doc["status"] == "pending" and doc["node_id"] == node_id:
+                doc["node_id"] = doc["assigned_at"] = None
+                requeued.append(job_id)
+        return requeued
+
+    async def assign_pending_jobs(self, assignments):
+        self.assign_calls += 1
+        for job_id, status, node_id in assignments:
+            doc = self.docs[job_id]
+            doc["node_id"] = node_id
+            if doc["status"] == "pending":
+                doc["status"] = status
+
+
+class DummyAgentClient:
+    def __init__(self, failing_names=(), bulk=True):
+        self.deploys = []
+        self.batch_requests = 0
+        self.failing_names = set(failing_names)
+        self.bulk = bulk
+        # The jobs collection, to check a job is stored before its container is deployed
+        self.stored = {}
+        self.unstored = []
+
+    async def post(self, node, path, op="deploy", **kwargs):
+        if path == "/containers/batch":
+            if not self.bulk:
+                return httpx.Response(404)
+            self.batch_requests += 1
+            lines = []
+            for spec in kwargs["json"]:
+                self.deploys.append((node.id, spec["name"]))
+                self._check_stored(spec["name"])
+                failed = spec["name"] in self.failing_names
+                lines.append(json.dumps({"name": spec["name"], "id": None if failed else "c1"}))
+            return httpx.Response(200, text="\n".join(lines))
+
+        name = kwargs["params"]["name"]
+        self.deploys.append((node.id, name))
+        self._check_stored(name)
+        return httpx.Response(500 if name in self.failing_names else 200, json={})
+
+
+    def _check_stored(self, name):
+        if name[len("job-"):] not in self.stored:
+            self.unstored.append(name)
+
+
+def make_nodes(*node_ids):
+    return {
+        nid: {"ip": "127.0.0.1", "port": 8001 + i, "cpu": 4, "memory": 8192, "status": "online"}
+        for i, nid in enumerate(node_ids)
+    }
+
+
+def create_client(monkeypatch, nodes, agent):
+    collection = DummyJobsRepository()
+
+    async def list_nodes_async():
+        return nodes
+
+    monkeypatch.setattr(repository, "insert_job", collection.insert_job)
+    monkeypatch.setattr(repository, "insert_jobs", collection.insert_jobs)
+    monkeypatch.setattr(repository, "assign_pending_jobs", collection.assign_pending_jobs)
+    monkeypatch.setattr(repository, "requeue_jobs", collection.requeue_jobs)
+    agent.stored = collection.docs
+    monkeypatch.setattr(jobs_api.node_manager, "list_nodes_async", list_nodes_async)
+    monkeypatch.setattr(jobs_api, "agent_client", agent)
+    scheduler = Scheduler(strategy="round_robin")
+    monkeypatch.setattr(jobs_api, "scheduler", scheduler)
+    monkeypatch.setattr(jobs_api, "dispatcher", Dispatcher(None, scheduler, agent))
+    return TestClient(main.app), collection
+
+
+def parse_ndjson(text):
+    return [json.loads(line) for line in text.splitlines() if line]
+
+
+def test_batch_submit_deploys_and_bulk_inserts_per_node(monkeypatch):
+    agent = DummyAgentClient(failing_names={"job-j3"})
+    client, col = create_client(monkeypatch, make_nodes("node1", "node2"), agent)
+
+    jobs = [{"id": f"j{i}", "image": "alpine:3.18", "status": "pending"} for i in range(4)]
+    response = client.post("/jobs/batch", json=jobs)
+
+    assert response.status_code == 200
+    results = {r["id"]: r for r in parse_ndjson(response.text)}
+    assert results["j0"] == {"id": "j0", "status": "running", "node_id": "node1"}
+    assert results["j1"]["node_id"] == "node2"
+    # A failed deploy goes back to the queue for the dispatcher to retry
+    assert results["j3"] == {"id": "j3", "status": "pending", "node_id": None}
+
+    assert len(agent.deploys) == 4
+    # One bulk deploy and one insert_many per node group
+    assert agent.batch_requests == 2
+    assert sorted(len(docs) for docs in col.insert_many_calls) == [2, 2]
+    # Every job was stored before its deploy, and its outcome recorded with one update per group
+    assert agent.unstored == [] and col.assign_calls == 2
+    assert col.docs["j3"]["status"] == "pending" and col.docs["j3"]["node_id"] is None
+    assert col.docs["j0"]["status"] == "running"
+
+
+def test_failed_submit_deploy_is_queued_for_retry(monkeypatch):
+    agent = DummyAgentClient(failing_names={"job-j1"})
+    client, col = create_client(monkeypatch, make_nodes("node1"), agent)
+
+    response = client.post("/jobs", json={"id": "j1", "image": "alpine:3.18", "status": "pending"})
+
+    assert response.json()["status"] == "pending" and response.json()["node_id"] is None
+    assert col.docs["j1"]["status"] == "pending" and col.docs["j1"]["node_id"] is None
+    assert jobs_api.dispatcher.stats()["backing_off"] == 1
+
+
+def test_submit_stores_the_job_before_deploying_it(monkeypatch):
+    agent = DummyAgentClient()
+    client, col = create_client(monkeypatch, make_nodes("node1"), agent)
+
+    response = client.post("/jobs", json={"id": "j1", "image": "alpine:3.18", "status": "pending"})
+
+    assert response.json()["status"] == "running"
+    assert agent.unstored == [] and col.assign_calls == 1
+    assert col.insert_many_calls[0][0]["node_id"] == "node1"
+    assert col.docs["j1"]["status"] == "running"
+
+
+def test_batch_submit_falls_back_to_single_deploys(monkeypatch):
+    agent = DummyAgentClient(bulk=False)
+    client, col = create_client(monkeypatch, make_nodes("node1"), agent)
+
+    jobs = [{"id": f"j{i}", "image": "alpine:3.18", "status": "pending"} for i in range(3)]
+    response = client.post("/jobs/batch", json=jobs)
+
+    assert {r["status"] for r in parse_ndjson(response.text)} == {"running"}
+    assert len(agent.deploys) == 3
+
+
+def test_batch_submit_without_nodes_stores_pending(monkeypatch):
+    agent = DummyAgentClient()
+    client, col = create_client(monkeypatch, {}, agent)
+
+    response = client.post("/jobs/batch", json=[{"id": "j1", "image": "alpine:3.18", "status": "pending"}])
+
+    assert parse_ndjson(response.text) == [{"id": "j1", "status": "pending", "node_id": None}]
+    assert agent.deploys == []
+    assert len(col.insert_many_calls) == 1
+
+
+def test_job_logs_are_relayed_from_the_agent(monkeypatch):
+    seen = {}
+
+    async def body():
+        for chunk in (b"hello\n", b"world\n"):
+            yield chunk
+
+    def agent_handler(request):
+        seen["url"] = request.url
+        return httpx.Response(200, content=body(), headers={"content-type": "text/plain; charset=utf-8",
+                                                            "x-log-source": "container"})
+
+    async def get_job(job_id):
+        return {"id": job_id, "node_id": "node1"} if job_id == "j1" else None
+
+    client, _ = create_client(monkeypatch, make_nodes("node1"), DummyAgentClient())
+    monkeypatch.setattr(jobs_api, "agent_client", AgentClient(transport=httpx.MockTransport(agent_handler)))
+    monkeypatch.setattr(repository, "get_job", get_job)
+
+    response = client.get("/jobs/j1/logs", params={"follow": "true", "tail": 5})
+    missing = client.get("/jobs/nope/logs")
+
+    assert response.status_code == 200
+    assert response.text == "hello\nworld\n"
+    assert response.headers["x-log-source"] == "container"
+    assert seen["url"].path == "/containers/job-j1/logs"
+    assert seen["url"].params["follow"] == "true" and seen["url"].params["tail"] == "5"
+    assert missing.status_code == 404
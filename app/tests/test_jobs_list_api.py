@@ -0,0 +1,79 @@
+from datetime import datetime
+
+from fastapi.testclient import TestClient
+
+import main
+import repository
+from api.jobs import after_cursor, build_job_filter, decode_cursor, encode_cursor
+
+
+def make_docs(n):
+    return [
+        {"id": f"j{i:02d}", "image": "alpine:3.18", "status": "running", "submitted_at": datetime(2024, 1, 1, 0, 0, i)}
+        for i in range(n)
+    ]
+
+
+def patch_iter_jobs(monkeypatch, docs):
+    calls = []
+
+    async def iter_jobs(query, sort, limit, projection=None):
+        calls.append({"query": query, "sort": sort, "limit": limit, "projection": projection})
+        ordered = sorted(docs, key=lambda d: (d["submitted_at"], d["id"]), reverse=True)
+        for doc in ordered[:limit]:
+            yield doc
+
+    monkeypatch.setattr(repository, "iter_jobs", iter_jobs)
+    return calls
+
+
+def test_list_jobs_returns_page_and_cursor(monkeypatch):
+    calls = patch_iter_jobs(monkeypatch, make_docs(5))
+    client = TestClient(main.app)
+
+    response = client.get("/jobs", params={"limit": 2, "status": "running", "fields": "status"})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert [j["id"] for j in data["items"]] == ["j04", "j03"]
+    assert data["items"][0]["submitted_at"] == "2024-01-01T00:00:04"
+    assert decode_cursor(data["next_cursor"]) == (datetime(2024, 1, 1, 0, 0, 3), "j03")
+    # One extra row is fetched to detect the next page; projection keeps the keyset
+    assert calls[0]["limit"] == 3
+    assert calls[0]["query"] == {"status": "running"}
+    assert calls[0]["projection"] == {"_id": 0, "status": 1, "id": 1, "submitted_at": 1}
+
+
+def test_list_jobs_last_page_has_no_cursor(monkeypatch):
+    patch_iter_jobs(monkeypatch, make_docs(2))
+    client = TestClient(main.app)
+
+    data = client.get("/jobs", params={"limit": 5}).json()
+
+    assert len(data["items"]) == 2
+    assert data["next_cursor"] is None
+
+
+def test_invalid_cursor_is_rejected():
+    client = TestClient(main.app)
+    assert client.get("/jobs", params={"cursor": "not-a-cursor"}).status_code == 400
+
+
+def test_after_cursor_builds_keyset_filter():
+    doc = {"id": "j03", "submitted_at": datetime(2024, 1, 1)}
+    query = after_cursor(build_job_filter(status="running"), encode_cursor(doc))
+
+    assert query["$and"][0] == {"status": "running"}
+    keyset = query["$and"][1]["$or"]
+    assert keyset[0] == {"submitted_at": {"$lt": datetime(2024, 1, 1)}}
+    assert keyset[1] == {"submitted_at": datetime(2024, 1, 1), "id": {"$lt": "j03"}}
+
+
+def test_jobs_summary_counts_by_status(monkeypatch):
+    async def count_jobs_by_status(query):
+        return {"running": 3, "completed": 7}
+
+    monkeypatch.setattr(repository, "count_jobs_by_status", count_jobs_by_status)
+    client = TestClient(main.app)
+
+    assert client.get("/jobs/summary").json() == {"total": 10, "by_status": {"running": 3, "completed": 7}}
@@ -86,3 +86,66 @@ def test_list_nodes_async_calls_refresh(monkeypatch):
     assert result["node1"]["status"] == "online"
     assert result["node1"]["cpu_percent"] == 15.0
     assert result["node1"]["memory_percent"] == 30.0
+
+
+def seed_counting_manager(monkeypatch):
+    manager = make_manager()
+    manager.nodes["node1"] = {
+        "ip": "127.0.0.1",
+        "port": 8001,
+        "cpu": 4,
+        "memory": 8192,
+        "status": "unknown",
+        "cpu_percent": 0.0,
+        "memory_percent": 0.0,
+        "last_seen": None,
+    }
+    probes = []
+
+    async def fake_refresh(node_id: str, node: Dict[str, Any]):
+        probes.append(node_id)
+        await asyncio.sleep(0)
+        node["status"] = "online"
+
+    monkeypatch.setattr(manager, "_refresh_node_status", fake_refresh)
+    return manager, probes
+
+
+def test_list_nodes_async_serves_fresh_snapshot_without_probing(monkeypatch):
+    manager, probes = seed_counting_manager(monkeypatch)
+
+    async def run():
+        await manager.list_nodes_async()
+        await manager.list_nodes_async()
+        await manager.get_node_async("node1")
+
+    asyncio.run(run())
+
+    # Only the first call (no snapshot yet) probes
+    assert probes == ["node1"]
+    assert manager.snapshot_age() is not None
+
+
+def test_list_nodes_async_refresh_and_staleness_force_probe(monkeypatch):
+    manager, probes = seed_counting_manager(monkeypatch)
+
+    async def run():
+        await manager.list_nodes_async()
+        await manager.list_nodes_async(refresh=True)
+        manager.max_staleness = 0
+        await manager.list_nodes_async()
+
+    asyncio.run(run())
+
+    assert len(probes) == 3
+
+
+def test_concurrent_refreshes_share_one_probe(monkeypatch):
+    manager, probes = seed_counting_manager(monkeypatch)
+
+    async def run():
+        await asyncio.gather(*(manager.refresh_all() for _ in range(5)))
+
+    asyncio.run(run())
+
+    assert probes == ["node1"]
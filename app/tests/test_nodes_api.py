@@ -0,0 +1,71 @@
+from fastapi.testclient import TestClient
+
+import main
+from api import nodes as nodes_api
+from orchestrator.node_manager import NodeManager
+
+
+class DummyNodeManager(NodeManager):
+    def __init__(self, nodes):
+        super().__init__(agent_client=object())
+        self.nodes = nodes
+
+    async def list_nodes_async(self, refresh: bool = False):
+        return self.nodes
+
+
+def node_spec(cpu_percent):
+    return {"ip": "10.0.0.1", "port": 8001, "cpu": 4, "memory": 8192, "status": "online",
+            "last_seen": None, "cpu_percent": cpu_percent, "memory_percent": 10.0}
+
+
+def test_list_nodes_conditional_and_delta(monkeypatch):
+    manager = DummyNodeManager({"n1": node_spec(5.0), "n2": node_spec(7.0)})
+    monkeypatch.setattr(nodes_api, "node_manager", manager)
+    client = TestClient(main.app)
+
+    first = client.get("/nodes")
+    assert [n["id"] for n in first.json()] == ["n1", "n2"]
+    assert client.get("/nodes", headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
+
+    base = client.get("/nodes", params={"since": 0}).json()
+    manager.nodes["n2"] = node_spec(50.0)
+    del manager.nodes["n1"]
+
+    changed = client.get("/nodes", headers={"If-None-Match": first.headers["ETag"]})
+    assert changed.status_code == 200
+    delta = client.get("/nodes", params={"since": base["revision"], "epoch": base["epoch"]}).json()
+    assert [n["cpu_percent"] for n in delta["nodes"]] == [50.0]
+    assert delta["removed"] == ["n1"]
+
+
+def test_routine_probes_do_not_change_the_etag(monkeypatch):
+    manager = DummyNodeManager({"n1": node_spec(5.0)})
+    monkeypatch.setattr(nodes_api, "node_manager", manager)
+    client = TestClient(main.app)
+
+    first = client.get("/nodes")
+    # Another probe: new last_seen, usage moved within the threshold
+    manager.nodes["n1"] = {**node_spec(7.5), "last_seen": "2024-01-01T00:00:05"}
+    again = client.get("/nodes", headers={"If-None-Match": first.headers["ETag"]})
+    manager.nodes["n1"]["status"] = "offline"
+    offline = client.get("/nodes", headers={"If-None-Match": first.headers["ETag"]})
+
+    assert again.status_code == 304
+    assert offline.status_code == 200 and offline.json()[0]["cpu_percent"] == 7.5
+
+
+def test_list_nodes_since_returns_a_delta_body(monkeypatch):
+    manager = DummyNodeManager({"n1": node_spec(5.0)})
+    monkeypatch.setattr(nodes_api, "node_manager", manager)
+    client = TestClient(main.app)
+
+    resp = client.get("/nodes", params={"since": 0})
+
+    assert resp.status_code == 200
+    body = resp.json()
+    assert set(body) == {"epoch", "revision", "full", "nodes", "removed"}
+    assert [n["id"] for n in body["nodes"]] == ["n1"]
+    # The route documents no list schema the delta body would contradict
+    schema = client.get("/openapi.json").json()["paths"]["/nodes"]["get"]["responses"]["200"]
+    assert "$ref" not in str(schema) and "array" not in str(schema)
@@ -13,7 +13,7 @@ class DummyScheduler:
         return self._strategy
 
     def set_strategy(self, strategy: str):
-        if strategy not in ["first_fit", "round_robin", "resource_aware"]:
+        if strategy not in ["first_fit", "round_robin", "resource_aware", "best_fit", "worst_fit", "drf"]:
             raise ValueError(f"Unknown scheduling strategy: {strategy}")
         self._strategy = strategy
 
@@ -37,6 +37,9 @@ def test_get_scheduler_settings(monkeypatch):
         "first_fit",
         "round_robin",
         "resource_aware",
+        "best_fit",
+        "worst_fit",
+        "drf",
     }
 
 
@@ -0,0 +1,145 @@
+import asyncio
+import shutil
+import subprocess
+import sys
+import time
+
+import pytest
+
+from orchestrator.container_record import ContainerRecord
+from orchestrator.warm_pool import WarmPool, pool_programs
+
+
+class DummyContainerManager:
+    def __init__(self, exec_exit=0):
+        self.exec_exit = exec_exit
+        self.started = []
+        self.renamed = []
+        self.execs = []
+        self.removed = []
+        self.leftovers = []
+
+    async def start_container_async(self, image, name=None, command=None, argv=None, labels=None, **limits):
+        self.started.append((image, name, argv, labels))
+        return {"id": f"c{len(self.started)}", "name": name, "image": image, "status": "running"}
+
+    async def rename_container_async(self, container_id, name):
+        self.renamed.append((container_id, name))
+
+    async def exec_in_container_async(self, container_id, argv):
+        self.execs.append((container_id, argv))
+        return self.exec_exit
+
+    async def stop_container_async(self, container_id, remove=True):
+        self.removed.append(container_id)
+
+    async def list_containers_async(self, all=False):
+        return self.leftovers
+
+
+def filled_pool(cm, **kwargs):
+    pool = WarmPool(cm, images=["python:3.11-slim", "alpine:3.18"], size=2, replenish_rate=1000, **kwargs)
+
+    async def fill():
+        while (image := pool._deficit()) is not None:
+            await pool._create(image)
+
+    asyncio.run(fill())
+    return pool
+
+
+def test_claim_hands_the_job_to_an_idle_container():
+    cm = DummyContainerManager()
+    pool = filled_pool(cm)
+    assert pool.images == ["python:3.11-slim"]
+    assert [labels for _, _, _, labels in cm.started] == [{"orchestrator.pool": "python:3.11-slim"}] * 2
+
+    result = asyncio.run(pool.claim("python:3.11-slim", "job-1", "print(1)", 0.5, 256, {"orchestrator.job": "1"}))
+
+    assert result == {"id": "c1", "name": "job-1", "image": "python:3.11-slim", "status": "running"}
+    assert cm.renamed == [("c1", "job-1")]
+    assert cm.execs[0][1][-1] == "print(1)"
+    assert pool.labels_for("c1") == {"orchestrator.job": "1"}
+    pool.forget(["c2"])
+    assert pool.labels_for("c1") is None
+    assert pool.stats()["hits"] == 1 and pool.stats()["idle"] == {"python:3.11-slim": 1}
+
+
+def test_misses_fall_back_to_cold_start():
+    cm = DummyContainerManager()
+    pool = filled_pool(cm)
+
+    async def claims():
+        return [
+            await pool.claim("python:3.11-slim", "a", "print(1)", 2.0, 256),      # other limits
+            await pool.claim("alpine:3.18", "b", "echo hi", 0.5, 256),            # not pooled
+            await pool.claim("python:3.11-slim", "c", "print(1)", 0.5, 256),
+            await pool.claim("python:3.11-slim", "d", "print(1)", 0.5, 256),
+            await pool.claim("python:3.11-slim", "e", "print(1)", 0.5, 256),      # pool drained
+        ]
+
+    assert [r is not None for r in asyncio.run(claims())] == [False, False, True, True, False]
+    assert pool.stats()["miss_reasons"] == {"limits": 1, "empty": 1}
+
+
+def test_expired_and_broken_containers_are_discarded():
+    cm = DummyContainerManager(exec_exit=1)
+    pool = filled_pool(cm, max_idle=60)
+    idle = pool._idle["python:3.11-slim"]
+    idle[0] = (idle[0][0], time.time() - 120)
+
+    async def claim():
+        result = await pool.claim("python:3.11-slim", "job-1", "print(1)", 0.5, 256)
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(claim()) is None
+    # c1 was too old, c2's handoff failed: both removed
+    assert sorted(cm.removed) == ["c1", "c2"]
+    assert pool.stats()["miss_reasons"] == {"error": 1} and pool.expired == 1
+
+
+def test_leftover_pool_containers_from_a_previous_agent_are_removed():
+    cm = DummyContainerManager()
+    cm.leftovers = [
+        ContainerRecord("idle", name="pool-python-3-11-slim-ab", labels={"orchestrator.pool": "python:3.11-slim"}),
+        ContainerRecord("claimed", name="job-7", labels={"orchestrator.pool": "python:3.11-slim"}),
+    ]
+    pool = WarmPool(cm, images=["python:3.11-slim"], size=1)
+
+    asyncio.run(pool._clear_leftovers())
+
+    assert cm.removed == ["idle"]
+
+
+def test_python_stub_runs_handed_off_code_as_main_program():
+    stub, writer = pool_programs("python:3.11-slim")
+    stub = [sys.executable] + stub[1:]
+    writer = [sys.executable] + writer[1:]
+
+    proc = subprocess.Popen(stub, stdout=subprocess.PIPE, text=True)
+    try:
+        code = "import sys\nprint(__name__)\nsys.exit(3)"
+        assert subprocess.run(writer + [code]).returncode == 0
+        out, _ = proc.communicate(timeout=10)
+    finally:
+        proc.kill()
+
+    assert out.strip() == "__main__"
+    assert proc.returncode == 3
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="node is not installed")
+def test_node_stub_runs_handed_off_code_with_commonjs_scope():
+    stub, writer = pool_programs("node:20-slim")
+
+    proc = subprocess.Popen(stub, stdout=subprocess.PIPE, text=True)
+    try:
+        code = "const fs = require('fs');\nconsole.log(typeof fs.readFileSync, typeof module.exports, typeof __dirname);\nprocess.exit(3);"
+        assert subprocess.run(writer + [code]).returncode == 0
+        out, _ = proc.communicate(timeout=10)
+    finally:
+        proc.kill()
+
+    assert out.strip() == "function object string"
+    assert proc.returncode == 3
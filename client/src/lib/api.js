@@ -13,10 +13,41 @@ async function http(path, init) {
   return res.status === 204 ? undefined : await res.json();
 }
 
+// Merge a { full, <key>: [...], removed: [...] } delta into a list of records keyed by id
+export function applyDelta(items, delta, key, { prepend = false } = {}) {
+  if (delta.full) return delta[key];
+  const removed = new Set(delta.removed);
+  const changed = new Map(delta[key].map((it) => [it.id, it]));
+  const known = new Set(items.map((it) => it.id));
+  const kept = items
+    .filter((it) => !removed.has(it.id))
+    .map((it) => (changed.has(it.id) ? { ...it, ...changed.get(it.id) } : it));
+  const added = delta[key].filter((it) => !known.has(it.id));
+  return prepend ? [...added, ...kept] : [...kept, ...added];
+}
+
 export const api = {
   // ========= CONTAINERS (query params per Swagger) =========
   listContainers: (all = true) => http(`/containers?all=${all}`),
 
+  // Streams one { node_id, status, containers } record per node as it answers
+  streamContainers: async (all = true, onNode) => {
+    const res = await fetch(`${API_URL}/containers?all=${all}&stream=true`);
+    if (!res.ok) throw new Error((await res.text().catch(() => "")) || `HTTP ${res.status}`);
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buf = "";
+    for (;;) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buf += decoder.decode(value, { stream: true });
+      const lines = buf.split("\n");
+      buf = lines.pop();
+      lines.filter(Boolean).forEach((line) => onNode(JSON.parse(line)));
+    }
+    if (buf.trim()) onNode(JSON.parse(buf));
+  },
+
   createContainer: ({ image, name }) =>
     http(
       `/containers?image=${encodeURIComponent(image)}&name=${encodeURIComponent(name)}`,
@@ -37,7 +68,17 @@ export const api = {
   deleteNode: (id) => http(`/nodes/${id}`, { method: "DELETE" }),
 
   // ========= JOBS (JSON body) =========
-  listJobs: () => http(`/jobs`),
+  // Newest page of jobs; pass { cursor } from listJobsPage to fetch older pages
+  listJobsPage: (params = {}) => {
+    const qs = new URLSearchParams(
+      Object.entries(params).filter(([, v]) => v !== undefined && v !== null && v !== "")
+    ).toString();
+    return http(`/jobs${qs ? `?${qs}` : ""}`);
+  },
+
+  listJobs: (params = {}) => api.listJobsPage(params).then((page) => page.items),
+
+  jobsSummary: () => http(`/jobs/summary`),
 
   createJob: ({ id, image, command = null, status = "pending" }) =>
     http(`/jobs`, {
@@ -45,8 +86,31 @@ export const api = {
       body: JSON.stringify({ id, image, command, status }),
     }),
 
+  // Returns one { id, status, node_id } result per submitted job
+  createJobsBatch: async (jobs) => {
+    const res = await fetch(`${API_URL}/jobs/batch`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify(jobs),
+    });
+    if (!res.ok) throw new Error((await res.text().catch(() => "")) || `HTTP ${res.status}`);
+    const txt = await res.text();
+    return txt.split("\n").filter(Boolean).map((line) => JSON.parse(line));
+  },
+
   deleteJob: (id) => http(`/jobs/${id}`, { method: "DELETE" }),
 
+  // ========= LIVE UPDATES (SSE) =========
+  // handlers: { nodes, containers, jobs, resync }; returns a function that closes the stream.
+  // Subscribe before loading the initial snapshot so no change falls in between.
+  subscribe: (handlers) => {
+    const source = new EventSource(`${API_URL}/events/stream`);
+    Object.entries(handlers).forEach(([topic, fn]) =>
+      source.addEventListener(topic, (e) => fn(JSON.parse(e.data)))
+    );
+    return () => source.close();
+  },
+
   getSchedulerSettings: () => http(`/settings/scheduler`),
 
   updateSchedulerSettings: ({ strategy }) =>
@@ -3,7 +3,7 @@ import { useEffect, useState, useRef } from "react";
 import { api } from "../lib/api";
 
 export default function ContainersPage() {
-  const [items, setItems] = useState([]);
+  const [byNode, setByNode] = useState({});
   const [err, setErr] = useState(null);
   const [loading, setLoading] = useState(true);
   const [fetching, setFetching] = useState(false);
@@ -14,9 +14,14 @@ export default function ContainersPage() {
       setFetching(true);
     }
     setErr(null);
+    // Nodes render as they answer; a node keeps its previous list until it does
     api
-      .listContainers(true)
-      .then(setItems)
+      .streamContainers(true, (rec) =>
+        setByNode((prev) => ({
+          ...prev,
+          [rec.node_id]: rec.status === "ok" ? rec : { ...rec, containers: prev[rec.node_id]?.containers ?? [] },
+        }))
+      )
       .catch((e) => setErr(e.message))
       .finally(() => {
         setLoading(false);
@@ -25,10 +30,31 @@ export default function ContainersPage() {
       });
   };
 
+  const applyContainerDelta = (delta) =>
+    setByNode((prev) => {
+      const next = {};
+      const changed = new Set([...delta.removed, ...delta.containers.map((c) => c.id)]);
+      Object.entries(prev).forEach(([nodeId, rec]) => {
+        next[nodeId] = {
+          ...rec,
+          containers: delta.full ? [] : rec.containers.filter((c) => !changed.has(c.id)),
+        };
+      });
+      delta.containers.forEach((c) => {
+        const rec = next[c.node_id] ?? { node_id: c.node_id, status: "ok", containers: [] };
+        next[c.node_id] = { ...rec, containers: [...rec.containers, c] };
+      });
+      return next;
+    });
+
+  const items = Object.values(byNode).flatMap((rec) => rec.containers);
+  const unavailable = Object.values(byNode).filter((rec) => rec.status !== "ok");
+
   useEffect(() => {
+    // Container changes are pushed by the orchestrator instead of polled
+    const unsubscribe = api.subscribe({ containers: applyContainerDelta, resync: refresh });
     refresh();
-    const interval = setInterval(refresh, 5000);
-    return () => clearInterval(interval);
+    return unsubscribe;
   }, []);
 
   return (
@@ -39,6 +65,11 @@ export default function ContainersPage() {
       </p>
 
       {err && <div className="error">{err}</div>}
+      {unavailable.length > 0 && (
+        <p style={{fontSize: '0.85em', color: '#b58100'}}>
+          Partial results — no answer from: {unavailable.map((rec) => `${rec.node_id} (${rec.status})`).join(", ")}
+        </p>
+      )}
 
       {loading ? (
         <div className="loading-text">Loading…</div>
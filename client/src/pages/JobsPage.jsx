@@ -1,5 +1,5 @@
 import { useEffect, useState } from "react";
-import { api } from "../lib/api";
+import { api, applyDelta } from "../lib/api";
 
 const ALLOWED_IMAGES = [
   'python:3.11-slim', 'python:3.10-slim', 'python:3.9-slim',
@@ -30,7 +30,21 @@ export default function JobsPage() {
       .finally(() => setLoading(false));
   };
 
-  useEffect(() => { refresh(); }, []);
+  useEffect(() => {
+    const unsubscribe = api.subscribe({
+      jobs: (delta) =>
+        setJobs((prev) => {
+          // Status-only updates for jobs not on this page are ignored
+          const known = new Set(prev.map((j) => j.id));
+          const jobs = delta.jobs.filter((j) => j.image || known.has(j.id));
+          return applyDelta(prev, { ...delta, jobs }, "jobs", { prepend: true });
+        }),
+      nodes: (delta) => setNodes((prev) => applyDelta(prev, delta, "nodes")),
+      resync: refresh,
+    });
+    refresh();
+    return unsubscribe;
+  }, []);
 
   const onCreate = async (e) => {
     e.preventDefault();
@@ -1,5 +1,5 @@
 import { useEffect, useState, useRef } from "react";
-import { api } from "../lib/api";
+import { api, applyDelta } from "../lib/api";
 
 export default function NodesPage() {
   const [nodes, setNodes] = useState([]);
@@ -51,9 +51,13 @@ export default function NodesPage() {
   };
 
   useEffect(() => {
+    // Health changes are pushed by the orchestrator instead of polled
+    const unsubscribe = api.subscribe({
+      nodes: (delta) => setNodes((prev) => applyDelta(prev, delta, "nodes")),
+      resync: refresh,
+    });
     refresh();
-    const interval = setInterval(refresh, 5000);
-    return () => clearInterval(interval);
+    return unsubscribe;
   }, []);
 
   const setField = (k) => (e) => {
@@ -60,7 +60,10 @@ export default function SettingsPage() {
   const strategyDescriptions = {
     first_fit: "Always assigns jobs to the first available node. Simple and fast.",
     round_robin: "Distributes jobs evenly across all nodes in rotation. Best for balanced load distribution.",
-    resource_aware: "Assigns jobs to the node with the lowest CPU usage. Optimizes resource utilization."
+    resource_aware: "Assigns jobs to the node with the lowest CPU usage. Optimizes resource utilization.",
+    best_fit: "Packs jobs onto the node with the least free memory that still fits the job's CPU/memory request.",
+    worst_fit: "Spreads jobs onto the node with the most free capacity for the job's CPU/memory request.",
+    drf: "Places jobs on the node with the lowest dominant (CPU or memory) allocated share."
   };
 
   return (